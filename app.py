@@ -1,17 +1,30 @@
-from flask import Flask, render_template, request, jsonify, send_file, session
+from flask import Flask, render_template, request, jsonify, send_file, session, Response
 import pandas as pd
 import os
 from datetime import datetime
 from config import Config
-from utils.data_analyzer import DataAnalyzer
-from utils.data_processor import DataProcessor
-from utils.data_visualization import DataVisualization
+from utils.data_analyzer import DataAnalyzer, ISSUE_TYPES
+from utils.data_processor import DataProcessor, PIPELINE_STAGES, MISSING_STRATEGIES
+from utils.data_visualization import DataVisualization, VISUALS_FOLDER, RENDERER_VERSION
+from utils.dataset_cache import DatasetCache
+from utils.block_profiles import BlockProfileStore
+from utils.spelling import SpellingCorrector
+from utils.lexical import LexicalEngine
+from utils.jobs import JobManager
+from utils.duplicates import DuplicateEngine
+from utils.imputation import ImputationEngine
+from utils.encoder_registry import EncoderRegistry
+from utils.chart_cache import ChartCache
+from utils.sql_importer import SQLDumpImporter
+from utils.pdf_extractor import PDFTableExtractor
+from utils.cleaning_plan import CleaningPlan
+from utils.chunked_processor import ChunkedProcessor
+from utils.metrics import MetricsRegistry
+from utils.xlsx_reader import sheet_names
 from werkzeug.utils import secure_filename
 from groq import Groq
-import camelot
 import dotenv
-import csv
-import re
+import uuid
 from flask_cors import CORS
 from flask_cors import CORS
 from utils.data_processor import DataProcessor
@@ -28,9 +41,32 @@ app.config.update({
 })
 Config.init_app(app)
 
-analyzer = DataAnalyzer()
-processor = DataProcessor()
-visualizer = DataVisualization()
+metrics_registry = MetricsRegistry()
+analyzer = DataAnalyzer(metrics=metrics_registry, track_memory=Config.TRACK_STAGE_MEMORY)
+spelling_corrector = SpellingCorrector(cache_path=Config.SPELLING_CACHE_PATH, workers=Config.SPELLING_WORKERS)
+jobs = JobManager(max_workers=Config.JOB_WORKERS, retention=Config.JOB_RETENTION)
+duplicate_engine = DuplicateEngine(workers=Config.DUPLICATE_WORKERS)
+imputation_engine = ImputationEngine(workers=Config.IMPUTATION_WORKERS, sample_rows=Config.IMPUTATION_SAMPLE_ROWS)
+encoder_registry = EncoderRegistry(Config.ENCODER_REGISTRY_PATH, max_categories=Config.ENCODER_MAX_CATEGORIES)
+
+
+def make_processor():
+    """DataProcessor keeps per-run state, so every run (request or job) gets its own."""
+    return DataProcessor(spelling_corrector=spelling_corrector,
+                         lexical_engine=LexicalEngine(workers=Config.LEXICAL_WORKERS),
+                         duplicate_engine=duplicate_engine, track_memory=Config.TRACK_STAGE_MEMORY,
+                         metrics=metrics_registry, imputation_engine=imputation_engine,
+                         max_encoded_columns=Config.MAX_ENCODED_COLUMNS, encoder_registry=encoder_registry)
+chart_cache = ChartCache(VISUALS_FOLDER, max_bytes=Config.CHART_CACHE_MAX_BYTES, renderer_version=RENDERER_VERSION)
+visualizer = DataVisualization(workers=Config.CHART_WORKERS, max_charts=Config.MAX_CHARTS, chart_cache=chart_cache,
+                               metrics=metrics_registry, track_memory=Config.TRACK_STAGE_MEMORY)
+block_profiles = BlockProfileStore(Config.BLOCK_PROFILE_PATH, block_rows=Config.BLOCK_PROFILE_ROWS,
+                                   duplicate_engine=duplicate_engine)
+dataset_cache = DatasetCache(max_bytes=Config.DATASET_CACHE_MAX_BYTES, snapshot_dir=Config.SNAPSHOT_FOLDER,
+                             duplicate_engine=duplicate_engine, block_profiles=block_profiles)
+pdf_extractor = PDFTableExtractor(Config.PDF_CACHE_FOLDER, workers=Config.PDF_WORKERS)
+chunked_processor = ChunkedProcessor(chunk_rows=Config.PROCESS_CHUNK_ROWS, sample_rows=Config.PROCESS_SAMPLE_ROWS,
+                                     duplicate_engine=duplicate_engine, metrics=metrics_registry)
 
 CORS(app, origins=["http://localhost:3000"], supports_credentials=True)
 
@@ -41,72 +77,33 @@ def index():
     return render_template('index.html')
 
 
-def extract_insert_values(sql_file, csv_file):
+def extract_insert_values(sql_file, output_prefix):
     """
-    Extracts INSERT values from an SQL file and saves them as a CSV.
-    Preserves actual column names if available.
+    Streams the INSERT / COPY rows of an SQL dump into one CSV per table.
+    Returns ({table: {'path', 'rows'}}, error).
     """
     try:
-        with open(sql_file, "r", encoding="utf-8") as f:
-            sql_content = f.read()
-
-        # Pattern to capture table name, column list (optional), and values
-        insert_pattern = re.compile(
-            r"INSERT\s+(?:IGNORE\s+)?INTO\s+`?(\w+)`?\s*(?:\(([^)]+)\))?\s*VALUES\s*((?:\([^)]+\)\s*,?\s*)+);?",
-            re.IGNORECASE | re.DOTALL
-        )
-
-        matches = insert_pattern.findall(sql_content)
-        if not matches:
+        importer = SQLDumpImporter(batch_size=app.config['SQL_IMPORT_BATCH_ROWS'])
+        tables = importer.import_file(sql_file, app.config['UPLOAD_FOLDER'], output_prefix)
+        if not tables:
             return None, "No INSERT statements found in the SQL file."
-
-        all_rows = []
-        column_names = None
-
-        for table_name, columns_str, values_str in matches:
-            # Parse column names if present
-            if columns_str:
-                column_names = [col.strip(' `"\n\r\t') for col in columns_str.split(',')]
-            else:
-                column_names = None  # fallback if missing
-
-            # Match individual row value groups
-            row_matches = re.findall(r'\((.*?)\)', values_str, re.DOTALL)
-            for row in row_matches:
-                parsed_row = []
-                for value in re.split(r',(?=(?:[^\'"`]*[\'"`][^\'"`]*[\'"`])*[^\'"`]*$)', row):
-                    value = value.strip()
-                    if value.upper() == 'NULL':
-                        parsed_row.append(None)
-                    elif value.startswith("'") and value.endswith("'"):
-                        parsed_row.append(value[1:-1].replace("''", "'"))
-                    elif value.startswith('"') and value.endswith('"'):
-                        parsed_row.append(value[1:-1].replace('""', '"'))
-                    else:
-                        try:
-                            parsed_row.append(float(value) if '.' in value else int(value))
-                        except ValueError:
-                            parsed_row.append(value)
-
-                all_rows.append(parsed_row)
-
-        # Fallback column names if not parsed
-        if column_names is None:
-            column_count = max(len(row) for row in all_rows)
-            column_names = [f'{table_name}_col_{i+1}' for i in range(column_count)]
-
-        # Save to CSV
-        with open(csv_file, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(column_names)
-            writer.writerows(all_rows)
-
-        return csv_file, None
+        return tables, None
 
     except Exception as e:
         return None, f"Error processing SQL file: {str(e)}"
 
 
+def snapshot_upload(filepath, sheet=None):
+    """Writes the columnar snapshot for an upload; a failure only costs a re-parse later."""
+    if os.path.getsize(filepath) > app.config['STREAMING_THRESHOLD_BYTES']:
+        # Larger than we are willing to parse in one go; analysis streams it instead
+        return
+    try:
+        dataset_cache.snapshot(filepath, sheet)
+    except Exception:
+        app.logger.exception(f"Could not write snapshot for {filepath}")
+
+
 @app.route('/upload', methods=['POST'])
 def upload():
     
@@ -124,28 +121,31 @@ def upload():
         save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(save_path)
 
-        if filename.endswith('.csv') or filename.endswith('.xlsx'):
+        if filename.endswith('.csv'):
+            snapshot_upload(save_path)
             session['filename'] = filename
             return jsonify({'filename': filename})
 
+        elif filename.endswith('.xlsx'):
+            # Later requests pick a worksheet with "sheet"; the one named here (default: the first) is converted now
+            try:
+                sheets = sheet_names(save_path)
+            except Exception as e:
+                return jsonify({'error': f'Could not read workbook: {str(e)}'}), 400
+            snapshot_upload(save_path, request.form.get('sheet') or None)
+            session['filename'] = filename
+            return jsonify({'filename': filename, 'sheets': sheets})
+
         elif filename.endswith('.pdf'):
             try:
-                tables = camelot.read_pdf(save_path, pages='all', flavor='lattice', suppress_stdout=True)
-                if tables.n == 0:
-                    tables = camelot.read_pdf(save_path, pages='all', flavor='stream', suppress_stdout=True)
+                output_filename = f"extracted_data_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
+                output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
+                extraction = pdf_extractor.extract_to_csv(save_path, output_path)
 
-                if tables.n == 0:
+                if extraction['tables'] == 0:
                     return jsonify({'error': 'No tables found in PDF. Ensure tables are in text format (not images).'}), 400
 
-                dataframes = [table.df for table in tables]
-                final_df = pd.concat(dataframes, ignore_index=True)
-            
-                final_df.columns = final_df.iloc[0]
-                final_df = final_df[1:].reset_index(drop=True)
-
-                output_filename = f"extracted_data_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
-                output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-                final_df.to_csv(output_path, index=False)
+                snapshot_upload(output_path)
 
                 session['filename'] = output_filename
                 return jsonify({'filename': output_filename})
@@ -154,21 +154,27 @@ def upload():
         
         elif filename.endswith('.sql'):
             try:
-                output_filename = f"converted_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
-                output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-                
-                csv_file, error = extract_insert_values(save_path, output_path)
-                
+                output_prefix = f"converted_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+
+                tables, error = extract_insert_values(save_path, output_prefix)
+
                 if error:
                     app.logger.error(f"SQL Processing Error: {error}")
                     return jsonify({'error': error}), 400
 
-                if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-                    return jsonify({'error': 'No data extracted from SQL file'}), 400
+                for table in tables.values():
+                    snapshot_upload(table['path'])
 
+                # The table with the most rows becomes the working dataset; the
+                # others are listed so the client can switch to them
+                primary = max(tables.values(), key=lambda table: table['rows'])
+                output_filename = os.path.basename(primary['path'])
                 session['filename'] = output_filename
-                return jsonify({'filename': output_filename})
-            
+                return jsonify({
+                    'filename': output_filename,
+                    'tables': {name: os.path.basename(table['path']) for name, table in tables.items()}
+                })
+
             except Exception as e:
                 app.logger.exception("Unexpected error processing SQL file")
                 return jsonify({'error': f'SQL processing failed: {str(e)}'}), 500
@@ -182,14 +188,17 @@ def analyze():
     global file_context_global
     try:
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], data['filename'])
-        if data['filename'].endswith('.csv'):
-            df = pd.read_csv(filepath)
-        elif data['filename'].endswith('.xlsx'):
-            df = pd.read_excel(filepath, engine='openpyxl')
-        else:
+        if not data['filename'].endswith(('.csv', '.xlsx')):
             return jsonify({'error': 'Unsupported file format for analysis'}), 400
 
-        issues = analyzer.detect_all_issues(df)
+        if data['filename'].endswith('.csv') and os.path.getsize(filepath) > app.config['STREAMING_THRESHOLD_BYTES']:
+            # Too large to hold in memory: scan the file in chunks instead
+            issues = analyzer.detect_all_issues_streaming(filepath, chunksize=app.config['ANALYZE_CHUNK_SIZE'])
+        else:
+            sheet = data.get('sheet')
+            df = dataset_cache.get(filepath, sheet=sheet)
+            profile = analyzer.profile(df, lambda: dataset_cache.profile(filepath, sheet=sheet))
+            issues = analyzer.detect_all_issues(df, profile=profile)
         filtered_issues = {k: v for k, v in issues.items() if v}
         session['file_context'] = f"Detected issues: {filtered_issues}"
         file_context_global = f"Detected issues: {filtered_issues}"
@@ -198,69 +207,150 @@ def analyze():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/process', methods=['POST'])
-def process():
-    data = request.get_json()
-    try:
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], data['filename'])
-        if data['filename'].endswith('.csv'):
-            df = pd.read_csv(filepath)
-        elif data['filename'].endswith('.xlsx'):
-            df = pd.read_excel(filepath, engine='openpyxl')
+def run_processing(filename, methods, progress=None, plan_id=None, include_metrics=False, sheet=None):
+    """
+    Cleans an upload (one worksheet of it, for XLSX) and returns the /process
+    response body. With a plan_id the stored cleaning plan is applied as is;
+    otherwise a new plan is fitted and saved.
+    CSV files above STREAMING_THRESHOLD_BYTES are cleaned in row chunks.
+    include_metrics adds the per-stage profile of this run under 'metrics'.
+    """
+    run_metrics = {}
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    processor = make_processor()
+    plan = CleaningPlan.load(app.config['PLAN_FOLDER'], plan_id) if plan_id else None
+    output_filename = f'cleaned_{datetime.now().strftime("%Y%m%d%H%M%S")}_{uuid.uuid4().hex[:8]}.csv'
+    output_path = os.path.join(app.config['PROCESSED_FOLDER'], output_filename)
+
+    if filename.endswith('.csv') and os.path.getsize(filepath) > app.config['STREAMING_THRESHOLD_BYTES']:
+        # Too large to hold in memory: fit on a sample, clean chunk by chunk into the output file
+        result = chunked_processor.run(filepath, output_path, processor, methods, list(ISSUE_TYPES), plan=plan,
+                                       progress=progress)
+        run_metrics['chunked'] = result['stage_metrics']
+        preview_df = pd.read_csv(output_path, nrows=10)
+    else:
+        # process_data edits columns in place, so never hand it the cached frame
+        df = dataset_cache.get(filepath, sheet=sheet).copy()
+        if plan is not None:
+            cleaned_df = processor.transform(df, plan, progress=progress)
         else:
-            return jsonify({'error': 'Unsupported file format for processing'}), 400
-
-        # Detect issues and clean
-        all_detected_issues = analyzer.detect_all_issues(df)
-        cleaned_df = processor.process_data(df, data['methods'],all_detected_issues.keys())
+            # Detect issues and clean
+            analyzer_metrics = run_metrics.setdefault('analyzer', {})
+            profile = analyzer.profile(df, lambda: dataset_cache.profile(filepath, sheet=sheet),
+                                       stage_metrics=analyzer_metrics)
+            all_detected_issues = analyzer.detect_all_issues(df, profile=profile, stage_metrics=analyzer_metrics)
+            cleaned_df = processor.process_data(df, methods, all_detected_issues.keys(), profile=profile, progress=progress)
 
         # Save cleaned file
-        output_filename = f'cleaned_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
-        output_path = os.path.join(app.config['PROCESSED_FOLDER'], output_filename)
         cleaned_df.to_csv(output_path, index=False)
+        preview_df = cleaned_df.head(10)
 
-        # Build HTML preview of first 10 rows
-        cleaned_html = cleaned_df.head(10).to_html(
-            classes="table table-bordered table-striped table-sm text-center",
-            index=False,
-            border=0
-        )
+    if plan is None:
+        processor.plan.save(app.config['PLAN_FOLDER'])
 
-        # Ensure applied_methods is a list
-        methods = processor.applied_methods
-        if not isinstance(methods, list):
-            try:
-                methods = list(methods)
-            except Exception:
-                methods = [methods]
+    # Build HTML preview of first 10 rows
+    cleaned_html = preview_df.to_html(
+        classes="table table-bordered table-striped table-sm text-center",
+        index=False,
+        border=0
+    )
 
-        # Return download URL, applied methods, and HTML preview
-        return jsonify({
-            'download_url': f'/download/{output_filename}',
-            'applied_methods': methods,
-            'cleaned_data_html': cleaned_html
-        })
+    # Ensure applied_methods is a list
+    applied_methods = processor.applied_methods
+    if not isinstance(applied_methods, list):
+        try:
+            applied_methods = list(applied_methods)
+        except Exception:
+            applied_methods = [applied_methods]
+
+    # Return download URL, applied methods, and HTML preview
+    response = {
+        'download_url': f'/download/{output_filename}',
+        'applied_methods': applied_methods,
+        'format_issues': processor.format_issues,
+        'lexical_timings': processor.lexical_timings,
+        'stage_memory': processor.stage_memory,
+        'plan_id': processor.plan.plan_id,
+        'cleaned_data_html': cleaned_html
+    }
+    if include_metrics:
+        run_metrics['pipeline'] = processor.stage_metrics
+        response['metrics'] = run_metrics
+    return response
 
+@app.route('/process', methods=['POST'])
+def process():
+    data = request.get_json()
+    try:
+        if not data['filename'].endswith(('.csv', '.xlsx')):
+            return jsonify({'error': 'Unsupported file format for processing'}), 400
+        if data.get('plan_id') and not plan_exists(data['plan_id']):
+            return jsonify({'error': 'Unknown cleaning plan'}), 404
+        return jsonify(run_processing(data['filename'], data.get('methods', {}), plan_id=data.get('plan_id'),
+                                      include_metrics=bool(data.get('metrics')), sheet=data.get('sheet')))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/jobs/process', methods=['POST'])
+def submit_process_job():
+    """Queues the /process pipeline and returns a job id to poll."""
+    data = request.get_json()
+    if not data or not data.get('filename', '').endswith(('.csv', '.xlsx')):
+        return jsonify({'error': 'Unsupported file format for processing'}), 400
+    if not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], data['filename'])):
+        return jsonify({'error': 'File not found'}), 404
+
+    if data.get('plan_id') and not plan_exists(data['plan_id']):
+        return jsonify({'error': 'Unknown cleaning plan'}), 404
+
+    job_id = jobs.submit(run_processing, data['filename'], data.get('methods', {}), plan_id=data.get('plan_id'),
+                         include_metrics=bool(data.get('metrics')), sheet=data.get('sheet'),
+                         total_stages=len(PIPELINE_STAGES) - 1)
+    return jsonify({'job_id': job_id, 'status_url': f'/jobs/{job_id}'}), 202
+
+def plan_exists(plan_id):
+    return os.path.exists(os.path.join(app.config['PLAN_FOLDER'], f"{os.path.basename(plan_id)}.json"))
+
+@app.route('/plans/<plan_id>', methods=['GET'])
+def get_plan(plan_id):
+    """The fitted cleaning plan of a /process run, as JSON."""
+    if not plan_exists(plan_id):
+        return jsonify({'error': 'Unknown cleaning plan'}), 404
+    return jsonify(CleaningPlan.load(app.config['PLAN_FOLDER'], plan_id).to_dict())
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    status = jobs.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(status)
+
 @app.route('/visualize', methods=['POST'])
 def visualize():
     data = request.get_json()
     try:
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], data['filename'])
-        if data['filename'].endswith('.csv'):
-            df = pd.read_csv(filepath)
-        elif data['filename'].endswith('.xlsx'):
-            df = pd.read_excel(filepath, engine='openpyxl')
-        else:
+        if not data['filename'].endswith(('.csv', '.xlsx')):
             return jsonify({'error': 'Unsupported file format for visualization'}), 400
+        # The cache key names the file version, so cached charts are found without hashing the frame
+        dataset_hash = dataset_cache.version_hash(filepath, sheet=data.get('sheet'))
+        df = dataset_cache.get(filepath, sheet=data.get('sheet'))
 
-        before_plots = visualizer.visualize_all(df)
-        return jsonify({'before_plot': before_plots})
+        before_plots, chart_timings = visualizer.render_all(df, dataset_hash=dataset_hash)
+        return jsonify({'before_plot': before_plots, 'chart_timings': chart_timings})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage totals of the pipeline, analyzer and chart renderers in Prometheus text format."""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({'datasets': dataset_cache.stats(), 'charts': chart_cache.stats(), 'encoders': encoder_registry.stats(),
+                    'blocks': block_profiles.stats()})
+
 @app.route('/download/<filename>')
 def download(filename):
     return send_file(
@@ -306,18 +396,18 @@ def chat():
 def get_strategies():
     try:
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], file_name_global)
-        if file_name_global.endswith('.csv'):
-            df = pd.read_csv(filepath)
-            dp = DataProcessor()
-            dp.select_strategies(df)
+        if file_name_global.endswith(('.csv', '.xlsx')):
+            sheet = request.args.get('sheet')
+            df = dataset_cache.get(filepath, sheet=sheet)
+            dp = make_processor()
+            dp.select_strategies(df, profile=dataset_cache.profile(filepath, sheet=sheet))
             return jsonify({
                 "missing": dp.missing_strategies,
+                "missing_options": list(MISSING_STRATEGIES),
                 "outliers": dp.outlier_strategies,
                 "categorical_data_conversion": dp.encoding_strategies,
                 "dtypes": dp.integrity_strategies
             })
-        elif file_name_global.endswith('.xlsx'):
-            df = pd.read_excel(filepath, engine='openpyxl')
         else:
             return jsonify({'error': 'Unsupported file format for processing'}), 400
     except Exception as e:
@@ -0,0 +1,97 @@
+"""
+Rows/second of DataProcessor._standardize_formats against the previous
+per-cell implementation, on a synthetic customer file.
+
+    python benchmarks/bench_standardize_formats.py --rows 1000000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cleaning_plan import CleaningPlan
+from utils.data_processor import DataProcessor
+
+
+def legacy_standardize_formats(df):
+    """The per-cell implementation _standardize_formats replaced, kept as the baseline."""
+    df = df.copy()
+    issues = {}
+
+    for col in df.columns:
+        if df[col].dtype == "object":
+            issues[col] = {
+                "case_inconsistencies": df[col].apply(lambda x: isinstance(x, str) and x != x.lower()).sum(),
+                "leading_trailing_spaces": df[col].apply(lambda x: isinstance(x, str) and (x.startswith(" ") or x.endswith(" "))).sum(),
+                "multiple_spaces": df[col].apply(lambda x: isinstance(x, str) and bool(re.search(r'\s{2,}', x))).sum(),
+                "non_numeric_phone": df[col].apply(lambda x: isinstance(x, str) and col.lower() == "phone" and not x.replace(" ", "").isdigit()).sum(),
+                "date_format_issues": df[col].apply(lambda x: isinstance(x, str) and col.lower() == "date" and not bool(re.match(r'\d{4}-\d{2}-\d{2}', x))).sum(),
+            }
+
+            if col.lower() not in ["name"]:
+                df[col] = df[col].str.lower()
+
+            df[col] = df[col].str.strip()
+            df[col] = df[col].str.replace(r'\s+', ' ', regex=True)
+
+            if "phone" in col.lower():
+                df[col] = df[col].str.replace(r'\D', '', regex=True)
+                df[col] = df[col].apply(lambda x: f"({x[:3]}) {x[3:6]}-{x[6:]}" if len(x) == 10 else x)
+
+            if "date" in col.lower():
+                df[col] = pd.to_datetime(df[col], errors='coerce').dt.strftime('%Y-%m-%d')
+
+    return df, issues
+
+
+def make_customers(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    cities = np.array(["New York", " boston", "Chicago  ", "san  Francisco", "AUSTIN", "Denver"])
+    names = np.array([f"Customer {i}" for i in range(5000)])
+    phones = np.array([f"{rng.integers(200, 999)} {rng.integers(100, 999)}-{rng.integers(1000, 9999)}" for _ in range(20000)])
+    dates = pd.date_range("2020-01-01", periods=1500).strftime("%Y-%m-%d").to_numpy()
+    return pd.DataFrame({
+        "name": rng.choice(names, rows),
+        "city": rng.choice(cities, rows),
+        "phone": rng.choice(phones, rows),
+        "date": rng.choice(dates, rows),
+        "status": rng.choice(np.array(["Active", "inactive ", "PENDING"]), rows),
+    })
+
+
+def timed(fn, df):
+    start = time.perf_counter()
+    result = fn(df)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    df = make_customers(args.rows)
+    processor = DataProcessor()
+
+    (legacy_df, legacy_issues), legacy_seconds = timed(legacy_standardize_formats, df)
+    # _standardize_formats records its step in the plan and edits the frame in place
+    processor.plan = CleaningPlan.for_frame(df)
+    new_df, new_seconds = timed(processor._standardize_formats, df.copy())
+
+    assert new_df.equals(legacy_df), "vectorized output differs from the legacy implementation"
+    assert processor.format_issues == {col: {k: int(v) for k, v in counts.items()} for col, counts in legacy_issues.items()}
+
+    print(f"rows: {args.rows}")
+    print(f"before: {legacy_seconds:.2f}s ({args.rows / legacy_seconds:,.0f} rows/s)")
+    print(f"after:  {new_seconds:.2f}s ({args.rows / new_seconds:,.0f} rows/s)")
+    print(f"speedup: {legacy_seconds / new_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
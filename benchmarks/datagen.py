@@ -0,0 +1,112 @@
+"""
+Synthetic datasets for the benchmarks, with the problems the cleaning pipeline
+looks for: missing values, duplicate rows, outliers, numbers stored as text,
+inconsistent case and spacing, hashtags and camelCase tokens, mixed date formats.
+
+Values are drawn from small pools by index, so 10M-row frames are generated
+in seconds and the same seed always gives the same frame.
+"""
+import numpy as np
+import pandas as pd
+
+# Column kinds and how many of each make_dataset creates by default
+DEFAULT_COLUMNS = {'numeric': 4, 'categorical': 3, 'text': 2, 'date': 1, 'numeric_text': 1}
+
+WORDS = np.array([
+    'account', 'billing', 'customer', 'delivery', 'email', 'feedback', 'invoice', 'login', 'order', 'payment',
+    'refund', 'return', 'service', 'shipping', 'support', 'ticket', 'update', 'urgent', 'warranty', 'address',
+    'late', 'broken', 'missing', 'great', 'slow', 'fast', 'wrong', 'damaged', 'new', 'old',
+])
+
+
+def _messy_variants(values):
+    """Case, whitespace and token variants of every value in a pool, one row per value."""
+    values = np.asarray(values, dtype=str)
+    variants = [
+        np.char.upper(values),
+        np.char.add(' ', values),
+        np.char.add(values, '  '),
+        np.char.replace(values, ' ', '  '),
+        np.char.add('#', np.char.replace(np.char.title(values), ' ', '')),
+    ]
+    return np.stack(variants, axis=1).astype(object)
+
+
+def _pick(pool, rows, messy_rate, rng):
+    """rows values drawn from pool, messy_rate of them replaced by a messy variant of themselves."""
+    codes = rng.integers(0, len(pool), rows)
+    values = pool[codes]
+    messy = np.flatnonzero(rng.random(rows) < messy_rate)
+    if len(messy):
+        variants = _messy_variants(pool)
+        values[messy] = variants[codes[messy], rng.integers(0, variants.shape[1], len(messy))]
+    return values
+
+
+def _numeric(rows, outlier_rate, rng):
+    values = rng.normal(rng.uniform(-100, 100), rng.uniform(1, 20), rows)
+    outliers = np.flatnonzero(rng.random(rows) < outlier_rate)
+    spread = values.std() or 1.0
+    values[outliers] = values.mean() + rng.choice([-1, 1], len(outliers)) * rng.uniform(8, 20, len(outliers)) * spread
+    return values
+
+
+def _dates(rows, messy_rate, rng):
+    days = pd.date_range('2018-01-01', periods=2000)
+    pool = days.strftime('%Y-%m-%d').to_numpy(dtype=object)
+    other_formats = np.stack([days.strftime('%d/%m/%Y'), days.strftime('%b %d %Y')], axis=1).astype(object)
+    codes = rng.integers(0, len(pool), rows)
+    values = pool[codes]
+    messy = np.flatnonzero(rng.random(rows) < messy_rate)
+    values[messy] = other_formats[codes[messy], rng.integers(0, 2, len(messy))]
+    return values
+
+
+def make_dataset(rows, columns=None, null_rate=0.05, duplicate_rate=0.02, outlier_rate=0.01,
+                 cardinality=50, messy_text=0.2, seed=0):
+    """
+    Returns a DataFrame of `rows` rows.
+
+    columns maps a column kind (numeric, categorical, text, date, numeric_text)
+    to how many columns of it to create. cardinality is the number of distinct
+    categories per categorical column. null_rate, duplicate_rate, outlier_rate
+    and messy_text are the fractions of values set to null, rows copied from
+    another row, numeric values moved far into the tails and text values given
+    a case, whitespace or token problem.
+    """
+    rng = np.random.default_rng(seed)
+    columns = DEFAULT_COLUMNS if columns is None else columns
+    data = {}
+
+    categories = np.array([f"category {i}" for i in range(cardinality)], dtype=object)
+    phrases = np.array([' '.join(rng.choice(WORDS, rng.integers(2, 6))) for _ in range(max(cardinality * 20, 1000))],
+                       dtype=object)
+
+    for i in range(columns.get('numeric', 0)):
+        data[f'numeric_{i}'] = _numeric(rows, outlier_rate, rng)
+    for i in range(columns.get('categorical', 0)):
+        data[f'category_{i}'] = _pick(categories, rows, messy_text, rng)
+    for i in range(columns.get('text', 0)):
+        data[f'text_{i}'] = _pick(phrases, rows, messy_text, rng)
+    for i in range(columns.get('date', 0)):
+        data[f'date_{i}'] = _dates(rows, messy_text, rng)
+    for i in range(columns.get('numeric_text', 0)):
+        values = np.arange(100_000).astype(str).astype(object)[rng.integers(0, 100_000, rows)]
+        values[rng.random(rows) < messy_text / 10] = 'n/a'
+        data[f'code_{i}'] = values
+
+    for name, values in data.items():
+        nulls = rng.random(rows) < null_rate
+        if values.dtype == object:
+            values[nulls] = None
+        else:
+            values[nulls] = np.nan
+
+    duplicates = int(rows * duplicate_rate)
+    if duplicates:
+        targets = rng.choice(rows, duplicates, replace=False)
+        sources = rng.integers(0, rows, duplicates)
+        for values in data.values():
+            values[targets] = values[sources]
+
+    return pd.DataFrame(data)
@@ -0,0 +1,250 @@
+"""
+Throughput and peak memory of DataAnalyzer.detect_all_issues,
+DataProcessor.process_data and DataVisualization.render_all on synthetic
+datasets (see datagen.py) of increasing size, written to a JSON file.
+
+    python benchmarks/run_benchmarks.py --sizes 10000,100000,1000000
+    python benchmarks/run_benchmarks.py --sizes 10000000 --stages analyzer,processor
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<earlier run>.json
+
+Each stage is timed --repeat times without tracing and the median counts; it is
+then run once more under tracemalloc for its peak memory (skip with --no-memory),
+so tracing never slows the timed runs. Charts are rendered in-process
+(--chart-workers 1) so their memory is traced too; memory of lexical pool
+workers is not (--lexical-workers 1 keeps them in-process).
+
+--compare prints the change against an earlier results file and exits with
+status 1 when a stage got slower by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.datagen import DEFAULT_COLUMNS, make_dataset
+from utils.chart_cache import ChartCache
+from utils.data_analyzer import DataAnalyzer, ISSUE_TYPES
+from utils.data_processor import DataProcessor
+from utils.data_visualization import DataVisualization
+from utils.lexical import LexicalEngine
+from utils.memory_tracker import StageMemoryTracker
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+STAGES = ('analyzer', 'processor', 'visualizer')
+
+
+def run_analyzer(df, args, track_memory):
+    analyzer = DataAnalyzer()
+    stage_metrics = {}
+    start = time.perf_counter()
+    profile = analyzer.profile(df, stage_metrics=stage_metrics)
+    analyzer.detect_all_issues(df, profile=profile, stage_metrics=stage_metrics)
+    seconds = time.perf_counter() - start
+    return seconds, {stage: {'seconds': values['wall_seconds']} for stage, values in stage_metrics.items()}
+
+
+def run_processor(df, args, track_memory):
+    processor = DataProcessor(lexical_engine=LexicalEngine(workers=args.lexical_workers), track_memory=track_memory)
+    # process_data edits its input, and the copy is not part of the stage
+    df = df.copy()
+    start = time.perf_counter()
+    processor.process_data(df, {}, list(ISSUE_TYPES))
+    seconds = time.perf_counter() - start
+    breakdown = {stage: {'seconds': values['wall_seconds']} for stage, values in processor.stage_metrics.items()}
+    for stage, usage in processor.stage_memory.items():
+        breakdown[stage]['peak_memory_bytes'] = usage['peak_bytes']
+    return seconds, breakdown
+
+
+def run_visualizer(df, args, track_memory):
+    with tempfile.TemporaryDirectory() as folder:
+        # A fresh cache per run, so every chart is rendered
+        visualizer = DataVisualization(workers=args.chart_workers, chart_cache=ChartCache(folder))
+        start = time.perf_counter()
+        _, timings = visualizer.render_all(df)
+        seconds = time.perf_counter() - start
+    breakdown = {}
+    for timing in timings:
+        chart = breakdown.setdefault(timing['chart'], {'seconds': 0.0})
+        chart['seconds'] += timing['seconds']
+    return seconds, breakdown
+
+
+RUNNERS = {'analyzer': run_analyzer, 'processor': run_processor, 'visualizer': run_visualizer}
+
+
+def peak_memory(runner, df, args):
+    """Runs the stage once under tracemalloc; returns its peak bytes and breakdown."""
+    if runner is run_processor:
+        # The processor traces its own stages; its peak is the highest of theirs
+        _, breakdown = runner(df, args, True)
+        return max((stage.get('peak_memory_bytes', 0) for stage in breakdown.values()), default=0), breakdown
+    tracker = StageMemoryTracker()
+    tracker.start('run')
+    try:
+        _, breakdown = runner(df, args, True)
+    finally:
+        stages = tracker.stop()
+    return stages['run']['peak_bytes'], breakdown
+
+
+def benchmark(stage, df, args):
+    runner = RUNNERS[stage]
+    runs, breakdowns = [], []
+    for _ in range(args.repeat):
+        seconds, breakdown = runner(df, args, False)
+        runs.append(seconds)
+        breakdowns.append(breakdown)
+
+    seconds = statistics.median(runs)
+    # Breakdown of the median run
+    breakdown = breakdowns[runs.index(sorted(runs)[(len(runs) - 1) // 2])]
+    result = {
+        'stage': stage,
+        'rows': len(df),
+        'seconds': round(seconds, 6),
+        'runs': [round(run, 6) for run in runs],
+        'rows_per_second': round(len(df) / seconds, 1) if seconds else None,
+        'peak_memory_bytes': None,
+        'breakdown': {name: {key: round(value, 6) for key, value in values.items()}
+                      for name, values in breakdown.items()},
+    }
+    if args.memory:
+        peak, traced_breakdown = peak_memory(runner, df, args)
+        result['peak_memory_bytes'] = peak
+        for name, values in traced_breakdown.items():
+            if 'peak_memory_bytes' in values and name in result['breakdown']:
+                result['breakdown'][name]['peak_memory_bytes'] = values['peak_memory_bytes']
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Prints current against baseline per (stage, rows); returns the regressions."""
+    previous = {(entry['stage'], entry['rows']): entry for entry in baseline['results'] if 'error' not in entry}
+    regressions = []
+    print(f"\n{'stage':<12}{'rows':>12}{'before s':>12}{'after s':>12}{'time':>9}{'memory':>9}")
+    for entry in results:
+        before = previous.get((entry['stage'], entry['rows']))
+        if before is None or 'error' in entry:
+            continue
+        time_ratio = entry['seconds'] / before['seconds'] if before['seconds'] else float('nan')
+        memory_ratio = (entry['peak_memory_bytes'] / before['peak_memory_bytes']
+                        if entry['peak_memory_bytes'] and before['peak_memory_bytes'] else float('nan'))
+        print(f"{entry['stage']:<12}{entry['rows']:>12,}{before['seconds']:>12.3f}{entry['seconds']:>12.3f}"
+              f"{time_ratio:>8.2f}x{memory_ratio:>8.2f}x")
+        if time_ratio > 1 + threshold:
+            regressions.append((entry['stage'], entry['rows'], time_ratio))
+    return regressions
+
+
+def parse_columns(text):
+    columns = dict(DEFAULT_COLUMNS)
+    for item in filter(None, text.split(',')):
+        kind, count = item.split('=')
+        if kind not in DEFAULT_COLUMNS:
+            raise argparse.ArgumentTypeError(f"Unknown column kind: {kind}")
+        columns[kind] = int(count)
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="comma-separated row counts (default: %(default)s)")
+    parser.add_argument("--stages", default=','.join(STAGES), help="comma-separated subset of %(default)s")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the traced memory run")
+    parser.add_argument("--chart-workers", type=int, default=1)
+    parser.add_argument("--lexical-workers", type=int, help="lexical process pool size (default: one per CPU)")
+    parser.add_argument("--columns", type=parse_columns, default=dict(DEFAULT_COLUMNS),
+                        help="column mix as kind=count pairs, e.g. numeric=8,text=0 (kinds: %s)"
+                             % ', '.join(DEFAULT_COLUMNS))
+    parser.add_argument("--null-rate", type=float, default=0.05)
+    parser.add_argument("--duplicate-rate", type=float, default=0.02)
+    parser.add_argument("--outlier-rate", type=float, default=0.01)
+    parser.add_argument("--cardinality", type=int, default=50)
+    parser.add_argument("--messy-text", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>_<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    stages = [stage for stage in args.stages.split(',') if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)}")
+
+    generator = {'columns': args.columns, 'null_rate': args.null_rate, 'duplicate_rate': args.duplicate_rate,
+                 'outlier_rate': args.outlier_rate, 'cardinality': args.cardinality,
+                 'messy_text': args.messy_text, 'seed': args.seed}
+    commit = git_commit()
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': args.repeat,
+        'chart_workers': args.chart_workers,
+        'lexical_workers': args.lexical_workers,
+        'generator': generator,
+        'results': [],
+    }
+
+    for rows in (int(size) for size in args.sizes.split(',')):
+        df = make_dataset(rows, **generator)
+        for stage in stages:
+            try:
+                result = benchmark(stage, df, args)
+            except Exception as e:
+                # Recorded rather than raised, so one broken stage does not lose the other results
+                report['results'].append({'stage': stage, 'rows': rows, 'error': f"{type(e).__name__}: {e}"})
+                print(f"{stage:<12}{rows:>12,} rows  failed: {type(e).__name__}: {e}")
+                continue
+            report['results'].append(result)
+            peak = result['peak_memory_bytes']
+            print(f"{stage:<12}{rows:>12,} rows  {result['seconds']:>9.3f}s  {result['rows_per_second']:>14,.0f} rows/s"
+                  + (f"  peak {peak / 2 ** 20:,.1f} MB" if peak is not None else ""))
+        del df
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_FOLDER, exist_ok=True)
+        output = os.path.join(RESULTS_FOLDER, f"{(commit or 'nocommit')[:8]}_{datetime.now():%Y%m%d%H%M%S}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"results: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(report['results'], json.load(f), args.threshold)
+        for stage, rows, ratio in regressions:
+            print(f"regression: {stage} at {rows:,} rows is {ratio:.2f}x slower")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,40 @@ import os
 class Config:
     UPLOAD_FOLDER = 'data/uploads'
     PROCESSED_FOLDER = 'data/processed'
+    SNAPSHOT_FOLDER = 'data/snapshots'
+    PLAN_FOLDER = 'data/plans'
     ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'pdf', 'sql'}
     SECRET_KEY = 'your-secret-key-here'
+    STREAMING_THRESHOLD_BYTES = int(os.getenv('STREAMING_THRESHOLD_BYTES', 512 * 1024 * 1024))
+    ANALYZE_CHUNK_SIZE = 100_000
+    PROCESS_CHUNK_ROWS = int(os.getenv('PROCESS_CHUNK_ROWS', 100_000))
+    PROCESS_SAMPLE_ROWS = int(os.getenv('PROCESS_SAMPLE_ROWS', 100_000))
+    DATASET_CACHE_MAX_BYTES = int(os.getenv('DATASET_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+    SPELLING_CACHE_PATH = 'data/cache/spelling.sqlite'
+    ENCODER_REGISTRY_PATH = 'data/cache/encoders.sqlite'
+    BLOCK_PROFILE_PATH = 'data/cache/blocks.sqlite'
+    BLOCK_PROFILE_ROWS = int(os.getenv('BLOCK_PROFILE_ROWS', 50_000))
+    SPELLING_WORKERS = int(os.getenv('SPELLING_WORKERS', os.cpu_count() or 1))
+    LEXICAL_WORKERS = int(os.getenv('LEXICAL_WORKERS', os.cpu_count() or 1))
+    TRACK_STAGE_MEMORY = os.getenv('TRACK_STAGE_MEMORY', '0') == '1'
+    DUPLICATE_WORKERS = int(os.getenv('DUPLICATE_WORKERS', os.cpu_count() or 1))
+    IMPUTATION_WORKERS = int(os.getenv('IMPUTATION_WORKERS', os.cpu_count() or 1))
+    IMPUTATION_SAMPLE_ROWS = int(os.getenv('IMPUTATION_SAMPLE_ROWS', 50_000))
+    MAX_ENCODED_COLUMNS = int(os.getenv('MAX_ENCODED_COLUMNS', 1000))
+    ENCODER_MAX_CATEGORIES = int(os.getenv('ENCODER_MAX_CATEGORIES', 10_000))
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_RETENTION = 100
+    CHART_WORKERS = int(os.getenv('CHART_WORKERS', os.cpu_count() or 1))
+    MAX_CHARTS = 30
+    CHART_CACHE_MAX_BYTES = int(os.getenv('CHART_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    SQL_IMPORT_BATCH_ROWS = 10_000
+    PDF_WORKERS = int(os.getenv('PDF_WORKERS', os.cpu_count() or 1))
+    PDF_CACHE_FOLDER = 'data/cache/pdf'
     
     @staticmethod
     def init_app(app):
         os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
         os.makedirs(Config.PROCESSED_FOLDER, exist_ok=True)
+        os.makedirs(Config.SNAPSHOT_FOLDER, exist_ok=True)
+        os.makedirs(Config.PLAN_FOLDER, exist_ok=True)
 
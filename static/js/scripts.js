@@ -343,8 +343,9 @@ function processData() {
   document.getElementById("process-btn").disabled = true;
 
   console.log(currentFilename)
-  // Send only the filename; backend will process all issues generically
-  fetch("/process", {
+  // Send only the filename; backend will process all issues generically.
+  // The pipeline runs as a background job which we poll for progress.
+  fetch("/jobs/process", {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
@@ -353,22 +354,42 @@ function processData() {
       filename: currentFilename,
     }),
   })
+    .then((response) => response.json())
+    .then((data) => {
+      if (data.error) {
+        throw new Error(data.error);
+      }
+      pollProcessJob(data.status_url);
+    })
+    .catch(handleProcessError);
+}
+
+function pollProcessJob(statusUrl) {
+  fetch(statusUrl)
     .then((response) => {
       if (!response.ok) {
         throw new Error(`HTTP error! Status: ${response.status}`);
       }
       return response.json();
     })
-    .then((data) => {
-      // Hide loading spinner
-      document.getElementById("loading-container").style.display = "none";
-
-      if (data.error) {
-        showError("1Processing failed: " + data);
-        document.getElementById("process-btn").disabled = false;
+    .then((job) => {
+      if (job.status === "failed") {
+        throw new Error(job.error);
+      }
+      if (job.status !== "done") {
+        const percent = Math.round((job.progress || 0) * 100);
+        document.getElementById("loading-text").textContent = job.stage
+          ? `Cleaning your data... ${job.stage} (${percent}%)`
+          : "Cleaning your data...";
+        setTimeout(() => pollProcessJob(statusUrl), 1000);
         return;
       }
 
+      const data = job.result;
+
+      // Hide loading spinner
+      document.getElementById("loading-container").style.display = "none";
+
       // Enable download button and set the link
       document.getElementById("download-link").href = data.download_url;
 
@@ -386,12 +407,14 @@ function processData() {
       );
       successModal.show();
     })
-    .catch((error) => {
-      document.getElementById("loading-container").style.display = "none";
-      document.getElementById("process-btn").disabled = false;
-      showError("2Processing failed: " + error.message);
-      console.error("Error:", error);
-    });
+    .catch(handleProcessError);
+}
+
+function handleProcessError(error) {
+  document.getElementById("loading-container").style.display = "none";
+  document.getElementById("process-btn").disabled = false;
+  showError("Processing failed: " + error.message);
+  console.error("Error:", error);
 }
 
 function resetFileUpload() {
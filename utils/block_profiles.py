@@ -0,0 +1,255 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from utils.column_profile import DatasetProfile, NumericStats, ValueStats
+from utils.duplicates import DuplicateEngine
+from utils.sketches import QuantileSketch
+
+# Bumped whenever the stored block format, NumericStats or ValueStats changes, so old blocks are never reused
+BLOCK_FORMAT = 2
+
+# Multiplier of splitmix64, spreads the tail bytes of a record over the whole cut key
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def schema_fingerprint(df):
+    """Hash of df's column names and dtypes; blocks are only reused within one schema."""
+    schema = [BLOCK_FORMAT] + [[str(col), str(dtype)] for col, dtype in df.dtypes.items()]
+    return hashlib.sha1(json.dumps(schema).encode('utf-8')).hexdigest()
+
+
+def csv_blocks(data, block_rows, max_block_rows=None):
+    """
+    Cuts the raw bytes of a CSV file into content-defined blocks of whole
+    records without parsing it. Returns the (start, end, rows) byte range and
+    row count of every block after the header.
+
+    A block ends after every record whose last 16 bytes hash to 0 modulo
+    block_rows, so blocks average block_rows records and an inserted, deleted
+    or edited record only changes the block it falls in. Newlines inside quoted
+    fields do not end a record, and blank lines are not rows (pandas skips
+    them). Blocks are split at max_block_rows records (4 x block_rows).
+    """
+    max_block_rows = max_block_rows or 4 * block_rows
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buffer == ord('\n'))
+    quotes = np.flatnonzero(buffer == ord('"'))
+    if len(quotes):
+        newlines = newlines[np.searchsorted(quotes, newlines) % 2 == 0]
+    ends = newlines + 1
+    if len(buffer) and (not len(ends) or ends[-1] < len(buffer)):
+        ends = np.append(ends, len(buffer))
+    if len(ends) < 2:
+        return []
+    starts, ends = ends[:-1], ends[1:]
+
+    # Content ends before the record's '\n' or '\r\n'
+    content_end = ends - (buffer[ends - 1] == ord('\n'))
+    content_end -= (content_end > starts) & (buffer[np.maximum(content_end - 1, 0)] == ord('\r'))
+    rows = (content_end > starts).astype(np.int64)
+
+    tail = np.maximum(content_end[:, None] - np.arange(16, 0, -1), 0)
+    words = np.ascontiguousarray(buffer[tail]).view('<u8')
+    keys = (words[:, 0] * _MIX ^ words[:, 1]) * _MIX
+    cuts = np.flatnonzero((keys >> np.uint64(32)) % np.uint64(block_rows) == 0) + 1
+    edges = np.unique(np.concatenate([[0], cuts, [len(ends)]]))
+    row_offsets = np.concatenate([[0], np.cumsum(rows)])
+
+    blocks = []
+    for first, last in zip(edges[:-1], edges[1:]):
+        for piece in range(first, last, max_block_rows):
+            end = min(piece + max_block_rows, last)
+            blocks.append((int(starts[piece]), int(ends[end - 1]), int(row_offsets[end] - row_offsets[piece])))
+    return blocks
+
+
+class _Block:
+    """Everything stored for one row block: its row fingerprints, null counts and per-column stats."""
+
+    def __init__(self, fingerprints, null_counts, stats):
+        self.fingerprints = fingerprints
+        self.null_counts = null_counts
+        self.stats = stats
+
+    def pack(self):
+        """The block as compact npz bytes, columns in order."""
+        numeric = [part for part in self.stats if isinstance(part, NumericStats)]
+        values = [part for part in self.stats if isinstance(part, ValueStats)]
+        hashes = [part.hashes for part in self.stats]
+        levels = [(i, level, items) for i, part in enumerate(numeric) for level, items in enumerate(part.sketch.levels)]
+        buffer = io.BytesIO()
+        np.savez(buffer,
+                 fingerprints=self.fingerprints,
+                 null_counts=np.asarray(self.null_counts, dtype=np.int64),
+                 offsets=np.cumsum([0] + [len(part) for part in hashes]).astype(np.int64),
+                 hashes=np.concatenate(hashes) if hashes else np.empty(0, np.uint64),
+                 moments=np.array([[part.count, part.mean, part.m2, part.m3] for part in numeric],
+                                  dtype=np.float64).reshape(-1, 4),
+                 sketch_items=np.concatenate([items for *_, items in levels]) if levels else np.empty(0),
+                 sketch_levels=np.array([[i, level, len(items)] for i, level, items in levels],
+                                        dtype=np.int64).reshape(-1, 3),
+                 value_counts=np.array([[part.numeric, part.isnumeric] for part in values],
+                                       dtype=np.int64).reshape(-1, 2),
+                 value_flags=np.array([[part.format_issue, part.lexical_issue] for part in values],
+                                      dtype=bool).reshape(-1, 2))
+        return buffer.getvalue()
+
+    @classmethod
+    def unpack(cls, data, numeric):
+        """Reverses pack(); numeric says which columns hold NumericStats."""
+        with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+            # Every lookup in an NpzFile reads the member again
+            arrays = dict(npz)
+        offsets, hashes = arrays['offsets'], arrays['hashes']
+        sketches = [QuantileSketch() for _ in range(int(sum(numeric)))]
+        position = 0
+        for i, level, length in arrays['sketch_levels']:
+            sketch = sketches[i]
+            sketch.levels.extend(np.empty(0) for _ in range(level + 1 - len(sketch.levels)))
+            sketch.levels[level] = arrays['sketch_items'][position:position + length]
+            sketch.count += int(length) << int(level)
+            position += length
+
+        stats, numeric_index, value_index = [], 0, 0
+        for i, is_numeric in enumerate(numeric):
+            column_hashes = hashes[offsets[i]:offsets[i + 1]]
+            if is_numeric:
+                count, mean, m2, m3 = arrays['moments'][numeric_index]
+                stats.append(NumericStats(count=int(count), mean=mean, m2=m2, m3=m3,
+                                          sketch=sketches[numeric_index], hashes=column_hashes))
+                numeric_index += 1
+            else:
+                value_numeric, isnumeric = arrays['value_counts'][value_index]
+                format_issue, lexical_issue = arrays['value_flags'][value_index]
+                stats.append(ValueStats(nunique=len(column_hashes), numeric=int(value_numeric),
+                                        isnumeric=int(isnumeric), format_issue=bool(format_issue),
+                                        lexical_issue=bool(lexical_issue), hashes=column_hashes))
+                value_index += 1
+        return cls(arrays['fingerprints'], arrays['null_counts'], stats)
+
+
+class BlockProfileStore:
+    """
+    Builds DatasetProfiles incrementally, for CSV uploads that are new versions
+    of a dataset seen before (daily snapshots where most rows did not change).
+
+    The raw file is cut into content-defined blocks of about block_rows records
+    (csv_blocks), each identified by the hash of its bytes. Everything the
+    profile needs from a block is stored in SQLite under (schema, block hash):
+    its row fingerprints, per-column null counts, NumericStats (moments, quantile
+    sketch, distinct value hashes) and ValueStats (string checks, distinct value
+    hashes). A later upload only profiles the rows of the blocks it does not find
+    there; the rest are merged without being parsed or hashed again.
+
+    The resulting profile equals DatasetProfile(df), except that distinct counts
+    come from value hashes (which tell 1 and '1' in an object column apart no
+    better than DuplicateEngine does) and numeric quartiles and outlier counts
+    come from merged quantile sketches. Other uploads (XLSX) are profiled in
+    full. At most max_blocks blocks are kept, oldest dropped first.
+    """
+
+    def __init__(self, path, block_rows=50_000, max_blocks=20_000, duplicate_engine=None):
+        self.path = path
+        self.block_rows = block_rows
+        self.max_blocks = max_blocks
+        self.duplicate_engine = duplicate_engine or DuplicateEngine()
+        self.reused_blocks = 0
+        self.scanned_blocks = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS blocks (schema TEXT NOT NULL, block TEXT NOT NULL,"
+                         " stats BLOB NOT NULL, PRIMARY KEY (schema, block))")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def profile(self, df, filepath):
+        """DatasetProfile of df, parsed from filepath, reusing the stored blocks of every unchanged byte range."""
+        if not filepath.endswith('.csv') or df.empty:
+            return DatasetProfile(df, duplicate_engine=self.duplicate_engine)
+        with open(filepath, 'rb') as file:
+            data = file.read()
+        blocks = csv_blocks(data, self.block_rows)
+        if sum(rows for *_, rows in blocks) != len(df):
+            # The file splits into rows differently than pandas read it (a lone '\r' line ending, say)
+            return DatasetProfile(df, duplicate_engine=self.duplicate_engine)
+
+        schema = schema_fingerprint(df)
+        numeric = [pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+                   for col in df.columns]
+        view = memoryview(data)
+        keys = [hashlib.sha1(view[start:end]).hexdigest() for start, end, _ in blocks]
+        stored = self._load(schema, set(keys), numeric)
+
+        # Row ranges of the blocks to profile, each once even if it occurs twice
+        offsets = np.cumsum([0] + [rows for *_, rows in blocks])
+        missing = {key: (int(offsets[i]), int(offsets[i + 1])) for i, key in enumerate(keys) if key not in stored}
+        new_blocks = self._profile_blocks(df, missing, numeric) if missing else {}
+        stored.update(new_blocks)
+        self._store(schema, new_blocks)
+        merged = [stored[key] for key in keys]
+        with self._lock:
+            self.scanned_blocks += len(new_blocks)
+            self.reused_blocks += len(merged) - len(new_blocks)
+
+        null_counts = np.sum([block.null_counts for block in merged], axis=0)
+        column_stats = {col: (NumericStats if numeric[i] else ValueStats).merged([block.stats[i] for block in merged])
+                        for i, col in enumerate(df.columns)}
+        return DatasetProfile(df, duplicate_engine=self.duplicate_engine, column_stats=column_stats,
+                              null_counts={col: int(count) for col, count in zip(df.columns, null_counts)},
+                              fingerprints=np.concatenate([block.fingerprints for block in merged]))
+
+    def _profile_blocks(self, df, bounds, numeric):
+        """_Blocks of the given row ranges of df, keyed like bounds."""
+        lengths = np.array([end - start for start, end in bounds.values()])
+        block_ids = np.repeat(np.arange(len(bounds)), lengths)
+        if lengths.sum() == len(df):
+            # Ranges are disjoint and in order, so covering every row means the whole frame
+            part = df
+        else:
+            part = df.take(np.concatenate([np.arange(start, end) for start, end in bounds.values()]))
+        fingerprints = np.split(self.duplicate_engine.fingerprints(part), np.cumsum(lengths)[:-1])
+        null_counts = np.stack([np.bincount(block_ids, weights=part[col].isna().to_numpy(), minlength=len(bounds))
+                                for col in df.columns], axis=1).astype(np.int64)
+        per_column = []
+        for col, is_numeric in zip(df.columns, numeric):
+            series = part[col]
+            if is_numeric:
+                per_column.append(NumericStats.of_blocks(series, block_ids, len(bounds)))
+            else:
+                per_column.append(ValueStats.of_blocks(series, block_ids, len(bounds), text=series.dtype == 'object'))
+        return {key: _Block(fingerprints[i], null_counts[i], [stats[i] for stats in per_column])
+                for i, key in enumerate(bounds)}
+
+    def _load(self, schema, keys, numeric):
+        stored = {}
+        keys = list(keys)
+        with closing(self._connect()) as conn:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                for key, data in conn.execute(f"SELECT block, stats FROM blocks WHERE schema = ? AND block IN"
+                                              f" ({placeholders})", [schema] + batch):
+                    stored[key] = _Block.unpack(data, numeric)
+        return stored
+
+    def _store(self, schema, blocks):
+        if not blocks:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO blocks (schema, block, stats) VALUES (?, ?, ?)",
+                             [(schema, key, block.pack()) for key, block in blocks.items()])
+            conn.execute("DELETE FROM blocks WHERE rowid <= (SELECT MAX(rowid) FROM blocks) - ?", (self.max_blocks,))
+
+    def stats(self):
+        with self._lock:
+            return {'reused_blocks': self.reused_blocks, 'scanned_blocks': self.scanned_blocks}
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# Integer-valued columns whose range is at most this many times their length
+# take their mode from np.bincount; wider ones sort their values instead
+BINCOUNT_RANGE_FACTOR = 4
+
+
+def _numeric(series):
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def _mode(values):
+    """Most frequent non-NaN value of a 1-D float array, the smallest on ties (like Series.mode()[0])."""
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return np.nan
+    low, high = values.min(), values.max()
+    if (np.isfinite(low) and np.isfinite(high) and high - low <= BINCOUNT_RANGE_FACTOR * values.size
+            and np.array_equal(values, np.floor(values))):
+        return low + np.argmax(np.bincount((values - low).astype(np.int64)))
+    unique, counts = np.unique(values, return_counts=True)
+    return unique[np.argmax(counts)]
+
+
+def block_statistics(df, needs):
+    """
+    Statistics of many columns of df at once. needs maps a column to the set of
+    statistics it needs ('mean', 'median', 'mode', 'quartiles'); the result maps
+    it to {statistic: value}, quartiles being a (q1, q3) pair.
+
+    Numeric columns are read into one float matrix and every statistic is a single
+    NumPy reduction over it (nanmean, nanmedian, nanquantile along the rows), so
+    the cost is one pass per statistic rather than one per column. The values are
+    the ones Series.mean/median/quantile/mode()[0] give. Other columns fall back to
+    their Series methods.
+    """
+    numeric = [col for col in needs if _numeric(df[col])]
+    stats = {col: {} for col in needs}
+    if numeric:
+        # Column-major, so every reduction runs down contiguous columns as a Series one would
+        X = np.asfortranarray(df[numeric].to_numpy(dtype=np.float64, na_value=np.nan))
+        present = ~np.isnan(X).all(axis=0)
+
+        def wanted(name):
+            return [j for j, col in enumerate(numeric) if name in needs[col] and present[j]]
+
+        if columns := wanted('mean'):
+            for j, value in zip(columns, np.nanmean(X[:, columns], axis=0)):
+                stats[numeric[j]]['mean'] = value
+        if columns := wanted('median'):
+            for j, value in zip(columns, np.nanmedian(X[:, columns], axis=0)):
+                stats[numeric[j]]['median'] = value
+        if columns := wanted('quartiles'):
+            q1, q3 = np.nanquantile(X[:, columns], [0.25, 0.75], axis=0)
+            for j, low, high in zip(columns, q1, q3):
+                stats[numeric[j]]['quartiles'] = (low, high)
+        for j in wanted('mode'):
+            mode = _mode(X[:, j])
+            stats[numeric[j]]['mode'] = int(mode) if pd.api.types.is_integer_dtype(df[numeric[j]]) else mode
+        for j in np.flatnonzero(~present):
+            # Series statistics of an all-null column are NaN
+            stats[numeric[j]].update({name: (np.nan, np.nan) if name == 'quartiles' else np.nan
+                                      for name in needs[numeric[j]]})
+
+    for col in needs:
+        if col in numeric:
+            continue
+        series = df[col]
+        for name in needs[col]:
+            if name == 'mode':
+                stats[col][name] = series.mode()[0]
+            elif name == 'quartiles':
+                stats[col][name] = tuple(series.quantile([0.25, 0.75]))
+            else:
+                stats[col][name] = getattr(series, name)()
+    return stats
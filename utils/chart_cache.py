@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+
+def dataset_fingerprint(df):
+    """Content hash of a DataFrame: values, column names and dtypes."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ChartCache:
+    """
+    Content-addressed store for rendered charts.
+
+    A chart's file name is derived from the dataset fingerprint, the chart type,
+    its parameters and the renderer version, so identical requests map to the
+    same file and different datasets never overwrite each other's images. Once
+    the folder holds more than max_bytes of charts the least recently used ones
+    are deleted.
+    """
+
+    def __init__(self, folder, max_bytes=256 * 1024 * 1024, renderer_version=1):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.renderer_version = renderer_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def path_for(self, dataset_hash, chart, params):
+        key = json.dumps([dataset_hash, chart, params, self.renderer_version], sort_keys=True, default=str)
+        digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+        return f"{self.folder}/{chart}_{digest}.png"
+
+    def lookup(self, path):
+        """Returns True if path is already rendered, marking it as recently used."""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def evict(self):
+        """Deletes the least recently used charts until the folder fits max_bytes."""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.folder):
+                if entry.is_file() and entry.name.endswith('.png'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,488 @@
+import os
+import tempfile
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from utils.cleaning_plan import CleaningPlan, to_jsonable
+from utils.duplicates import DuplicateEngine
+from utils.metrics import StageProfiler
+from utils.sketches import QuantileSketch
+from utils.streaming_analysis import _RowHashPartitions
+
+# Stage boundaries of ChunkedProcessor.run, in order
+CHUNKED_STAGES = ('scan', 'fit', 'statistics', 'transform', 'done')
+
+# Encoders whose fitted parameters are a category list or value counts
+COUNTED_ENCODERS = ('label', 'one_hot', 'ordinal', 'frequency', 'category')
+
+
+class _ColumnKind:
+    """Tracks, chunk by chunk, the dtype pandas would infer for a column on a full read."""
+
+    def __init__(self):
+        self.non_null = 0
+        self.numeric = 0
+        self.integer = 0
+        self.has_null = False
+
+    def update(self, series):
+        non_null = series.dropna()
+        self.has_null = self.has_null or len(non_null) < len(series)
+        all_numeric = self.numeric == self.non_null
+        self.non_null += len(non_null)
+        if all_numeric:
+            self.numeric += int(pd.to_numeric(non_null, errors='coerce').notna().sum())
+            self.integer += int(non_null.str.fullmatch(r'\s*[+-]?\d+\s*').sum())
+
+    @property
+    def dtype(self):
+        if self.non_null == 0:
+            return 'float64'
+        if self.numeric < self.non_null:
+            return 'object'
+        if self.integer == self.non_null and not self.has_null:
+            return 'int64'
+        return 'float64'
+
+
+class _ColumnStats:
+    """Global statistics of one column gathered over chunks: sum/count, a quantile sketch, value counts."""
+
+    def __init__(self, needs):
+        self.needs = needs
+        self.total = 0.0
+        self.count = 0
+        self.sketch = QuantileSketch() if needs & {'median', 'quartiles'} else None
+        self.counts = None
+
+    def update(self, series):
+        if 'mean' in self.needs:
+            self.total += float(series.sum())
+            self.count += int(series.count())
+        if self.sketch is not None:
+            self.sketch.update(series.to_numpy(dtype=np.float64, na_value=np.nan))
+        if self.needs & {'mode', 'counts'}:
+            counts = series.value_counts()
+            if isinstance(counts.index, pd.CategoricalIndex):
+                counts.index = counts.index.astype(object)
+            self.counts = counts if self.counts is None else self.counts.add(counts, fill_value=0)
+
+    def statistic(self, name):
+        if name == 'mean':
+            return self.total / self.count if self.count else np.nan
+        if name == 'median':
+            return self.sketch.quantile(0.5)
+        if name == 'mode':
+            counts = self.value_counts()
+            if counts.empty:
+                return np.nan
+            modes = counts.index[counts.to_numpy() == counts.max()]
+            try:
+                # Series.mode() breaks ties by returning the smallest value first
+                return modes.sort_values()[0]
+            except TypeError:
+                return modes[0]
+        raise ValueError(f"Unknown statistic: {name}")
+
+    def value_counts(self):
+        if self.counts is None:
+            return pd.Series(dtype=np.int64)
+        return self.counts.astype(np.int64).sort_values(ascending=False, kind='stable')
+
+    def categories(self):
+        return pd.Categorical(self.value_counts().index).categories
+
+
+class _RowPositions(_RowHashPartitions):
+    """
+    Row fingerprints kept with their row numbers, spilled to temporary files by
+    fingerprint, so equal rows always land in the same partition and duplicates
+    can be found one partition at a time.
+    """
+
+    def __init__(self, buffer_rows, partition_bits=8):
+        super().__init__(partition_bits=partition_bits, buffer_rows=buffer_rows)
+        self.rows = 0
+
+    def add(self, fingerprints):
+        fingerprints = fingerprints.reshape(len(fingerprints), -1)
+        if self.dtype.names is None:
+            self.dtype = np.dtype([(f"hash{i}", np.uint64) for i in range(fingerprints.shape[1])] + [('row', np.int64)])
+        records = np.empty(len(fingerprints), dtype=self.dtype)
+        for i in range(fingerprints.shape[1]):
+            records[f"hash{i}"] = fingerprints[:, i]
+        records['row'] = np.arange(self.rows, self.rows + len(records))
+        self.rows += len(records)
+        self._buffer.append(records)
+        self._buffered += len(records)
+        if self._buffered >= self.buffer_rows:
+            self._spill()
+
+    def duplicated(self, keep='first'):
+        """Row numbers of the duplicate rows, with DataFrame.duplicated's keep semantics, per partition."""
+        for records in self.partitions():
+            # Sorted by fingerprint, then row number, so equal rows are adjacent and in file order
+            records = np.sort(records)
+            same = np.ones(len(records) - 1, dtype=bool) if len(records) else np.empty(0, dtype=bool)
+            for name in self.dtype.names[:-1]:
+                same &= records[name][1:] == records[name][:-1]
+            mask = np.zeros(len(records), dtype=bool)
+            if keep in ('first', False):
+                mask[1:] |= same
+            if keep in ('last', False):
+                mask[:-1] |= same
+            yield records['row'][mask]
+
+
+class _DroppedRows:
+    """
+    Row numbers of the duplicates to drop, spilled to one temporary file per
+    chunk of chunk_rows rows, so reading a chunk only loads its own.
+    """
+
+    def __init__(self, chunk_rows):
+        self.chunk_rows = chunk_rows
+        self.count = 0
+        self._directory = None
+
+    def add(self, rows):
+        if not len(rows):
+            return
+        if self._directory is None:
+            self._directory = tempfile.TemporaryDirectory(prefix='dropped_rows_')
+        rows = np.sort(rows)
+        self.count += len(rows)
+        chunks = rows // self.chunk_rows
+        for part in np.split(rows, np.flatnonzero(np.diff(chunks)) + 1):
+            with open(self._path(part[0] // self.chunk_rows), 'ab') as file:
+                part.tofile(file)
+
+    def keep_mask(self, start, end):
+        """Rows start to end (within one chunk) that are not dropped."""
+        mask = np.ones(end - start, dtype=bool)
+        if self._directory is not None and os.path.exists(self._path(start // self.chunk_rows)):
+            mask[np.fromfile(self._path(start // self.chunk_rows), dtype=np.int64) - start] = False
+        return mask
+
+    def _path(self, chunk):
+        return os.path.join(self._directory.name, f"{chunk}.bin")
+
+
+class ChunkedProcessor:
+    """
+    Runs the cleaning pipeline over a CSV file in row chunks, so memory depends on
+    chunk_rows rather than on the size of the file.
+
+    - scan: the file is read once as text to settle every column's dtype the way a
+      full read would, fingerprint every row and draw a uniform sample of
+      sample_rows rows.
+    - fit (when no plan is given): process_data on the sample picks the strategies
+      and builds a CleaningPlan. Its fill values, category lists, value counts and
+      clip bounds are then recomputed over the whole file in two more passes, so
+      they do not depend on which rows were sampled.
+    - transform: every chunk goes through DataProcessor.transform with the plan and
+      is appended to the output file.
+
+    Duplicates are removed across the whole file from the row fingerprints, which
+    are partitioned on disk with their row numbers; the rows to drop are spilled
+    per chunk in turn. Memory is bounded by the chunk size, the sample, the
+    largest fingerprint partition and the per-column sketches and value counts.
+    """
+
+    def __init__(self, chunk_rows=100_000, sample_rows=100_000, duplicate_engine=None, seed=0, metrics=None):
+        self.chunk_rows = chunk_rows
+        self.sample_rows = sample_rows
+        self.duplicate_engine = duplicate_engine or DuplicateEngine()
+        self.seed = seed
+        self.metrics = metrics
+
+    def run(self, filepath, output_path, processor, methods=None, selected_issues=None, plan=None, progress=None):
+        """
+        Cleans filepath into output_path with processor (a DataProcessor). A given
+        plan is applied as is; otherwise one is fitted as described above and left
+        in processor.plan. progress, if given, is called as progress(stage, index,
+        total) at every boundary in CHUNKED_STAGES.
+
+        Returns a summary with the plan, the input and output row counts, the
+        format issues and lexical timings summed over all chunks, the largest
+        per-stage memory use of any chunk (when the processor tracks memory) and
+        the profile of the CHUNKED_STAGES themselves. processor.stage_metrics
+        holds the pipeline stages summed over all chunks.
+        """
+        profiler = StageProfiler()
+        profiler.start(CHUNKED_STAGES[0])
+        try:
+            return self._run(filepath, output_path, processor, methods, selected_issues, plan, progress, profiler)
+        finally:
+            stage_metrics = profiler.stop()
+            if self.metrics is not None:
+                self.metrics.observe('chunked', stage_metrics)
+
+    def _run(self, filepath, output_path, processor, methods, selected_issues, plan, progress, profiler):
+        self._report_stage(progress, 'scan', profiler)
+        dtypes, positions, sample, rows_in = self._scan(filepath)
+
+        self._report_stage(progress, 'fit', profiler, rows_in)
+        fitted = plan is None
+        if fitted:
+            processor.process_data(self._typed(sample, dtypes), methods or {}, selected_issues)
+            plan = processor.plan
+        else:
+            plan.check_schema(sample)
+        steps = {step['stage']: step for step in plan.steps}
+        dropped = self._dropped_rows(filepath, positions, steps.get('duplicates'))
+        del positions
+        rows_out = rows_in if dropped is None else rows_in - dropped.count
+
+        self._report_stage(progress, 'statistics', profiler, rows_out)
+        if fitted:
+            self._fit_statistics(filepath, dtypes, dropped, steps, processor)
+            if 'duplicates' in steps and steps['duplicates']['subset'] is None:
+                plan.applied_methods['Duplicate Data'] = f"Fully removed {rows_in - rows_out} exact duplicate rows."
+
+        self._report_stage(progress, 'transform', profiler, rows_out)
+        # Duplicates were already dropped across chunks from the global fingerprints
+        chunk_plan = CleaningPlan(columns=plan.columns, applied_methods=plan.applied_methods, plan_id=plan.plan_id,
+                                  steps=[step for step in plan.steps if step['stage'] != 'duplicates'], arrays=plan.arrays)
+        format_issues = defaultdict(lambda: defaultdict(int))
+        lexical_timings = defaultdict(float)
+        stage_memory = defaultdict(lambda: defaultdict(int))
+        stage_metrics = defaultdict(lambda: defaultdict(int))
+        columns, chunks = None, 0
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        try:
+            for chunk in self._chunks(filepath, dtypes, dropped):
+                cleaned = processor.transform(chunk, chunk_plan)
+                if columns is None:
+                    columns = cleaned.columns
+                    cleaned.to_csv(tmp_path, index=False)
+                else:
+                    cleaned.reindex(columns=columns).to_csv(tmp_path, mode='a', header=False, index=False)
+                for col, issues in processor.format_issues.items():
+                    for issue, count in issues.items():
+                        format_issues[col][issue] += count
+                for stage, seconds in processor.lexical_timings.items():
+                    lexical_timings[stage] += seconds
+                for stage, usage in processor.stage_memory.items():
+                    for key, value in usage.items():
+                        stage_memory[stage][key] = max(stage_memory[stage][key], value)
+                for stage, values in processor.stage_metrics.items():
+                    for key, value in values.items():
+                        if key == 'peak_memory_bytes':
+                            stage_metrics[stage][key] = max(stage_metrics[stage][key], value)
+                        elif value is not None:
+                            stage_metrics[stage][key] += value
+                chunks += 1
+            if columns is None:
+                # Empty input: still write the header
+                processor.transform(self._typed(sample, dtypes), chunk_plan).to_csv(tmp_path, index=False)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        processor.plan = plan
+        processor.applied_methods = dict(plan.applied_methods)
+        processor.format_issues = {col: dict(issues) for col, issues in format_issues.items()}
+        processor.lexical_timings = dict(lexical_timings)
+        processor.stage_memory = {stage: dict(usage) for stage, usage in stage_memory.items()}
+        processor.stage_metrics = {stage: {key: round(value, 6) if isinstance(value, float) else value
+                                           for key, value in values.items()}
+                                   for stage, values in stage_metrics.items()}
+        self._report_stage(progress, 'done', profiler, rows_out)
+        return {
+            'plan': plan,
+            'rows_in': rows_in,
+            'rows_out': rows_out,
+            'chunks': chunks,
+            'format_issues': processor.format_issues,
+            'lexical_timings': processor.lexical_timings,
+            'stage_memory': processor.stage_memory,
+            'stage_metrics': profiler.stages,
+        }
+
+    def _report_stage(self, progress, stage, profiler, rows=None):
+        index = CHUNKED_STAGES.index(stage)
+        profiler.mark(stage if stage != CHUNKED_STAGES[-1] else None, rows)
+        if progress is not None:
+            progress(stage, index, len(CHUNKED_STAGES) - 1)
+
+    # ************************* Passes *****************************
+
+    def _read(self, filepath, **kwargs):
+        return pd.read_csv(filepath, chunksize=self.chunk_rows, dtype=str, **kwargs)
+
+    def _scan(self, filepath):
+        """Column dtypes, partitioned full-row fingerprints, a uniform row sample (as text) and the row count."""
+        kinds, positions = {}, _RowPositions(buffer_rows=self.chunk_rows)
+        rng = np.random.default_rng(self.seed)
+        sample, keys, rows = None, np.empty(0), 0
+
+        for chunk in self._read(filepath):
+            for col in chunk.columns:
+                kinds.setdefault(col, _ColumnKind()).update(chunk[col])
+            positions.add(self.duplicate_engine.fingerprints(chunk))
+
+            # Bottom-k sampling: every row gets a random key and the sample_rows
+            # smallest keys are kept, which is a uniform sample of the whole file
+            chunk.index = pd.RangeIndex(rows, rows + len(chunk))
+            rows += len(chunk)
+            sample = chunk if sample is None else pd.concat([sample, chunk])
+            keys = np.concatenate([keys, rng.random(len(chunk))])
+            if len(sample) > self.sample_rows:
+                keep = np.argpartition(keys, self.sample_rows)[:self.sample_rows]
+                sample, keys = sample.iloc[keep], keys[keep]
+
+        if sample is None:
+            sample = pd.read_csv(filepath, dtype=str)
+        dtypes = {col: kinds[col].dtype if col in kinds else 'float64' for col in sample.columns}
+        return dtypes, positions, sample.sort_index().reset_index(drop=True), rows
+
+    def _typed(self, chunk, dtypes):
+        for col in chunk.columns:
+            if dtypes[col] != 'object':
+                chunk[col] = pd.to_numeric(chunk[col]).astype(dtypes[col])
+        return chunk
+
+    def _dropped_rows(self, filepath, positions, step):
+        """The rows deduplication removes across the whole file, or None without a duplicates step."""
+        if step is None:
+            return None
+        if step['subset'] is not None:
+            positions = _RowPositions(buffer_rows=self.chunk_rows)
+            for chunk in self._read(filepath, usecols=step['subset']):
+                positions.add(self.duplicate_engine.fingerprints(chunk))
+        dropped = _DroppedRows(self.chunk_rows)
+        for rows in positions.duplicated(keep=step['keep']):
+            dropped.add(rows)
+        return dropped
+
+    def _chunks(self, filepath, dtypes, dropped, columns=None):
+        """Typed, deduplicated chunks of filepath (or of some of its columns), each indexed from 0."""
+        start = 0
+        for chunk in self._read(filepath, usecols=columns):
+            end = start + len(chunk)
+            if dropped is not None:
+                chunk = chunk[dropped.keep_mask(start, end)]
+            start = end
+            yield self._typed(chunk.reset_index(drop=True), dtypes)
+
+    def _fit_statistics(self, filepath, dtypes, dropped, steps, processor):
+        """
+        Replaces the sample-fitted statistics in steps with ones computed over every
+        kept row. Each pass only reads, and only runs the steps of, the columns whose
+        statistics it collects.
+        """
+        casts = steps['dtypes']['casts'] if 'dtypes' in steps else []
+        fills = steps['missing']['fills'] if 'missing' in steps else []
+        fills = [fill for fill in fills if fill['method'] == 'value' and fill.get('statistic')]
+
+        # Pass 1: fill values and category lists, on the values the missing stage sees.
+        # A column has at most one cast, so stateless casts are the only ones to apply
+        needs = defaultdict(set)
+        for cast in casts:
+            if cast['to'] == 'category':
+                needs[cast['column']].add('counts')
+            elif cast['to'] == 'filled' and cast.get('statistic'):
+                needs[cast['column']].add(cast['statistic'])
+        for fill in fills:
+            needs[fill['column']].add(fill['statistic'])
+        stateless = [cast for cast in casts if cast['to'] not in ('category', 'filled') and cast['column'] in needs]
+
+        def apply_stateless(chunk):
+            for stateless_cast in stateless:
+                chunk = processor._apply_cast(chunk, stateless_cast)
+            return chunk
+
+        if needs:
+            stats = self._collect(filepath, dtypes, dropped, needs, apply_stateless)
+            for cast in casts:
+                if cast['to'] == 'category':
+                    cast['categories'] = to_jsonable(stats[cast['column']].categories())
+                elif cast['column'] in stats and cast['to'] == 'filled':
+                    cast['value'] = to_jsonable(stats[cast['column']].statistic(cast['statistic']))
+            for fill in fills:
+                fill['value'] = to_jsonable(stats[fill['column']].statistic(fill['statistic']))
+
+        # Pass 2: clip bounds after the missing stage, encoder categories and counts
+        # after the text stages (run on the encoded columns only)
+        clips = steps['outliers']['clip'] if 'outliers' in steps else []
+        encoders = steps['encoding']['encoders'] if 'encoding' in steps else []
+        encoders = [encoder for encoder in encoders if encoder['method'] in COUNTED_ENCODERS]
+        if not clips and not encoders:
+            return
+
+        encoded = {encoder['column'] for encoder in encoders}
+        clip_stats = _StatsCollector({bounds['column']: {'quartiles'} for bounds in clips})
+        columns = encoded | set(clip_stats)
+        column_steps = []
+        for stage, key in (('dtypes', 'casts'), ('missing', 'fills')):
+            if stage in steps:
+                column_steps.append((stage, {key: [item for item in steps[stage][key] if item['column'] in columns]}))
+        text_steps = [(stage, dict(steps[stage], columns=[col for col in steps[stage]['columns'] if col in encoded]))
+                      for stage in ('formats', 'spelling', 'lexical') if stage in steps and encoded]
+
+        def prepare(chunk):
+            for stage, step in column_steps:
+                chunk = getattr(processor, f"_transform_{stage}")(chunk, step)
+            clip_stats.update_columns(chunk, clip_stats)
+            for stage, step in text_steps:
+                chunk = getattr(processor, f"_transform_{stage}")(chunk, step)
+            return chunk
+
+        stats = self._collect(filepath, dtypes, dropped, {col: {'counts'} for col in encoded}, prepare, columns)
+        for bounds in clips:
+            sketch = clip_stats[bounds['column']].sketch
+            q1, q3 = sketch.quantile(0.25), sketch.quantile(0.75)
+            iqr = q3 - q1
+            bounds['lower'], bounds['upper'] = to_jsonable(q1 - 1.5 * iqr), to_jsonable(q3 + 1.5 * iqr)
+        for encoder in encoders:
+            column_stats = stats[encoder['column']]
+            if encoder['method'] == 'label':
+                encoder['classes'] = to_jsonable(column_stats.categories())
+            elif encoder['method'] == 'frequency':
+                encoder['mapping'] = to_jsonable(list(column_stats.value_counts().items()))
+            else:
+                encoder['categories'] = to_jsonable(column_stats.categories())
+        if encoders:
+            self._check_encoding(steps['encoding'], stats, processor)
+
+    def _check_encoding(self, step, stats, processor):
+        """
+        Runs the registry and the max_encoded_columns guard again on the encoders
+        refitted over every kept row, whose dictionaries can be wider than the
+        sample's, and updates the step's output width and applied_methods to match.
+        """
+        columns, fallbacks = step['input_columns'], list(step['frequency_fallbacks'])
+        for i, encoder in enumerate(step['encoders']):
+            if encoder['method'] in COUNTED_ENCODERS and encoder['method'] != 'frequency':
+                column_stats = stats[encoder['column']]
+                encoder, fallback = processor._checked_encoder(encoder, columns, column_stats.value_counts)
+                if fallback:
+                    encoder['mapping'] = to_jsonable(encoder['mapping'])
+                    fallbacks.append(encoder['column'])
+                step['encoders'][i] = encoder
+            columns += processor._encoded_width(encoder) - 1
+        step['output_columns'], step['frequency_fallbacks'] = columns, fallbacks
+        processor.plan.applied_methods['Categorical Encoding'] = processor._describe_encoding(
+            len(step['encoders']), columns, step['output_bytes'], fallbacks)
+
+    def _collect(self, filepath, dtypes, dropped, needs, prepare, columns=None):
+        """Feeds the needed columns of every prepared chunk to a _StatsCollector and returns it."""
+        stats = _StatsCollector(needs)
+        for chunk in self._chunks(filepath, dtypes, dropped, list(columns or needs)):
+            stats.update_columns(prepare(chunk), needs)
+        return stats
+
+
+class _StatsCollector(dict):
+    """_ColumnStats per column, keyed by column name."""
+
+    def __init__(self, needs):
+        super().__init__({col: _ColumnStats(kinds) for col, kinds in needs.items()})
+
+    def update_columns(self, chunk, columns):
+        for col in columns:
+            self[col].update(chunk[col])
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import math
+import os
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+PLAN_VERSION = 1
+
+
+def to_jsonable(value):
+    """Converts numpy/pandas scalars and containers to plain JSON types."""
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray, pd.Index)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if pd.isna(value):
+        return None
+    return str(value)
+
+
+class CleaningPlan:
+    """
+    Everything DataProcessor learned while cleaning one dataset: the ordered
+    steps of the pipeline with their fitted parameters (fill values, clip
+    bounds, category lists, dtype casts), the applied_methods report and the
+    input schema.
+
+    A plan is plain JSON, so it can be saved once and applied to later files or
+    chunks with the same schema by DataProcessor.transform without re-fitting.
+    Large fitted arrays (KNN donor rows) are kept out of the JSON in `arrays`,
+    saved as .npy files next to it and referenced from the steps by name.
+    """
+
+    def __init__(self, columns=None, steps=None, applied_methods=None, plan_id=None, created_at=None, arrays=None):
+        self.plan_id = plan_id or uuid.uuid4().hex
+        self.created_at = created_at or datetime.now().isoformat(timespec='seconds')
+        self.columns = columns or {}
+        self.steps = steps or []
+        self.applied_methods = applied_methods or {}
+        self.arrays = arrays or {}
+
+    @classmethod
+    def for_frame(cls, df):
+        return cls(columns={str(col): str(dtype) for col, dtype in df.dtypes.items()})
+
+    def add(self, stage, **params):
+        step = {'stage': stage, **to_jsonable(params)}
+        self.steps.append(step)
+        return step
+
+    def add_array(self, name, array):
+        """Keeps array as a side artifact of the plan; steps refer to it by the returned name."""
+        self.arrays[name] = np.asarray(array)
+        return name
+
+    def schema_fingerprint(self):
+        """Hash of the input column names and dtypes; plans fitted on files of one feed share it."""
+        return hashlib.sha1(json.dumps(list(self.columns.items())).encode('utf-8')).hexdigest()
+
+    def check_schema(self, df):
+        missing = [col for col in self.columns if col not in df.columns]
+        if missing:
+            raise ValueError(f"Data is missing columns required by cleaning plan {self.plan_id}: {missing}")
+
+    def to_dict(self):
+        return {
+            'version': PLAN_VERSION,
+            'plan_id': self.plan_id,
+            'created_at': self.created_at,
+            'columns': self.columns,
+            'steps': self.steps,
+            'applied_methods': to_jsonable(self.applied_methods),
+            'arrays': sorted(self.arrays),
+        }
+
+    @classmethod
+    def from_dict(cls, data, arrays=None):
+        if data.get('version') != PLAN_VERSION:
+            raise ValueError(f"Unsupported cleaning plan version: {data.get('version')}")
+        return cls(columns=data['columns'], steps=data['steps'], applied_methods=data['applied_methods'],
+                   plan_id=data['plan_id'], created_at=data['created_at'], arrays=arrays)
+
+    @staticmethod
+    def _array_path(folder, plan_id, name):
+        return os.path.join(folder, f"{os.path.basename(plan_id)}.{name}.npy")
+
+    def save(self, folder):
+        # Arrays first, so a plan file never refers to one that is not written yet
+        for name, array in self.arrays.items():
+            array_path = self._array_path(folder, self.plan_id, name)
+            tmp_path = f"{array_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array, allow_pickle=False)
+            os.replace(tmp_path, array_path)
+        path = os.path.join(folder, f"{self.plan_id}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, folder, plan_id):
+        path = os.path.join(folder, f"{os.path.basename(plan_id)}.json")
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        arrays = {name: np.load(cls._array_path(folder, plan_id, name), allow_pickle=False)
+                  for name in data.get('arrays', [])}
+        return cls.from_dict(data, arrays)
@@ -0,0 +1,282 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.duplicates import DuplicateEngine
+from utils.sketches import QuantileSketch, hash_values
+
+
+def _value_flags(values):
+    """For each distinct value: parses as a number, str.isnumeric(), has a format issue, has a lexical issue."""
+    values = pd.Series(values, dtype=object)
+    numeric = pd.to_numeric(values, errors='coerce').notna().to_numpy()
+    isnumeric = values.str.isnumeric().fillna(False).to_numpy(dtype=bool)
+    format_issue = np.zeros(len(values), dtype=bool)
+    lexical_issue = np.zeros(len(values), dtype=bool)
+    is_string = values.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    strings = values[is_string]
+    if not strings.empty:
+        format_issue[is_string] = (strings != strings.str.strip().str.lower()).to_numpy()
+        single_token = strings.str.split().str.len() == 1
+        lexical_issue[is_string] = (single_token & ~strings.str.isalpha()).to_numpy(dtype=bool)
+    return numeric, isnumeric, format_issue, lexical_issue
+
+
+class ValueStats:
+    """
+    What ColumnProfile needs from the values of a non-numeric column, computed on
+    their value counts: the distinct count, how many values parse as numbers and
+    the format and lexical flags (text columns only).
+
+    Stats of row blocks (of_blocks) keep one hash per distinct value, so they
+    merge into those of the whole column.
+    """
+
+    def __init__(self, nunique=0, numeric=0, isnumeric=0, format_issue=False, lexical_issue=False, hashes=None):
+        self.nunique = nunique
+        self.numeric = numeric
+        self.isnumeric = isnumeric
+        self.format_issue = format_issue
+        self.lexical_issue = lexical_issue
+        self.hashes = hashes
+
+    @classmethod
+    def of(cls, non_null, text=True):
+        counts = non_null.value_counts()
+        counts = counts[counts > 0]  # categoricals report unused categories with a zero count
+        stats = cls(nunique=len(counts))
+        if not text or not stats.nunique:
+            return stats
+
+        weights = counts.to_numpy()
+        numeric, isnumeric, format_issue, lexical_issue = _value_flags(counts.index)
+        stats.numeric = int(weights[numeric].sum())
+        stats.isnumeric = int(weights[isnumeric].sum())
+        stats.format_issue = bool(format_issue.any())
+        stats.lexical_issue = bool(lexical_issue.any())
+        return stats
+
+    @classmethod
+    def of_blocks(cls, series, blocks, n_blocks, text=True):
+        """
+        Stats of every row block of series, where blocks holds the block number
+        (0 to n_blocks - 1, ascending) of each row. The value checks run once per
+        distinct value of the whole series, then are counted per block.
+        """
+        codes, uniques = pd.factorize(series)
+        present = codes >= 0
+        width = max(len(uniques), 1)
+        pairs, counts = np.unique(blocks[present].astype(np.int64) * width + codes[present], return_counts=True)
+        pair_blocks, pair_codes = np.divmod(pairs, width)
+        ends = np.searchsorted(pair_blocks, np.arange(1, n_blocks + 1))
+        hashes = hash_values(uniques)[pair_codes]
+
+        nunique = np.diff(ends, prepend=0)
+        numeric = isnumeric = np.zeros(n_blocks, dtype=np.int64)
+        format_issue = lexical_issue = np.zeros(n_blocks, dtype=bool)
+        if text and len(uniques):
+            flags = _value_flags(uniques)
+            numeric, isnumeric = (np.bincount(pair_blocks, weights=counts * flag[pair_codes], minlength=n_blocks)
+                                  .astype(np.int64) for flag in flags[:2])
+            format_issue, lexical_issue = (np.bincount(pair_blocks, weights=flag[pair_codes], minlength=n_blocks) > 0
+                                           for flag in flags[2:])
+        return [cls(nunique=int(nunique[i]), numeric=int(numeric[i]), isnumeric=int(isnumeric[i]),
+                    format_issue=bool(format_issue[i]), lexical_issue=bool(lexical_issue[i]),
+                    hashes=hashes[ends[i] - nunique[i]:ends[i]])
+                for i in range(n_blocks)]
+
+    @classmethod
+    def merged(cls, parts):
+        """Stats of a column from those of its row blocks."""
+        hashes = np.unique(np.concatenate([part.hashes for part in parts])) if parts else np.empty(0, np.uint64)
+        return cls(nunique=len(hashes), numeric=sum(part.numeric for part in parts),
+                   isnumeric=sum(part.isnumeric for part in parts),
+                   format_issue=any(part.format_issue for part in parts),
+                   lexical_issue=any(part.lexical_issue for part in parts), hashes=hashes)
+
+
+class NumericStats:
+    """
+    What ColumnProfile needs from a numeric column, in mergeable form: the count,
+    mean and central moments behind the skew, a quantile sketch for the quartiles
+    and outlier count, and one hash per distinct value. Quartiles are exact until
+    the merged sketch holds more than k values and approximate past that.
+    """
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, m3=0.0, sketch=None, hashes=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.m3 = m3
+        self.sketch = sketch if sketch is not None else QuantileSketch()
+        self.hashes = hashes if hashes is not None else np.empty(0, np.uint64)
+
+    @property
+    def nunique(self):
+        return len(self.hashes)
+
+    @classmethod
+    def of(cls, non_null):
+        values = non_null.to_numpy()
+        if not len(values):
+            return cls()
+        floats = values.astype(np.float64)
+        mean = floats.mean()
+        adjusted = floats - mean
+        sketch = QuantileSketch()
+        sketch.update(floats)
+        # + 0.0 turns -0.0 into 0.0, which nunique counts as the same value
+        uniques = np.unique(values) + values.dtype.type(0)
+        return cls(count=len(values), mean=mean, m2=float((adjusted ** 2).sum()), m3=float((adjusted ** 3).sum()),
+                   sketch=sketch, hashes=pd.util.hash_array(uniques))
+
+    @classmethod
+    def of_blocks(cls, series, blocks, n_blocks):
+        """Stats of every row block of series, where blocks holds the (ascending) block number of each row."""
+        edges = np.searchsorted(blocks, np.arange(n_blocks + 1))
+        return [cls.of(series.iloc[edges[i]:edges[i + 1]].dropna()) for i in range(n_blocks)]
+
+    @classmethod
+    def merged(cls, parts):
+        """Stats of a column from those of its row blocks (moments merged as in Chan et al.)."""
+        stats = cls()
+        for part in parts:
+            stats.sketch.merge(part.sketch)
+            if not part.count:
+                continue
+            count = stats.count + part.count
+            delta = part.mean - stats.mean
+            stats.m3 += (part.m3 + delta ** 3 * stats.count * part.count * (stats.count - part.count) / count ** 2
+                         + 3 * delta * (stats.count * part.m2 - part.count * stats.m2) / count)
+            stats.m2 += part.m2 + delta ** 2 * stats.count * part.count / count
+            stats.mean += delta * part.count / count
+            stats.count = count
+        hashes = [part.hashes for part in parts]
+        stats.hashes = np.unique(np.concatenate(hashes)) if hashes else stats.hashes
+        return stats
+
+    def skew(self):
+        """Sample skewness, computed like Series.skew()."""
+        if self.count < 3:
+            return np.nan
+        # Series.skew zeroes moments that are only floating point error
+        m2 = 0.0 if abs(self.m2) < 1e-14 else self.m2
+        m3 = 0.0 if abs(self.m3) < 1e-14 else self.m3
+        if m2 == 0:
+            return 0.0
+        return (self.count * (self.count - 1) ** 0.5 / (self.count - 2)) * (m3 / m2 ** 1.5)
+
+
+class ColumnProfile:
+    """
+    Statistics for one column, computed in a single pass over it.
+
+    Numeric columns get quartiles, IQR outlier count and skew. Object and
+    category columns are profiled on their value counts, so the string checks
+    run once per distinct value and are weighted back by frequency. Pass stats
+    computed before (NumericStats or ValueStats) and the null count to skip the
+    pass over the column.
+    """
+
+    def __init__(self, series, stats=None, null_count=None):
+        self.name = series.name
+        self.dtype = series.dtype
+        self.rows = len(series)
+        self.is_numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        self.is_object = series.dtype == 'object'
+
+        non_null = series.dropna() if stats is None or null_count is None else None
+        self.null_count = self.rows - len(non_null) if non_null is not None else null_count
+        self.non_null = self.rows - self.null_count
+
+        self.q1 = self.q3 = self.skew = np.nan
+        self.outlier_count = 0
+        self.numeric_ratio = 0.0
+        self.isnumeric_count = 0
+        self.format_issue = False
+        self.lexical_issue = False
+
+        if self.is_numeric:
+            self._profile_numeric(non_null, stats)
+        else:
+            self._profile_values(non_null, stats)
+
+    @property
+    def lower_bound(self):
+        return self.q1 - 1.5 * (self.q3 - self.q1)
+
+    @property
+    def upper_bound(self):
+        return self.q3 + 1.5 * (self.q3 - self.q1)
+
+    def _profile_numeric(self, non_null, stats=None):
+        if stats is not None:
+            self.nunique = stats.nunique
+            if stats.count:
+                self.q1, self.q3 = stats.sketch.quantile(0.25), stats.sketch.quantile(0.75)
+                self.outlier_count = stats.sketch.count_outside(self.lower_bound, self.upper_bound)
+                self.skew = stats.skew()
+            return
+        values = non_null.to_numpy(dtype=np.float64)
+        self.nunique = int(non_null.nunique())
+        if values.size:
+            # Linear interpolation, same as Series.quantile and np.percentile
+            self.q1, self.q3 = np.quantile(values, [0.25, 0.75])
+            self.outlier_count = int(((values < self.lower_bound) | (values > self.upper_bound)).sum())
+            self.skew = non_null.skew()
+
+    def _profile_values(self, non_null, stats=None):
+        if stats is None:
+            stats = ValueStats.of(non_null, text=self.is_object)
+        self.nunique = stats.nunique
+        if not self.is_object or not self.nunique:
+            return
+        self.numeric_ratio = stats.numeric / self.non_null
+        self.isnumeric_count = stats.isnumeric
+        self.format_issue = stats.format_issue
+        self.lexical_issue = stats.lexical_issue
+
+
+class DatasetProfile:
+    """
+    Column profiles for a whole DataFrame, shared by DataAnalyzer and DataProcessor.
+
+    Row fingerprints for duplicate detection are computed on first use per column
+    subset and kept, so the count in /analyze and the removal in /process hash
+    the rows only once. column_stats (NumericStats or ValueStats per column),
+    null_counts and the full-row fingerprints can be passed in when they are
+    already known.
+    """
+
+    def __init__(self, df, duplicate_engine=None, column_stats=None, null_counts=None, fingerprints=None):
+        column_stats, null_counts = column_stats or {}, null_counts or {}
+        self.rows = len(df)
+        self.columns = {col: ColumnProfile(df[col], column_stats.get(col), null_counts.get(col)) for col in df.columns}
+        self.duplicate_engine = duplicate_engine or DuplicateEngine()
+        self._df = df
+        self._fingerprints = {} if fingerprints is None else {None: fingerprints}
+        self._fingerprints_lock = threading.Lock()
+
+    def __getitem__(self, col):
+        return self.columns[col]
+
+    def __contains__(self, col):
+        return col in self.columns
+
+    def numeric_columns(self):
+        return [col for col, profile in self.columns.items() if profile.is_numeric]
+
+    def object_columns(self):
+        return [col for col, profile in self.columns.items() if profile.is_object]
+
+    def fingerprints(self, subset=None):
+        """Row fingerprints of the profiled frame over subset (all columns by default)."""
+        key = tuple(subset) if subset is not None else None
+        with self._fingerprints_lock:
+            if key not in self._fingerprints:
+                self._fingerprints[key] = self.duplicate_engine.fingerprints(self._df, subset)
+            return self._fingerprints[key]
+
+    def duplicate_count(self, subset=None):
+        return self.duplicate_engine.count(self.fingerprints(subset))
@@ -1,8 +1,21 @@
+import contextlib
+import functools
 import pandas as pd
-import numpy as np
+from utils.column_profile import DatasetProfile
+from utils.memory_tracker import StageMemoryTracker
+from utils.metrics import StageProfiler
+from utils.streaming_analysis import StreamingIssueAccumulator
+
+# Keys of the detect_all_issues result, in order
+ISSUE_TYPES = ('missing', 'duplicates', 'dtypes', 'outliers', 'formatting', 'lexical_issues',
+               'categorical_conversion_needed')
 
 class DataAnalyzer:
-    def detect_all_issues(self, df):
+    def __init__(self, metrics=None, track_memory=False):
+        self.metrics = metrics
+        self.track_memory = track_memory
+
+    def detect_all_issues(self, df, profile=None, stage_metrics=None):
         """
         Returns a dictionary of detected issues:
           - missing: Count of missing values per column.
@@ -12,73 +25,129 @@ class DataAnalyzer:
           - formatting: Columns with inconsistent formatting in string data.
           - lexical_issues: Columns with potential lexical mistakes.
           - categorical_conversion_needed: Categorical columns that may need conversion.
+
+        All per-column detectors read from a DatasetProfile; pass one built by
+        profile() (or a cached one) to avoid profiling the same dataset again.
+        Each detector is profiled like a pipeline stage into the metrics registry
+        and, if given, into the stage_metrics dict (see _run_stages).
         """
-        return {
-            'missing': self._detect_missing(df),
-            'duplicates': self._detect_duplicates(df),
-            'dtypes': self._detect_dtype_issues(df),
-            'outliers': self._detect_outliers(df),
-            'formatting': self._detect_format_issues(df),
-            'lexical_issues': self._detect_lexical_issues(df),
-            'categorical_conversion_needed': self._detect_categorical_conversion(df)
+        if profile is None:
+            profile = self.profile(df, stage_metrics=stage_metrics)
+        detectors = {
+            'missing': self._detect_missing,
+            'duplicates': self._detect_duplicates,
+            'dtypes': self._detect_dtype_issues,
+            'outliers': self._detect_outliers,
+            'formatting': self._detect_format_issues,
+            'lexical_issues': self._detect_lexical_issues,
+            'categorical_conversion_needed': self._detect_categorical_conversion,
         }
+        return self._run_stages(df, [(issue, functools.partial(detector, profile))
+                                     for issue, detector in detectors.items()], stage_metrics)
+
+    def profile(self, df, build=None, stage_metrics=None):
+        """
+        The DatasetProfile of df, from build() (such as a DatasetCache lookup) or
+        built here, profiled as the analyzer's 'profile' stage: building it is
+        where the cost of an analysis lies.
+        """
+        build = build or (lambda: DatasetProfile(df))
+        return self._run_stages(df, [('profile', build)], stage_metrics)['profile']
+
+    def _run_stages(self, df, stages, stage_metrics):
+        """
+        Runs (stage, function) pairs in order and returns {stage: result}. Every
+        stage is profiled the way DataProcessor profiles the pipeline: wall and
+        CPU time, rows in and out and, with track_memory, the tracemalloc peak
+        above the stage start. The profile goes to the metrics registry and, if
+        given, into stage_metrics.
+        """
+        rows = len(df)
+        profiler = StageProfiler()
+        tracker = StageMemoryTracker() if self.track_memory else None
+        results = {}
+        profiler.start(stages[0][0], rows=rows)
+        if tracker is not None:
+            tracker.start(stages[0][0])
+        try:
+            for stage, function in stages:
+                # Marking the running stage does nothing, so the first one is not restarted
+                profiler.mark(stage, rows)
+                if tracker is not None:
+                    tracker.mark(stage)
+                results[stage] = function()
+        finally:
+            timings = profiler.stop(rows)
+            if tracker is not None:
+                for stage, usage in tracker.stop().items():
+                    timings[stage]['peak_memory_bytes'] = usage['peak_bytes']
+            if stage_metrics is not None:
+                stage_metrics.update(timings)
+            if self.metrics is not None:
+                self.metrics.observe('analyzer', timings)
+        return results
 
-    def _detect_missing(self, df):
-        return {col: int(df[col].isna().sum()) for col in df.columns}
+    def detect_all_issues_streaming(self, filepath, chunksize=100_000):
+        """
+        Same result as detect_all_issues, computed from a CSV file in chunks of
+        chunksize rows so peak memory does not depend on the file size.
+
+        Outlier bounds come from mergeable quantile sketches built on the first
+        pass; a second pass over the numeric columns counts values outside them.
+        """
+        accumulator = StreamingIssueAccumulator()
+        with self._span('streaming_scan') as scan:
+            for chunk in pd.read_csv(filepath, chunksize=chunksize, dtype=str):
+                accumulator.update(chunk)
+            scan['rows_in'] = accumulator.rows
+
+        bounds = accumulator.outlier_bounds()
+        if bounds:
+            with self._span('streaming_outliers') as outliers:
+                for chunk in pd.read_csv(filepath, chunksize=chunksize, dtype=str, usecols=list(bounds)):
+                    accumulator.count_outliers(chunk, bounds)
+                outliers['rows_in'] = accumulator.rows
+
+        return accumulator.result()
 
-    def _detect_duplicates(self, df):
-        return {"total_duplicates": int(df.duplicated().sum())}
+    def _span(self, stage):
+        if self.metrics is None:
+            return contextlib.nullcontext({})
+        return self.metrics.span('analyzer', stage)
 
-    def _detect_dtype_issues(self, df):
+    def _detect_missing(self, profile):
+        return {col: column.null_count for col, column in profile.columns.items()}
+
+    def _detect_duplicates(self, profile):
+        return {"total_duplicates": profile.duplicate_count()}
+
+    def _detect_dtype_issues(self, profile):
         issues = {}
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                non_null = df[col].dropna()
-                if non_null.empty:
-                    continue
-                converted = pd.to_numeric(non_null, errors='coerce')
-                ratio = converted.notna().sum() / non_null.shape[0]
-                if ratio > 0.8:
-                    issues[col] = 'Potential numeric values stored as text'
+        for col in profile.object_columns():
+            if profile[col].non_null and profile[col].numeric_ratio > 0.8:
+                issues[col] = 'Potential numeric values stored as text'
         return issues
 
-    def _detect_outliers(self, df):
-        outliers = {}
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        for col in numeric_cols:
-            q1 = df[col].quantile(0.25)
-            q3 = df[col].quantile(0.75)
-            iqr = q3 - q1
-            lower_bound = q1 - 1.5 * iqr
-            upper_bound = q3 + 1.5 * iqr
-            count = int(((df[col] < lower_bound) | (df[col] > upper_bound)).sum())
-            outliers[col] = count
-        return outliers
-
-    def _detect_format_issues(self, df):
+    def _detect_outliers(self, profile):
+        return {col: profile[col].outlier_count for col in profile.numeric_columns()}
+
+    def _detect_format_issues(self, profile):
         issues = {}
-        cat_cols = df.select_dtypes(include=['object']).columns
-        for col in cat_cols:
-            standardized = df[col].dropna().apply(lambda x: x.strip().lower())
-            if not standardized.equals(df[col].dropna()):
+        for col in profile.object_columns():
+            if profile[col].format_issue:
                 issues[col] = "Inconsistent formatting detected"
         return issues
 
-    def _detect_lexical_issues(self, df):
+    def _detect_lexical_issues(self, profile):
         lexical_issues = {}
-        text_cols = df.select_dtypes(include=['object']).columns
-        for col in text_cols:
-            unique_values = df[col].dropna().unique()
-            for val in unique_values:
-                if len(val.split()) == 1 and not val.isalpha():
-                    lexical_issues[col] = "Potential lexical issues detected"
-                    break
+        for col in profile.object_columns():
+            if profile[col].lexical_issue:
+                lexical_issues[col] = "Potential lexical issues detected"
         return lexical_issues
 
-    def _detect_categorical_conversion(self, df):
+    def _detect_categorical_conversion(self, profile):
         categorical_conversion = {}
-        cat_cols = [col for col in df.select_dtypes(include=['object']).columns if df[col].nunique() <= 10]
+        cat_cols = [col for col in profile.object_columns() if profile[col].nunique <= 10]
         for col in cat_cols:
             categorical_conversion[col] = "May need label encoding"
         return categorical_conversion
-    
@@ -1,113 +1,222 @@
+import contextlib
+import functools
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import LabelEncoder
-from spellchecker import SpellChecker
-from sklearn.impute import KNNImputer
-from sklearn.experimental import enable_iterative_imputer
-from sklearn.impute import IterativeImputer
 from scipy.stats import skew, zscore
 import re
 from sklearn.preprocessing import OrdinalEncoder, LabelEncoder
 from sklearn.feature_extraction import FeatureHasher
-import jieba
 import nltk
-from textblob import TextBlob
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
+from utils.block_stats import block_statistics
+from utils.cleaning_plan import CleaningPlan
+from utils.column_profile import DatasetProfile
+from utils.duplicates import DuplicateEngine
+from utils.imputation import IMPUTATION_METHODS, ImputationEngine
+from utils.spelling import SpellingCorrector
+from utils import lexical
+from utils.lexical import LexicalEngine
+from utils.memory_tracker import StageMemoryTracker
+from utils.metrics import StageProfiler
 
 nltk.download('punkt')
 nltk.download('stopwords')
 
+# Stage boundaries of DataProcessor.process_data, in order
+PIPELINE_STAGES = ('strategies', 'duplicates', 'dtypes', 'missing', 'outliers',
+                   'formats', 'spelling', 'lexical', 'encoding', 'done')
+
+# Missing-value strategies a caller can choose per column (see set_strategies)
+MISSING_STRATEGIES = ("Mean", "Median", "Mode", "Backward Fill", "KNN Imputation", "Multivariate Imputation")
+
+
+def _profiled_run(method):
+    """
+    Profiles every stage of a pipeline run into self.stage_metrics (wall and CPU
+    time, rows in and out, peak memory when tracked) and self.stage_memory, and
+    adds them to the metrics registry if there is one.
+    """
+    @functools.wraps(method)
+    def wrapper(self, df, *args, **kwargs):
+        self._profiler.start(PIPELINE_STAGES[0], rows=len(df))
+        if self.memory_tracker is not None:
+            self.memory_tracker.start(PIPELINE_STAGES[0])
+        try:
+            return method(self, df, *args, **kwargs)
+        finally:
+            self.stage_metrics = self._profiler.stop()
+            if self.memory_tracker is not None:
+                self.stage_memory = self.memory_tracker.stop()
+                for stage, usage in self.stage_memory.items():
+                    self.stage_metrics[stage]['peak_memory_bytes'] = usage['peak_bytes']
+            if self.metrics is not None:
+                self.metrics.observe('pipeline', self.stage_metrics)
+    return wrapper
+
+
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, spelling_corrector=None, lexical_engine=None, duplicate_engine=None, track_memory=False,
+                 metrics=None, imputation_engine=None, max_encoded_columns=1000, encoder_registry=None):
+        self.spelling_corrector = spelling_corrector or SpellingCorrector()
+        self.lexical_engine = lexical_engine or LexicalEngine()
+        self.duplicate_engine = duplicate_engine or DuplicateEngine()
+        self.imputation_engine = imputation_engine or ImputationEngine()
+        # Widest frame encoding may produce; wider one-hot or hash encoders fall back to frequency encoding
+        self.max_encoded_columns = max_encoded_columns
+        self.encoding_report = {}
+        self.encoder_registry = encoder_registry
         self.applied_methods = {}
         self.missing_strategies={}
         self.outlier_strategies={}
         self.encoding_strategies={}
         self.integrity_strategies={}
-
-    def select_strategies(self, df, target_column=None):
+        self.format_issues={}
+        self.lexical_timings={}
+        self.plan = None
+        self.memory_tracker = StageMemoryTracker() if track_memory else None
+        self.stage_memory = {}
+        self.metrics = metrics
+        self._profiler = StageProfiler()
+        self.stage_metrics = {}
+
+    def select_strategies(self, df, target_column=None, profile=None):
         """Detect and store all strategies for various issues."""
-        self.missing_strategies = self.detect_missing_value_strategy(df)
-        print("1")
-        self.integrity_strategies = self.detect_data_integrity_strategy(df)
-        print("2")
-        self.outlier_strategies = self.detect_outliers(df)
-        print("3")
-        self.encoding_strategies = self.detect_categorical_encoding_strategy(df, target_column)
-        print("4")
-
-    def process_data(self, df, methods, selected_issues=None):
-        self.select_strategies(df)
-
-        # self.set_strategies(methods)
-        print(methods)
-
-        print("5")
+        if profile is None:
+            profile = DatasetProfile(df)
+        with self._span('missing', df):
+            self.missing_strategies = self.detect_missing_value_strategy(df, profile)
+        with self._span('integrity', df):
+            self.integrity_strategies = self.detect_data_integrity_strategy(df, profile)
+        with self._span('outliers', df):
+            self.outlier_strategies = self.detect_outliers(df, profile)
+        with self._span('encoding', df):
+            self.encoding_strategies = self.detect_categorical_encoding_strategy(df, target_column, profile=profile)
+
+    def _span(self, detector, df):
+        if self.metrics is None:
+            return contextlib.nullcontext()
+        return self.metrics.span('strategy', detector, rows_in=len(df))
+
+    @_profiled_run
+    def process_data(self, df, methods, selected_issues=None, profile=None, progress=None):
+        """
+        Runs the cleaning pipeline, fitting every step on df. progress, if given,
+        is called as progress(stage, index, total) at every boundary in
+        PIPELINE_STAGES. The fitted steps are kept in self.plan, which transform()
+        applies to other data with the same schema.
+
+        df is the working frame: stages edit it in place and only replace it when
+        rows or columns change, so pass a copy to keep the original.
+        """
+        self.format_issues = {}
+        self.plan = CleaningPlan.for_frame(df)
+        self.select_strategies(df, profile=profile)
+        self.set_strategies(methods, columns=df.columns)
+
+        self._report_stage(progress, "strategies")
         if selected_issues is None:
             selected_issues = ['duplicates', 'dtypes', 'missing', 'outliers', 'formats', 'spelling']
         
-        print("6")
+        self._report_stage(progress, "duplicates", df)
         if 'duplicates' in selected_issues:
-            df = self._handle_duplicates(df)
+            df = self._handle_duplicates(df, profile=profile)
         
-        print("7")
+        self._report_stage(progress, "dtypes", df)
         if 'dtypes' in selected_issues:
             df = self._resolve_data_integrity_strategy(df)
         
-        print("8")
+        self._report_stage(progress, "missing", df)
         if 'missing' in selected_issues:
             df = self._handle_missing(df)
         
-        print("9")
+        self._report_stage(progress, "outliers", df)
         if 'outliers' in selected_issues:
             df = self._handle_outliers(df)
         
-        print("10")
+        self._report_stage(progress, "formats", df)
         if 'formats' in selected_issues:
             df = self._standardize_formats(df)
 
 
-        print("11")
+        self._report_stage(progress, "spelling", df)
         if 'spelling' in selected_issues:
             df = self._correct_spelling(df)
             # df = self._resolve_lexical_issues_df(df)
 
-        print("12")
+        self._report_stage(progress, "lexical", df)
         df = self._resolve_lexical_issues_df(df)
 
-        print("13")
+        self._report_stage(progress, "encoding", df)
         df = self._apply_categorical_encoding(df)
 
-        print("14")
+        self._report_stage(progress, "done", df)
+        self.plan.applied_methods = dict(self.applied_methods)
+        return df
+
+    @_profiled_run
+    def transform(self, df, plan, progress=None):
+        """
+        Applies a fitted CleaningPlan to df without re-fitting: stored fill values,
+        bounds and category lists are used as they are, so every batch cleaned with
+        the same plan gets the same encodings. Duplicates are only removed within df.
+        """
+        plan.check_schema(df)
+        self.plan = plan
+        self.format_issues = {}
+        self.applied_methods = dict(plan.applied_methods)
+        steps = {step['stage']: step for step in plan.steps}
+
+        self._report_stage(progress, "strategies")
+        for stage in PIPELINE_STAGES[1:-1]:
+            self._report_stage(progress, stage, df)
+            if stage in steps:
+                df = getattr(self, f"_transform_{stage}")(df, steps[stage])
+
+        self._report_stage(progress, "done", df)
         return df
 
-    def set_strategies(self, methods):
+    def _report_stage(self, progress, stage, df=None):
+        index = PIPELINE_STAGES.index(stage)
+        # Stage boundaries open the next stage; "done" only closes the last one
+        running = stage if stage != PIPELINE_STAGES[-1] else None
+        self._profiler.mark(running, rows=None if df is None else len(df))
+        if self.memory_tracker is not None:
+            self.memory_tracker.mark(running)
+        if progress is not None:
+            progress(stage, index, len(PIPELINE_STAGES) - 1)
+
+    def set_strategies(self, methods, columns=None):
         """
-        Sets the instance variables for strategies from the given methods dictionary.
+        Overrides the detected strategies with the ones chosen in the methods
+        dictionary, column by column; columns it leaves out keep theirs. With
+        columns given, choices for any other column are ignored.
         """
-        self.encoding_strategies = methods.get('categorical_conversion_needed', {})
-        self.integrity_strategies = methods.get('dtypes', {})
-        self.missing_strategies = methods.get('missing', {})
-        self.outlier_strategies = methods.get('outliers', {})
+        def chosen(section):
+            return {col: strategy for col, strategy in methods.get(section, {}).items()
+                    if columns is None or col in columns}
+
+        self.encoding_strategies.update(chosen('categorical_conversion_needed'))
+        self.integrity_strategies.update(chosen('dtypes'))
+        self.missing_strategies.update(chosen('missing'))
+        self.outlier_strategies.update(chosen('outliers'))
 
         print("Encoding Strategies:", self.encoding_strategies)
         print("Integrity Strategies:", self.integrity_strategies)
         print("Missing Strategies:", self.missing_strategies)
         print("Outlier Strategies:", self.outlier_strategies)
         
-    def detect_missing_value_strategy(self, df):
+    def detect_missing_value_strategy(self, df, profile=None):
         strategies = {}
-        numeric_cols = df.select_dtypes(include=['number']).columns
+        if profile is None:
+            profile = DatasetProfile(df)
         
         for column in df.columns:
-            if df[column].isna().sum() == 0:
+            column_profile = profile[column]
+            if column_profile.null_count == 0:
                 continue
 
-            # dtype = df[column].dtype
-            is_numerical = column in numeric_cols
-            # print(dtype)
-            unique_values = df[column].nunique()
+            is_numerical = column_profile.is_numeric
+            unique_values = column_profile.nunique
             strategy = "Mode (Discrete numerical data)"
 
             if is_numerical:  # Numerical data
@@ -115,10 +224,7 @@ class DataProcessor:
                     strategy = "Mode (Discrete numerical data)"
                 else:
                     # Detect outliers using IQR
-                    q1, q3 = np.nanpercentile(df[column].dropna(), [25, 75])
-                    iqr = q3 - q1
-                    lower_bound, upper_bound = q1 - 1.5 * iqr, q3 + 1.5 * iqr
-                    has_outliers = ((df[column] < lower_bound) | (df[column] > upper_bound)).sum() > 0
+                    has_outliers = column_profile.outlier_count > 0
                     strategy = "Median (Continuous numerical data with outliers)" if has_outliers else "Mean (Continuous numerical data without outliers)"
             else:  # Categorical data
                 strategy = "Mode (Categorical data)"
@@ -128,25 +234,27 @@ class DataProcessor:
         
         return strategies
     
-    def detect_data_integrity_strategy(self, df):
+    def detect_data_integrity_strategy(self, df, profile=None):
         """
         Detects data integrity issues and suggests strategies for handling them.
         """
         strategies = {}
+        if profile is None:
+            profile = DatasetProfile(df)
 
         for col in df.columns:
-            col_dtype = df[col].dtype
+            column_profile = profile[col]
 
             # Check for explicit type casting needs
-            if col_dtype == 'object':
-                if df[col].str.isnumeric().sum() / len(df[col]) > 0.8:
+            if column_profile.is_object and column_profile.rows:
+                if column_profile.isnumeric_count / column_profile.rows > 0.8:
                     strategies[col] = "Explicit Type Casting (Convert to numeric)"
-                elif df[col].nunique() / len(df[col]) < 0.1:
+                elif column_profile.nunique / column_profile.rows < 0.1:
                     strategies[col] = "Explicit Type Casting (Convert to category)"
             
             # Check for implicit type coercion
-            elif np.issubdtype(col_dtype, np.number):
-                if df[col].isna().sum() > 0:
+            elif column_profile.is_numeric:
+                if column_profile.null_count > 0:
                     strategies[col] = "Implicit Type Coercion (Handle NaN with mean/median)"
             
             # Check for pattern-based format enforcement
@@ -159,32 +267,28 @@ class DataProcessor:
 
         return strategies
     
-    def detect_outliers(self,df):
+    def detect_outliers(self, df, profile=None):
         """Detects the best outlier handling strategy for each numeric column."""
-        numeric_cols = df.select_dtypes(include=['number']).columns
+        if profile is None:
+            profile = DatasetProfile(df)
         detected_strategies = {}
 
-        for col in numeric_cols:
-            data = df[col].dropna()
+        for col in profile.numeric_columns():
+            column_profile = profile[col]
 
             detected_strategies[col] = "Winsorization (Capping Outliers)"
 
-            if data.nunique() <= 10:
+            if column_profile.nunique <= 10:
                 detected_strategies[col] = "Winsorization (Capping Outliers)"
                 continue  # Skip further checks
 
-            skewness = data.skew()
-            is_skewed = abs(skewness) > 1
+            is_skewed = abs(column_profile.skew) > 1
 
-            # Compute IQR-based outliers
-            q1, q3 = np.percentile(data, [25, 75])
-            iqr = q3 - q1
-            lower_bound = q1 - 1.5 * iqr
-            upper_bound = q3 + 1.5 * iqr
-            has_outliers = ((data < lower_bound) | (data > upper_bound)).sum() > 0
+            # IQR-based outliers
+            has_outliers = column_profile.outlier_count > 0
 
             # Normality check (Z-Score method applicable)
-            is_normal = (not is_skewed) and (len(data) > 30)
+            is_normal = (not is_skewed) and (column_profile.non_null > 30)
 
             if is_normal:
                 detected_strategies[col] = "Z-Score-Based Filtering (Standard Deviation Method)"
@@ -195,12 +299,14 @@ class DataProcessor:
 
         return detected_strategies
     
-    def detect_categorical_encoding_strategy(self,df, target_column=None, high_cardinality_threshold=15):
+    def detect_categorical_encoding_strategy(self,df, target_column=None, high_cardinality_threshold=15, profile=None):
         strategies = {}
+        if profile is None:
+            profile = DatasetProfile(df)
 
         for col in df.select_dtypes(include=['object', 'category']).columns:
-            unique_values = df[col].nunique()
-            total_values = len(df[col])
+            unique_values = profile[col].nunique
+            total_values = profile[col].rows
             category_ratio = unique_values / total_values
 
             if target_column and target_column in df.columns:
@@ -232,25 +338,73 @@ class DataProcessor:
     def _handle_missing(self, df):
         self.applied_methods['Missing Data'] = "Applied different strategies for missing data handling."
 
+        fills = []
+        imputed = {method: [] for method in IMPUTATION_METHODS}
         for col, strategy in self.missing_strategies.items():
             if strategy.startswith("Mean"):
-                df[col] = df[col].fillna(df[col].mean())
+                fills.append({'column': col, 'method': 'value', 'statistic': 'mean'})
             elif strategy.startswith("Median"):
-                df[col] = df[col].fillna(df[col].median())
+                fills.append({'column': col, 'method': 'value', 'statistic': 'median'})
             elif "Mode" in strategy:
-                df[col] = df[col].fillna(df[col].mode()[0])
+                fills.append({'column': col, 'method': 'value', 'statistic': 'mode'})
             elif "Backward Fill" in strategy:
-                df[col] = df[col].fillna(method='bfill')
+                fills.append({'column': col, 'method': 'bfill'})
             elif "KNN Imputation" in strategy:
-                imputer = KNNImputer(n_neighbors=5)
-                df[col] = imputer.fit_transform(df[[col]])
+                imputed['knn'].append(col)
             elif "Multivariate Imputation" in strategy:
-                imputer = IterativeImputer()
-                df[col] = imputer.fit_transform(df[[col]])
-
+                imputed['iterative'].append(col)
+
+        # One model per method over the whole numeric block, not one per column
+        imputations = [model for model in (self.imputation_engine.fit(df, columns, method)
+                                           for method, columns in imputed.items() if columns)
+                       if model is not None]
+        for model in imputations:
+            if model['method'] == 'knn':
+                # Donor rows are saved beside the plan rather than inside its JSON
+                model['donors'] = self.plan.add_array('knn_donors', model['donors'])
+        covered = {col for model in imputations for col in model['columns']}
+        for col in (col for columns in imputed.values() for col in columns if col not in covered):
+            # Non-numeric columns, and ones without a value to learn from, take the column's own fill
+            if pd.api.types.is_numeric_dtype(df[col]):
+                fills.append({'column': col, 'method': 'value', 'statistic': 'mean'})
+            elif df[col].notna().any():
+                fills.append({'column': col, 'method': 'value', 'statistic': 'mode'})
+
+        # Every fill value comes out of one batch of column statistics
+        needs = {}
+        for fill in fills:
+            if fill['method'] == 'value':
+                needs.setdefault(fill['column'], set()).add(fill['statistic'])
+        stats = block_statistics(df, needs)
+        for fill in fills:
+            if fill['method'] == 'value':
+                fill['value'] = stats[fill['column']][fill['statistic']]
+
+        self.plan.add('missing', fills=fills, imputations=imputations)
+        return self._transform_missing(df, {'fills': fills, 'imputations': imputations})
+
+    def _transform_missing(self, df, step):
+        # Imputation models see the gaps as they were fitted, before any fill
+        for model in step.get('imputations', []):
+            df = self.imputation_engine.transform(df, model, self.plan.arrays)
+        values = {}
+        for fill in step['fills']:
+            col = fill['column']
+            if fill['method'] == 'bfill':
+                df[col] = df[col].bfill()
+            else:
+                values[col] = self._restore_values(df[col], fill['value'])
+        if values:
+            df.fillna(values, inplace=True)
         return df
 
-    def _handle_duplicates(self, df, subset=None, keep="first", strategy="full"):
+    def _restore_values(self, series, values):
+        """Fitted values (a scalar or a list) as series' type; plans store timestamps as ISO strings."""
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return pd.to_datetime(values)
+        return values
+
+    def _handle_duplicates(self, df, subset=None, keep="first", strategy="full", profile=None):
         """
         Handles duplicate rows in the dataset.
         
@@ -259,29 +413,40 @@ class DataProcessor:
         - subset (list, optional): Columns to consider for deduplication. Default is None (all columns).
         - keep (str, optional): Determines which duplicate to keep ("first", "last", False for removing all).
         - strategy (str, optional): "full" for removing all duplicates, "conditional" for domain-specific deduplication.
+        - profile (DatasetProfile, optional): Profile of df whose row fingerprints can be reused.
 
         Returns:
         - pd.DataFrame: Deduplicated dataframe.
         """
-        
-        initial_duplicates = df.duplicated(subset=subset).sum()
-        
+        if strategy == "conditional" and not subset:
+            self.applied_methods['Duplicate Data'] = "No subset provided, full deduplication applied."
+        elif strategy not in ("full", "conditional"):
+            return df
+
+        # Full deduplication compares all columns, conditional deduplication a subset
+        step = {'subset': list(subset) if strategy == "conditional" and subset else None, 'keep': keep}
+        self.plan.add('duplicates', **step)
+        rows = len(df)
+        df = self._transform_duplicates(df, step, profile=profile)
+
         if strategy == "full":
-            # Full deduplication - remove exact duplicates across all columns
-            df = df.drop_duplicates()
-            self.applied_methods['Duplicate Data'] = f"Fully removed {initial_duplicates} exact duplicate rows."
-
-        elif strategy == "conditional":
-            # Conditional deduplication based on subset of columns
-            if subset:
-                df = df.drop_duplicates(subset=subset, keep=keep)
-                self.applied_methods['Duplicate Data'] = f"Conditionally removed duplicates based on columns: {subset}"
-            else:
-                self.applied_methods['Duplicate Data'] = "No subset provided, full deduplication applied."
-                df = df.drop_duplicates()
+            self.applied_methods['Duplicate Data'] = f"Fully removed {rows - len(df)} exact duplicate rows."
+        elif subset:
+            self.applied_methods['Duplicate Data'] = f"Conditionally removed duplicates based on columns: {subset}"
+
+        return df
 
+    def _transform_duplicates(self, df, step, profile=None):
+        fingerprints = self._row_fingerprints(df, step['subset'], profile)
+        df, _ = self.duplicate_engine.drop(df, fingerprints, keep=step['keep'])
         return df
 
+    def _row_fingerprints(self, df, subset, profile):
+        # The profile's fingerprints describe df as long as no rows were dropped yet
+        if profile is not None and profile.rows == len(df):
+            return profile.fingerprints(subset)
+        return self.duplicate_engine.fingerprints(df, subset)
+
 
     # def _fix_dtypes(self, df):
     #     self.applied_methods['Data Type Correction'] = "Converted object columns to numeric where possible."
@@ -297,54 +462,85 @@ class DataProcessor:
         """
         Handles data integrity issues based on detected strategies.
         """
-        # strategies = self.integrity_strategies
-
+        casts = []
         for col, strategy in self.integrity_strategies.items():
             if strategy.startswith("Explicit Type Casting"):
-                df = self._apply_type_casting(df, col)
+                cast = self._fit_type_casting(df, col)
 
             elif strategy.startswith("Implicit Type Coercion"):
-                df = self._apply_type_coercion(df, col)
+                cast = self._fit_type_coercion(df, col)
 
             elif strategy.startswith("Pattern-based Format Enforcement"):
-                df = self._apply_format_enforcement(df, col)
+                cast = self._fit_format_enforcement(df, col)
+
+            else:
+                cast = None
 
+            if cast is not None:
+                casts.append(cast)
+                df = self._apply_cast(df, cast)
+
+        self.plan.add('dtypes', casts=casts)
+        return df
+
+    def _transform_dtypes(self, df, step):
+        for cast in step['casts']:
+            df = self._apply_cast(df, cast)
         return df
 
-    def _apply_type_casting(self, df, col):
+    def _fit_type_casting(self, df, col):
         """Handles explicit type casting issues."""
+        cast = None
         try:
             if df[col].str.isnumeric().sum() / len(df[col]) > 0.8:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+                cast = {'column': col, 'to': 'numeric'}
             elif df[col].nunique() / len(df[col]) < 0.1:
-                df[col] = df[col].astype('category')
+                cast = {'column': col, 'to': 'category', 'categories': pd.Categorical(df[col]).categories.tolist()}
             self.applied_methods[col] = "Applied Explicit Type Casting"
         except Exception as e:
             print(f"Type Casting Failed for {col}: {e}")
-        return df
+        return cast
 
-    def _apply_type_coercion(self, df, col):
+    def _fit_type_coercion(self, df, col):
         """Handles implicit type coercion issues."""
         if df[col].isna().sum() > 0:
             if df[col].nunique() > 10:
-                df[col] = df[col].fillna(df[col].median())
+                statistic, value = 'median', df[col].median()
             else:
-                df[col] = df[col].fillna(df[col].mode()[0])
+                statistic, value = 'mode', df[col].mode()[0]
             self.applied_methods[col] = "Applied Implicit Type Coercion (Handled NaN)"
-        return df
+            return {'column': col, 'to': 'filled', 'statistic': statistic, 'value': value}
+        return None
 
-    def _apply_format_enforcement(self, df, col):
+    def _fit_format_enforcement(self, df, col):
         """Handles pattern-based format enforcement issues."""
+        cast = None
         if "date" in col.lower() or "time" in col.lower():
-            df[col] = pd.to_datetime(df[col], errors='coerce')
+            cast = {'column': col, 'to': 'datetime'}
 
         elif "phone" in col.lower():
-            df[col] = df[col].astype(str).apply(lambda x: re.sub(r'\D', '', x) if pd.notna(x) else x)
+            cast = {'column': col, 'to': 'digits'}
 
         elif "id" in col.lower():
-            df[col] = df[col].astype(str).str.zfill(6)  # Ensuring fixed length
+            cast = {'column': col, 'to': 'zfill', 'width': 6}  # Ensuring fixed length
 
         self.applied_methods[col] = "Applied Pattern-based Format Enforcement"
+        return cast
+
+    def _apply_cast(self, df, cast):
+        col, to = cast['column'], cast['to']
+        if to == 'numeric':
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        elif to == 'category':
+            df[col] = df[col].astype(pd.CategoricalDtype(self._restore_values(df[col], cast['categories'])))
+        elif to == 'filled':
+            df[col] = df[col].fillna(self._restore_values(df[col], cast['value']))
+        elif to == 'datetime':
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        elif to == 'digits':
+            df[col] = df[col].astype(str).apply(lambda x: re.sub(r'\D', '', x) if pd.notna(x) else x)
+        elif to == 'zfill':
+            df[col] = df[col].astype(str).str.zfill(cast['width'])
         return df
 
     # def _handle_outliers(self, df):
@@ -362,31 +558,34 @@ class DataProcessor:
     def _handle_outliers(self,df):
         """Applies the detected outlier handling strategy for each column."""
         numeric_cols = df.select_dtypes(include=['number']).columns
-        for col, strategy in self.outlier_strategies.items():
-            if col in numeric_cols:
-                print("91")
-                if strategy.startswith("Winsorization"):
-                    print("92")
-                    df=self._winsorize(df,col)
-                elif strategy == strategy.startswith("Z-Score-Based Filtering"):
-                    print("93")
-                    df=self._zscore_filter(df,col)
-                # elif strategy == "IQR-Based Filtering (Interquartile Range Method)":
-                #     print("94")
-                #     df=self._iqr_filter(df,col)
+        winsorize = any(col in numeric_cols and strategy.startswith("Winsorization")
+                        for col, strategy in self.outlier_strategies.items())
+        # Winsorization caps every numeric column; capping is idempotent, so the
+        # bounds are computed once rather than once per winsorized column
+        step = {'clip': self._winsorize_bounds(df) if winsorize else []}
+        self.plan.add('outliers', **step)
+        return self._transform_outliers(df, step)
+
+    def _transform_outliers(self, df, step):
+        if step['clip']:
+            columns = [bounds['column'] for bounds in step['clip']]
+            lower = pd.Series([bounds['lower'] for bounds in step['clip']], index=columns, dtype=float)
+            upper = pd.Series([bounds['upper'] for bounds in step['clip']], index=columns, dtype=float)
+            df[columns] = df[columns].clip(lower=lower, upper=upper, axis=1)
         return df
 
-    def _winsorize(self, df, col):
-        """Capping extreme values for discrete data"""
-        numeric_cols = df.select_dtypes(include=['number']).columns
-        for col in numeric_cols:
-            q1 = df[col].quantile(0.25)
-            q3 = df[col].quantile(0.75)
+    def _winsorize_bounds(self, df):
+        """IQR capping bounds of every numeric column, for capping extreme values"""
+        columns = df.select_dtypes(include=['number']).columns
+        stats = block_statistics(df, {col: {'quartiles'} for col in columns})
+        bounds = []
+        for col in columns:
+            q1, q3 = stats[col]['quartiles']
             iqr = q3 - q1
             lower_bound = q1 - 1.5 * iqr
             upper_bound = q3 + 1.5 * iqr
-            df[col] = df[col].clip(lower=lower_bound, upper=upper_bound)
-        return df
+            bounds.append({'column': col, 'lower': lower_bound, 'upper': upper_bound})
+        return bounds
 
     def _zscore_filter(self, df, col, threshold=3):
         """Removes outliers using Z-Score method"""
@@ -412,90 +611,96 @@ class DataProcessor:
     #     return df
     
     def _standardize_formats(self,df):
-        df = df.copy()
+        """
+        Detects and resolves formatting issues in object columns.
+
+        Every string operation runs once per distinct value (pd.factorize) and the
+        result is mapped back through the codes, so repeated categorical values cost
+        nothing extra. Issue counts are stored in self.format_issues.
+        """
+        step = {'columns': [col for col in df.columns if df[col].dtype == "object"]}
+        self.plan.add('formats', **step)
+        df = self._transform_formats(df, step)
+
+        issues = self.format_issues
+        total = sum(sum(col_issues.values()) for col_issues in issues.values())
+        self.applied_methods['Format Standardization'] = f"Normalized case, whitespace, phone and date formats in {len(issues)} text columns ({total} formatting issues found)."
+        return df
+
+    def _transform_formats(self, df, step):
         issues = {}
 
-        for col in df.columns:
+        for col in step['columns']:
             if df[col].dtype == "object":
+                codes, uniques = pd.factorize(df[col])
+                values = pd.Series(uniques, dtype=object)
+                counts = np.bincount(codes[codes >= 0], minlength=len(values))
+                is_str = values.map(lambda x: isinstance(x, str)).to_numpy(dtype=bool)
+
+                def count(mask):
+                    return int(counts[np.asarray(mask, dtype=bool) & is_str].sum())
+
                 # Detect issues
                 issues[col] = {
-                    "case_inconsistencies": df[col].apply(lambda x: isinstance(x, str) and x != x.lower()).sum(),
-                    "leading_trailing_spaces": df[col].apply(lambda x: isinstance(x, str) and (x.startswith(" ") or x.endswith(" "))).sum(),
-                    "multiple_spaces": df[col].apply(lambda x: isinstance(x, str) and bool(re.search(r'\s{2,}', x))).sum(),
-                    "non_numeric_phone": df[col].apply(lambda x: isinstance(x, str) and col.lower() == "phone" and not x.replace(" ", "").isdigit()).sum(),
-                    "date_format_issues": df[col].apply(lambda x: isinstance(x, str) and col.lower() == "date" and not bool(re.match(r'\d{4}-\d{2}-\d{2}', x))).sum(),
+                    "case_inconsistencies": count(values.str.lower().ne(values)),
+                    "leading_trailing_spaces": count(values.str.startswith(" ").fillna(False) | values.str.endswith(" ").fillna(False)),
+                    "multiple_spaces": count(values.str.contains(r'\s{2,}', regex=True, na=False)),
+                    "non_numeric_phone": count(~values.str.replace(" ", "").str.isdigit().fillna(False)) if col.lower() == "phone" else 0,
+                    "date_format_issues": count(~values.str.match(r'\d{4}-\d{2}-\d{2}', na=False)) if col.lower() == "date" else 0,
                 }
 
                 # Resolve issues
                 if col.lower() not in ["name"]:  # Preserve capitalization for names
-                    df[col] = df[col].str.lower()
+                    values = values.str.lower()
 
-                df[col] = df[col].str.strip()  # Remove leading/trailing spaces
-                df[col] = df[col].str.replace(r'\s+', ' ', regex=True)  # Normalize spaces
+                values = values.str.strip()  # Remove leading/trailing spaces
+                values = values.str.replace(r'\s+', ' ', regex=True)  # Normalize spaces
 
                 # Standardize phone numbers (remove non-digits and format)
                 if "phone" in col.lower():
-                    df[col] = df[col].str.replace(r'\D', '', regex=True)
-                    df[col] = df[col].apply(lambda x: f"({x[:3]}) {x[3:6]}-{x[6:]}" if len(x) == 10 else x)
+                    values = values.str.replace(r'\D', '', regex=True)
+                    formatted = "(" + values.str[:3] + ") " + values.str[3:6] + "-" + values.str[6:]
+                    values = values.where(values.str.len() != 10, formatted)
 
                 # Standardize dates to YYYY-MM-DD format
                 if "date" in col.lower():
-                    df[col] = pd.to_datetime(df[col], errors='coerce').dt.strftime('%Y-%m-%d')
+                    values = pd.to_datetime(values, errors='coerce').dt.strftime('%Y-%m-%d')
 
+                resolved = values.to_numpy(dtype=object)
+                df[col] = np.where(codes >= 0, resolved[codes], np.nan) if len(resolved) else df[col]
+
+        self.format_issues = issues
         return df
 
     def _correct_spelling(self, df):
         self.applied_methods['Spelling Correction'] = "Fixed spelling issues using spellchecker library."
-        spell = SpellChecker()
-        cat_cols = df.select_dtypes(include=['object']).columns
-        for col in cat_cols:
-            df[col] = df[col].apply(lambda x: spell.correction(x) if isinstance(x, str) else x)
+        step = {'columns': df.select_dtypes(include=['object']).columns.tolist()}
+        self.plan.add('spelling', **step)
+        return self._transform_spelling(df, step)
+
+    def _transform_spelling(self, df, step):
+        for col in step['columns']:
+            if df[col].dtype == "object":
+                df[col] = self.spelling_corrector.correct_series(df[col])
         return df
     
     def lexical_normalization(self, text):
         """ Corrects spelling and expands common abbreviations. """
         if not isinstance(text, str):
             return text  # Skip non-string values
-
-        corrected_text = str(TextBlob(text).correct())
-
-        abbreviations = {
-            "u": "you",
-            "r": "are",
-            "btw": "by the way",
-            "gonna": "going to",
-            "wanna": "want to",
-            "teh": "the"
-        }
-        
-        words = word_tokenize(corrected_text)
-        expanded_words = [abbreviations[word] if word in abbreviations else word for word in words]
-        
-        return ' '.join(expanded_words)
+        return lexical.normalize(text)
 
     def _token_pruning(self, text):
         """ Removes stopwords from the text. """
         if not isinstance(text, str):
             return text
-
-        stop_words = set(stopwords.words('english'))
-        words = word_tokenize(text)
-        filtered_words = [word for word in words if word.lower() not in stop_words]
-        return ' '.join(filtered_words)
+        return lexical.prune(text)
 
     def _lexical_segmentation(self, text):
         """ Splits hashtags, camelCase words, and segments Chinese/Japanese text. """
         if not isinstance(text, str):
             return text
-
-        text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)  # CamelCase splitting
-        text = re.sub(r'#(\w+)', lambda m: ' '.join(re.findall('[A-Z][^A-Z]*', m.group(1))), text)  # Hashtags
-        
-        # Segment Chinese/Japanese text
-        if re.search(r'[\u4e00-\u9fff]', text):
-            text = " ".join(jieba.cut(text))
-        
-        return text
+        return lexical.segment(text)
 
     def _resolve_lexical_issues_df(self, df, text_columns=None):
         """
@@ -512,17 +717,18 @@ class DataProcessor:
             # Auto-detect text columns
             text_columns = df.select_dtypes(include=['object']).columns.tolist()
 
-        df_cleaned = df.copy()
-        
-        for col in text_columns:
-            print(f"Processing column: {col}")
+        step = {'columns': list(text_columns)}
+        self.plan.add('lexical', **step)
+        return self._transform_lexical(df, step)
 
-            df_cleaned[col] = df_cleaned[col].astype(str)  # Ensure column is string
-            df_cleaned[col] = df_cleaned[col].apply(self.lexical_normalization)
-            df_cleaned[col] = df_cleaned[col].apply(self.token_pruning)
-            df_cleaned[col] = df_cleaned[col].apply(self.lexical_segmentation)
+    def _transform_lexical(self, df, step):
+        self.lexical_engine.reset_timings()
+        
+        for col in step['columns']:
+            df[col] = self.lexical_engine.resolve_series(df[col])
 
-        return df_cleaned
+        self.lexical_timings = dict(self.lexical_engine.stage_timings)
+        return df
 
     # def _handle_inconsistent_data_conversion(self, df):
     #     self.applied_methods['Categorical Conversion'] = "Applied Label Encoding to categorical columns with ≤10 unique values."
@@ -533,34 +739,149 @@ class DataProcessor:
     #     return df
     
     def _apply_categorical_encoding(self,df, target_column=None, hash_features=10):
-        df_encoded = df.copy()
+        encoders = []
+        fallbacks = []
+        columns, size = df.shape[1], int(df.memory_usage(index=False).sum())
 
         for col, strategy in self.encoding_strategies.items():
+            series = df[col]
             if strategy == "Binary Encoding (Label Encoding)":
-                encoder = LabelEncoder()
-                df_encoded[col] = encoder.fit_transform(df_encoded[col])
+                classes = LabelEncoder().fit(series).classes_
+                encoder = {'column': col, 'method': 'label', 'classes': list(pd.Index(classes))}
 
             elif strategy == "One-Hot Encoding (OHE)":
-                df_encoded = pd.get_dummies(df_encoded, columns=[col], drop_first=True)
+                encoder = {'column': col, 'method': 'one_hot', 'categories': pd.Categorical(series).categories.tolist()}
 
             elif strategy == "Ordinal Encoding (if meaningful order exists)":
-                encoder = OrdinalEncoder()
-                df_encoded[col] = encoder.fit_transform(df_encoded[[col]])
+                categories = OrdinalEncoder().fit(df[[col]]).categories_[0]
+                encoder = {'column': col, 'method': 'ordinal', 'categories': [c for c in pd.Index(categories) if not pd.isna(c)]}
 
             elif strategy == "Frequency Encoding":
-                df_encoded[col] = df_encoded[col].map(df_encoded[col].value_counts())
+                encoder = self._frequency_encoder(series)
 
             elif strategy == "Target Encoding" and target_column:
-                target_mean = df_encoded.groupby(col)[target_column].mean()
-                df_encoded[col] = df_encoded[col].map(target_mean)
+                target_mean = df.groupby(col)[target_column].mean()
+                encoder = {'column': col, 'method': 'target', 'mapping': list(target_mean.items())}
 
             elif strategy.startswith("Hash Encoding"):
-                hasher = FeatureHasher(n_features=hash_features, input_type='string')
-                hashed_features = hasher.transform(df_encoded[col].astype(str))
-                hashed_df = pd.DataFrame(hashed_features.toarray(), columns=[f"{col}_hash_{i}" for i in range(hash_features)])
-                df_encoded = pd.concat([df_encoded.drop(columns=[col]), hashed_df], axis=1)
+                encoder = {'column': col, 'method': 'hash', 'n_features': hash_features}
 
             elif strategy == "Pandas Categorical Dtype":
-                df_encoded[col] = df_encoded[col].astype('category')
+                encoder = {'column': col, 'method': 'category', 'categories': pd.Categorical(series).categories.tolist()}
+
+            else:
+                continue
 
-        return df_encoded
\ No newline at end of file
+            encoder, fallback = self._checked_encoder(encoder, columns, series.value_counts)
+            if fallback:
+                fallbacks.append(col)
+            added, added_bytes = self._encoded_size(series, encoder)
+            columns += added - 1
+            size += added_bytes - int(series.memory_usage(index=False))
+            encoders.append(encoder)
+
+        # Size of the encoded frame, known before any column is encoded
+        self.encoding_report = {'encoded': len(encoders), 'columns': columns, 'bytes': size,
+                                'frequency_fallbacks': fallbacks}
+        if encoders:
+            self.applied_methods['Categorical Encoding'] = self._describe_encoding(len(encoders), columns, size, fallbacks)
+
+        self.plan.add('encoding', encoders=encoders, input_columns=df.shape[1], output_columns=columns,
+                      output_bytes=size, frequency_fallbacks=fallbacks)
+        return self._transform_encoding(df, {'encoders': encoders})
+
+    def _checked_encoder(self, encoder, columns, value_counts):
+        """
+        encoder as it will be applied to a frame that has `columns` columns so far.
+        With an encoder registry its category dictionary is first extended with the
+        one stored for this column of the feed. If the result would take the output
+        past max_encoded_columns, a frequency encoder built from value_counts() is
+        used instead. Returns the encoder and whether it fell back; only kept
+        dictionaries are stored in the registry.
+        """
+        def fits(candidate):
+            return (self.max_encoded_columns is None
+                    or columns - 1 + self._encoded_width(candidate) <= self.max_encoded_columns)
+
+        column = encoder['column']
+        if self.encoder_registry is not None:
+            scope, dtype = self.plan.schema_fingerprint(), self.plan.columns.get(str(column))
+            encoder = self.encoder_registry.merge(encoder, scope, dtype, accept=fits)
+        if encoder is None or not fits(encoder):
+            # Too wide for the guard: one column of category frequencies instead
+            return {'column': column, 'method': 'frequency', 'mapping': list(value_counts().items())}, True
+        return encoder, False
+
+    def _describe_encoding(self, encoded, columns, size, fallbacks):
+        return (f"Encoded {encoded} categorical columns into a {columns}-column output (~{size / 2 ** 20:.1f} MB)"
+                + (f"; frequency encoded {fallbacks} to stay within {self.max_encoded_columns} columns." if fallbacks else "."))
+
+    def _encoded_width(self, encoder):
+        """Columns that replace the encoded column."""
+        if encoder['method'] == 'one_hot':
+            return max(len(encoder['categories']) - 1, 0)
+        if encoder['method'] == 'hash':
+            return encoder['n_features']
+        return 1
+
+    def _frequency_encoder(self, series):
+        return {'column': series.name, 'method': 'frequency', 'mapping': list(series.value_counts().items())}
+
+    def _encoded_size(self, series, encoder):
+        """Columns and bytes that replace series once encoder is applied; one-hot and hash columns are sparse."""
+        rows, method = len(series), encoder['method']
+        if method == 'one_hot':
+            # drop_first: every row in a later category stores one bool and its int32 position
+            categories = self._restore_values(series, encoder['categories'])
+            width = max(len(categories) - 1, 0)
+            return width, int(series.isin(categories[1:]).sum()) * 5 if width else 0
+        if method == 'hash':
+            # One string per row hashes to a single non-zero float64 value
+            return encoder['n_features'], rows * 12
+        if method == 'category':
+            return 1, rows * pd.Categorical([], categories=encoder['categories']).codes.itemsize
+        return 1, rows * 8
+
+    def _transform_encoding(self, df, step):
+        df_encoded = df
+        for encoder in step['encoders']:
+            df_encoded = self._encode_column(df_encoded, encoder)
+        return df_encoded
+
+    def _encode_column(self, df_encoded, encoder):
+        """Applies one fitted encoder; values unseen at fit time become -1 (label) or NaN."""
+        col, method = encoder['column'], encoder['method']
+        series = df_encoded[col]
+        if method == 'label':
+            classes = pd.Index(self._restore_values(series, encoder['classes']))
+            df_encoded[col] = classes.get_indexer(series).astype(np.int64)
+
+        elif method == 'one_hot':
+            categorical = pd.Categorical(series, categories=self._restore_values(series, encoder['categories']))
+            dummies = pd.get_dummies(categorical, prefix=col, drop_first=True, sparse=True)
+            # Same columns as get_dummies(df_encoded, columns=[col]), added in place as Sparse[bool]
+            del df_encoded[col]
+            for name in dummies.columns:
+                df_encoded[name] = dummies[name].array
+
+        elif method == 'ordinal':
+            codes = pd.Index(self._restore_values(series, encoder['categories'])).get_indexer(series)
+            df_encoded[col] = np.where(codes >= 0, codes, np.nan)
+
+        elif method in ('frequency', 'target'):
+            keys, values = zip(*encoder['mapping']) if encoder['mapping'] else ((), ())
+            df_encoded[col] = series.map(pd.Series(values, index=self._restore_values(series, list(keys))))
+
+        elif method == 'hash':
+            hash_features = encoder['n_features']
+            hasher = FeatureHasher(n_features=hash_features, input_type='string')
+            # Every sample is a list of strings, here the row's one value
+            hashed = hasher.transform(series.astype(str).to_numpy()[:, None]).tocsc()
+            del df_encoded[col]
+            for i in range(hash_features):
+                df_encoded[f"{col}_hash_{i}"] = pd.arrays.SparseArray.from_spmatrix(hashed[:, i])
+
+        elif method == 'category':
+            df_encoded[col] = series.astype(pd.CategoricalDtype(self._restore_values(series, encoder['categories'])))
+
+        return df_encoded
@@ -1,14 +1,157 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 import matplotlib
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+from matplotlib import cbook
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
 import seaborn as sns
 import missingno as msno
+from scipy.stats import gaussian_kde
+
+from utils.chart_cache import ChartCache, dataset_fingerprint
+from utils.memory_tracker import StageMemoryTracker
+
+VISUALS_FOLDER = "static/visuals"
+
+# Bump whenever a renderer draws differently, so cached charts are not reused
+RENDERER_VERSION = 3
+
+
+def _init_worker():
+    sns.set_theme(style="whitegrid")
+
+
+def _new_axes():
+    # Figures are created directly rather than through pyplot, so renders share
+    # no global state and can run side by side
+    fig = Figure(figsize=(6, 4))
+    return fig, fig.add_subplot()
+
+
+def _save_figure(fig, filepath):
+    fig.tight_layout()
+    # Write then rename, so a concurrent request never serves a half-written file
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    fig.savefig(tmp_path, format="png")
+    os.replace(tmp_path, filepath)
+    return filepath
+
+
+def _render_boxplot(series, filepath):
+    fig, ax = _new_axes()
+    sns.boxplot(x=series, ax=ax)
+    ax.set_title(f"Box Plot of {series.name}")
+    return _save_figure(fig, filepath)
+
+
+def _render_box_stats(name, stats, filepath):
+    """Boxplot from precomputed matplotlib boxplot_stats, styled like seaborn's."""
+    fig, ax = _new_axes()
+    color = sns.desaturate(sns.color_palette()[0], 0.75)
+    line = {'color': '#3f3f3f'}
+    ax.bxp([stats], vert=False, widths=0.8, patch_artist=True, boxprops={'facecolor': color, 'edgecolor': line['color']},
+           whiskerprops=line, capprops=line, medianprops=line,
+           flierprops={'marker': 'o', 'markerfacecolor': 'none', 'markeredgecolor': line['color']})
+    ax.set_yticks([])
+    ax.set_xlabel(name)
+    ax.set_title(f"Box Plot of {name}")
+    return _save_figure(fig, filepath)
+
+
+def _render_scatterplot(x, y, filepath):
+    fig, ax = _new_axes()
+    sns.scatterplot(x=x, y=y, ax=ax)
+    ax.set_title(f"Scatter Plot of {x.name} vs {y.name}")
+    ax.set_xlabel(x.name)
+    ax.set_ylabel(y.name)
+    return _save_figure(fig, filepath)
+
+
+def _render_binned_scatter(x_name, y_name, x_edges, y_edges, counts, filepath):
+    """Scatter of a large frame as a 2-D histogram: precomputed point counts per cell, empty cells blank."""
+    fig, ax = _new_axes()
+    # Log scale, so cells of a few outlying rows stay visible next to dense ones
+    norm = LogNorm(vmin=1, vmax=max(counts.max(), 2))
+    cells = ax.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0), cmap='viridis', norm=norm)
+    fig.colorbar(cells, ax=ax, label='rows')
+    ax.set_title(f"Scatter Plot of {x_name} vs {y_name}")
+    ax.set_xlabel(x_name)
+    ax.set_ylabel(y_name)
+    return _save_figure(fig, filepath)
+
+
+def _render_histogram(series, filepath):
+    fig, ax = _new_axes()
+    sns.histplot(series, bins=30, kde=True, ax=ax)
+    ax.set_title(f"Histogram & KDE of {series.name}")
+    return _save_figure(fig, filepath)
+
+
+def _render_binned_histogram(name, edges, counts, kde_sample, filepath):
+    """Histogram from precomputed bin counts, with a KDE fitted on a sample and scaled to the counts."""
+    fig, ax = _new_axes()
+    bins = pd.DataFrame({name: edges[:-1], 'count': counts})
+    sns.histplot(data=bins, x=name, weights='count', bins=edges.tolist(), ax=ax)
+    if len(np.unique(kde_sample)) > 1:
+        grid = np.linspace(edges[0], edges[-1], 200)
+        density = gaussian_kde(kde_sample)(grid)
+        ax.plot(grid, density * counts.sum() * (edges[1] - edges[0]), color="C0")
+    ax.set_title(f"Histogram & KDE of {name}")
+    return _save_figure(fig, filepath)
+
+
+def _render_missing_heatmap(missing, filepath):
+    fig, ax = _new_axes()
+    # Bucketed frames hold the missing fraction per row bucket rather than booleans
+    sns.heatmap(missing, cbar=False, cmap='viridis', vmin=0, vmax=1, ax=ax)
+    ax.set_title("Missing Values Heatmap")
+    return _save_figure(fig, filepath)
+
+
+def _render_correlation_heatmap(corr, filepath):
+    fig, ax = _new_axes()
+    sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f", linewidths=0.5, ax=ax)
+    ax.set_title("Correlation Heatmap")
+    return _save_figure(fig, filepath)
+
+
+def _render_timed(chart, renderer, args, filepath, track_memory=False):
+    # Runs in the worker process, so memory is traced where the figure is drawn
+    tracker = StageMemoryTracker() if track_memory else None
+    if tracker is not None:
+        tracker.start(chart)
+    start, cpu = time.perf_counter(), time.thread_time()
+    try:
+        renderer(*args, filepath)
+    finally:
+        memory = tracker.stop() if tracker is not None else {}
+    timing = {'chart': chart, 'path': filepath, 'seconds': round(time.perf_counter() - start, 4),
+              'cpu_seconds': round(time.thread_time() - cpu, 4), 'cached': False}
+    if chart in memory:
+        timing['peak_memory_bytes'] = memory[chart]['peak_bytes']
+    return timing
+
 
 class DataVisualization:
-    def __init__(self):
+    def __init__(self, workers=None, max_charts=30, chart_cache=None, sample_rows=50_000, heatmap_rows=500,
+                 scatter_bins=100, metrics=None, track_memory=False):
         sns.set_theme(style="whitegrid")
+        self.workers = workers
+        self.max_charts = max_charts
+        self.sample_rows = sample_rows
+        self.heatmap_rows = heatmap_rows
+        self.scatter_bins = scatter_bins
+        self.metrics = metrics
+        self.track_memory = track_memory
+        self.chart_cache = chart_cache or ChartCache(VISUALS_FOLDER, renderer_version=RENDERER_VERSION)
+        self._pool = None
+        self._pool_lock = threading.Lock()
 
     def visualize_all(self, df):
         """
@@ -19,42 +162,153 @@ class DataVisualization:
         - Missing value heatmap
         - Correlation heatmap
         """
+        saved_files, _ = self.render_all(df)
+        return saved_files
+
+    def render_all(self, df, dataset_hash=None):
+        """
+        Renders the visualize_all charts in parallel.
+
+        Charts already in the chart cache for this dataset are returned without
+        rendering. dataset_hash names the dataset in the cache (such as
+        DatasetCache.version_hash); without one, df's content is hashed. At most max_charts charts are drawn; boxplots are
+        dropped first. Returns the file paths and a per-chart timing breakdown.
+        """
+        if dataset_hash is None:
+            dataset_hash = dataset_fingerprint(df)
+
+        timings, pending = [], []
+        for chart, params, renderer, make_args in self._plan_charts(df):
+            filepath = self.chart_cache.path_for(dataset_hash, chart, params)
+            if self.chart_cache.lookup(filepath):
+                timings.append({'chart': chart, 'path': filepath, 'seconds': 0.0, 'cached': True})
+            else:
+                timings.append(None)
+                pending.append((len(timings) - 1, (chart, renderer, make_args(), filepath, self.track_memory)))
+
+        if self.workers == 1:
+            for index, job in pending:
+                timings[index] = _render_timed(*job)
+        elif pending:
+            pool = self._get_pool()
+            futures = [(index, pool.submit(_render_timed, *job)) for index, job in pending]
+            for index, future in futures:
+                timings[index] = future.result()
+
+        if pending:
+            self.chart_cache.evict()
+        if self.metrics is not None:
+            for index, _ in pending:
+                timing = timings[index]
+                self.metrics.record('chart', timing['chart'], timing['seconds'], timing['cpu_seconds'], rows_in=len(df),
+                                    peak_memory_bytes=timing.get('peak_memory_bytes'))
+        return [timing['path'] for timing in timings], timings
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            return self._pool
+
+    def _plan_charts(self, df):
+        """
+        Lists (chart, params, renderer, make_args) in the order visualize_all
+        returns them. make_args builds the renderer's inputs and is only called
+        for charts that are not cached.
+        """
         numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        saved_files = []
+        leading, boxplots = [], []
+        # Above sample_rows, charts are drawn from bin counts and aggregates (the KDE
+        # from a sample) so their cost follows the image size rather than the row count
+        large = len(df) > self.sample_rows
+        sampling = {'sample_rows': self.sample_rows} if large else {}
 
         # Correlation matrix and top correlated pair
         corr_matrix = df[numeric_cols].corr(numeric_only=True).abs()
         np.fill_diagonal(corr_matrix.values, 0)  # Ignore self-correlations
 
-        # Find most highly correlated pair
-        max_corr = corr_matrix.unstack().idxmax()
-        x_col, y_col = max_corr
-        # if corr_matrix.loc[x_col, y_col] > 0.5:  # Only plot if strong correlation
-        saved_files.append(self._plot_scatterplot(df, x_col, y_col))
-
-        # Histograms for top 3 columns with highest variance
         if numeric_cols:
+            # Find most highly correlated pair
+            max_corr = corr_matrix.unstack().idxmax()
+            x_col, y_col = max_corr
+            if large:
+                leading.append(("scatter", {'x': x_col, 'y': y_col, 'bins': self.scatter_bins}, _render_binned_scatter,
+                                lambda: self._binned_scatter_args(df, x_col, y_col)))
+            else:
+                leading.append(("scatter", {'x': x_col, 'y': y_col}, _render_scatterplot,
+                                lambda: (df[x_col], df[y_col])))
+
+            # Histograms for top 3 columns with highest variance
             col_variances = df[numeric_cols].var().sort_values(ascending=False)
             top_var_cols = col_variances.head(3).index
             for col in top_var_cols:
-                saved_files.append(self._plot_histogram(df, col))
+                if large:
+                    leading.append(("histogram", {'column': col, **sampling}, _render_binned_histogram,
+                                    lambda col=col: self._binned_histogram_args(df[col])))
+                else:
+                    leading.append(("histogram", {'column': col}, _render_histogram, lambda col=col: (df[col],)))
 
-        # Boxplot for numeric columns with outliers
+        trailing = [
+            ("missing_heatmap", {'heatmap_rows': self.heatmap_rows}, _render_missing_heatmap,
+             lambda: (self._missing_matrix(df),)),
+            ("correlation_heatmap", {}, _render_correlation_heatmap, lambda: (df.corr(numeric_only=True),)),
+        ]
+
+        # Boxplot for numeric columns with outliers, within what is left of the cap
+        room = max(self.max_charts - len(leading) - len(trailing), 0)
         for col in numeric_cols:
+            if len(boxplots) == room:
+                break
             if self._has_outliers(df[col]):
-                saved_files.append(self._plot_boxplot(df, col))
+                if large:
+                    boxplots.append(("boxplot", {'column': col, **sampling}, _render_box_stats,
+                                     lambda col=col: self._box_stats_args(df[col])))
+                else:
+                    boxplots.append(("boxplot", {'column': col}, _render_boxplot, lambda col=col: (df[col],)))
 
-        saved_files.append(self._plot_missing_heatmap(df))
-        saved_files.append(self._plot_correlation_heatmap(df))
+        return (leading + boxplots + trailing)[:self.max_charts]
 
-        return saved_files
+    def _sample_positions(self, n):
+        # Fixed seed: the same dataset must give the same image for the chart cache
+        rng = np.random.default_rng(0)
+        return np.sort(rng.choice(n, size=self.sample_rows, replace=False))
+
+    def _binned_scatter_args(self, df, x_col, y_col):
+        """Row counts on a scatter_bins x scatter_bins grid over the rows where both columns are set."""
+        x = df[x_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        y = df[y_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        present = ~(np.isnan(x) | np.isnan(y))
+        counts, x_edges, y_edges = np.histogram2d(x[present], y[present], bins=self.scatter_bins)
+        return x_col, y_col, x_edges, y_edges, counts
 
-    def _save_plot(self, filename):
-        filepath = f"static/visuals/{filename}"
-        plt.tight_layout()
-        plt.savefig(filepath)
-        plt.close()
-        return filepath
+    def _binned_histogram_args(self, series):
+        values = series.dropna().to_numpy(dtype=np.float64)
+        counts, edges = np.histogram(values, bins=30)
+        if len(values) > self.sample_rows:
+            values = values[self._sample_positions(len(values))]
+        return series.name, edges, counts, values
+
+    def _box_stats_args(self, series, resolution=2000):
+        values = series.dropna().to_numpy(dtype=np.float64)
+        stats = cbook.boxplot_stats(values)[0]
+        fliers = stats['fliers']
+        if len(fliers) > resolution:
+            # Fliers closer than a pixel overlap anyway; keep one per screen bucket
+            span = (values.max() - values.min()) or 1.0
+            buckets = np.floor((fliers - values.min()) / span * resolution)
+            _, keep = np.unique(buckets, return_index=True)
+            stats['fliers'] = fliers[keep]
+        return series.name, stats
+
+    def _missing_matrix(self, df):
+        """df.isnull(), or the missing fraction per row bucket when df has more than heatmap_rows rows."""
+        if len(df) <= self.heatmap_rows:
+            return df.isnull()
+        starts = np.linspace(0, len(df), self.heatmap_rows, endpoint=False).astype(np.int64)
+        sizes = np.diff(np.append(starts, len(df)))
+        fractions = {col: np.add.reduceat(df[col].isna().to_numpy(dtype=np.float64), starts) / sizes
+                     for col in df.columns}
+        return pd.DataFrame(fractions, index=starts)
 
     def _has_outliers(self, series):
         q1 = series.quantile(0.25)
@@ -63,36 +317,3 @@ class DataVisualization:
         lower_bound = q1 - 1.5 * iqr
         upper_bound = q3 + 1.5 * iqr
         return ((series < lower_bound) | (series > upper_bound)).any()
-
-    def _plot_boxplot(self, df, column):
-        plt.figure(figsize=(6, 4))
-        sns.boxplot(x=df[column])
-        plt.title(f"Box Plot of {column}")
-        return self._save_plot(f"boxplot_{column}.png")
-
-    def _plot_scatterplot(self, df, x_col, y_col):
-        plt.figure(figsize=(6, 4))
-        sns.scatterplot(x=df[x_col], y=df[y_col])
-        plt.title(f"Scatter Plot of {x_col} vs {y_col}")
-        plt.xlabel(x_col)
-        plt.ylabel(y_col)
-        return self._save_plot(f"scatter_{x_col}_vs_{y_col}.png")
-
-    def _plot_histogram(self, df, column):
-        plt.figure(figsize=(6, 4))
-        sns.histplot(df[column], bins=30, kde=True)
-        plt.title(f"Histogram & KDE of {column}")
-        return self._save_plot(f"histogram_{column}.png")
-
-    def _plot_missing_heatmap(self, df):
-        plt.figure(figsize=(6, 4))
-        sns.heatmap(df.isnull(), cbar=False, cmap='viridis')
-        plt.title("Missing Values Heatmap")
-        return self._save_plot("missing_heatmap.png")
-
-    def _plot_correlation_heatmap(self, df):
-        plt.figure(figsize=(6, 4))
-        corr = df.corr(numeric_only=True)
-        sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f", linewidths=0.5)
-        plt.title("Correlation Heatmap")
-        return self._save_plot("correlation_heatmap.png")
@@ -0,0 +1,298 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.ipc as ipc
+
+from utils.column_profile import DatasetProfile
+from utils.xlsx_reader import XlsxReader, read_xlsx, xlsx_columns
+
+
+SNAPSHOT_EXTENSION = '.arrow'
+
+
+def read_source(filepath, sheet=None, columns=None):
+    """
+    Parses an uploaded CSV/XLSX file into a DataFrame. sheet picks the worksheet
+    of an XLSX file (name or position, default the first); other columns of a
+    worksheet are skipped while parsing.
+    """
+    if filepath.endswith('.csv'):
+        df = pd.read_csv(filepath)
+        return df[list(columns)] if columns is not None else df
+    elif filepath.endswith('.xlsx'):
+        return read_xlsx(filepath, sheet=sheet, columns=columns)
+    raise ValueError(f"Unsupported file format: {os.path.basename(filepath)}")
+
+
+def snapshot_path(filepath, snapshot_dir, sheet=None):
+    name = os.path.basename(filepath)
+    if sheet is not None:
+        name += f".sheet-{quote(str(sheet), safe='')}"
+    return os.path.join(snapshot_dir, name + SNAPSHOT_EXTENSION)
+
+
+def _to_arrow(df):
+    """Converts df to an Arrow table, falling back to strings for mixed-type object columns."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        df = df.copy()
+        for col in df.select_dtypes(include=['object']).columns:
+            try:
+                pa.array(df[col], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                df[col] = df[col].astype(str).where(df[col].notna())
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_snapshot(df, filepath, snapshot_dir, sheet=None):
+    """
+    Writes df as an uncompressed Arrow IPC (Feather v2) file next to the upload.
+
+    Uncompressed IPC can be memory-mapped, so later reads only page in the
+    columns they project instead of re-parsing the whole text file.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = snapshot_path(filepath, snapshot_dir, sheet)
+    tmp_path = path + '.tmp'
+    feather.write_feather(_to_arrow(df), tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    return path
+
+
+def _widen(current, incoming):
+    """The Arrow type of a column whose chunks came as current and incoming, as _to_arrow types a whole column."""
+    if pa.types.is_null(current) or pa.types.is_null(incoming):
+        kind = incoming if pa.types.is_null(current) else current
+        # Booleans with gaps are read as 1.0/0.0/NaN
+        return pa.float64() if pa.types.is_boolean(kind) else kind
+    if current == incoming:
+        return current
+    numeric = (pa.types.is_integer, pa.types.is_floating, pa.types.is_boolean)
+    if all(any(check(kind) for check in numeric) for kind in (current, incoming)):
+        return pa.float64()
+    return pa.string()
+
+
+def write_xlsx_snapshot(filepath, snapshot_dir, sheet=None, chunk_rows=100_000):
+    """
+    Streams one worksheet of an .xlsx upload into its snapshot chunk by chunk, so
+    the sheet is never held whole as Python values. Chunks are typed one at a
+    time; when a later chunk needs a wider column type (ints then floats,
+    numbers then text, empty then anything), the batches written so far are
+    rewritten once with it.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = snapshot_path(filepath, snapshot_dir, sheet)
+    tmp_paths = [path + '.tmp', path + '.tmp2']
+    writer = schema = None
+    try:
+        with XlsxReader(filepath) as reader:
+            for chunk in reader.iter_chunks(sheet, chunk_rows=chunk_rows):
+                table = _to_arrow(chunk)
+                if writer is None:
+                    schema = table.schema
+                    writer = ipc.new_file(tmp_paths[0], schema)
+                wider = pa.schema([field.with_type(_widen(field.type, kind))
+                                   for field, kind in zip(schema, table.schema.types)], metadata=schema.metadata)
+                if not wider.equals(schema):
+                    writer.close()
+                    with pa.memory_map(tmp_paths[0]) as source:
+                        written = ipc.open_file(source).read_all()
+                    tmp_paths.reverse()
+                    writer = ipc.new_file(tmp_paths[0], wider)
+                    writer.write_table(written.cast(wider))
+                    schema = wider
+                writer.write_table(table.cast(schema))
+        writer.close()
+        writer = None
+        os.replace(tmp_paths[0], path)
+    finally:
+        if writer is not None:
+            writer.close()
+        for tmp_path in tmp_paths:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return path
+
+
+def has_fresh_snapshot(filepath, snapshot_dir, sheet=None):
+    if not snapshot_dir:
+        return False
+    path = snapshot_path(filepath, snapshot_dir, sheet)
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(filepath)
+
+
+def read_dataset(filepath, columns=None, snapshot_dir=None, sheet=None):
+    """
+    Loads an upload, preferring its columnar snapshot when it is up to date.
+
+    Parameters:
+    - filepath (str): Path of the original CSV/XLSX upload.
+    - columns (list, optional): Only load these columns. Default is None (all columns).
+    - snapshot_dir (str, optional): Folder holding snapshots written by write_snapshot.
+    - sheet (str or int, optional): Worksheet of an XLSX upload. Default is None (the first).
+
+    Returns:
+    - pd.DataFrame: The parsed dataset.
+    """
+    if has_fresh_snapshot(filepath, snapshot_dir, sheet):
+        table = feather.read_table(snapshot_path(filepath, snapshot_dir, sheet), columns=columns, memory_map=True)
+        return table.to_pandas()
+
+    return read_source(filepath, sheet=sheet, columns=columns)
+
+
+def read_columns(filepath, snapshot_dir=None, sheet=None):
+    """Returns the column names of an upload without loading any data (only the header row of a text file)."""
+    if has_fresh_snapshot(filepath, snapshot_dir, sheet):
+        with pa.memory_map(snapshot_path(filepath, snapshot_dir, sheet)) as source:
+            return pa.ipc.open_file(source).schema.names
+    if filepath.endswith('.csv'):
+        return pd.read_csv(filepath, nrows=0).columns.tolist()
+    return xlsx_columns(filepath, sheet)
+
+
+class DatasetCache:
+    """
+    Process-wide cache of parsed uploads so every route parses a file only once.
+
+    Entries are keyed by (filepath, mtime, size, columns, sheet), so re-uploading a file
+    under the same name invalidates the old entry. The least recently used frames
+    are evicted once the deep memory usage of all cached frames exceeds max_bytes.
+
+    Cached frames are shared between requests: callers that modify the DataFrame
+    in place must work on a copy. The DatasetProfile of each cached upload is kept
+    alongside it, so /strategies and /process reuse the profiling done by /analyze.
+    With a BlockProfileStore, profiles of new versions of a CSV dataset reuse the
+    statistics of its unchanged blocks of bytes.
+    """
+
+    def __init__(self, max_bytes=1024 * 1024 * 1024, snapshot_dir=None, duplicate_engine=None, block_profiles=None):
+        self.max_bytes = max_bytes
+        self.snapshot_dir = snapshot_dir
+        self.duplicate_engine = duplicate_engine
+        self.block_profiles = block_profiles
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(filepath, columns=None, sheet=None):
+        stat = os.stat(filepath)
+        columns = tuple(columns) if columns is not None else None
+        return (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size, columns, sheet)
+
+    def version_hash(self, filepath, sheet=None):
+        """
+        Hash of an upload's cache key (path, mtime, size, sheet): names the version
+        of the data the cache serves for it, without reading or hashing its content.
+        """
+        return hashlib.sha1(json.dumps(self.make_key(filepath, sheet=sheet)).encode('utf-8')).hexdigest()
+
+    def get(self, filepath, columns=None, sheet=None):
+        """Returns the parsed DataFrame for filepath (and worksheet), loading it on a miss."""
+        key = self.make_key(filepath, columns, sheet)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        if (self.snapshot_dir and filepath.endswith('.xlsx')
+                and not has_fresh_snapshot(filepath, self.snapshot_dir, sheet)):
+            # Parsing a worksheet costs about the same whatever columns are kept,
+            # so convert the whole sheet once and project from the snapshot later
+            df = self.snapshot(filepath, sheet)
+            if columns is None:
+                return df
+            df = df[list(columns)]
+        else:
+            df = read_dataset(filepath, columns=columns, snapshot_dir=self.snapshot_dir, sheet=sheet)
+        self.put(key, df)
+        return df
+
+    def profile(self, filepath, sheet=None):
+        """Returns the DatasetProfile of the full upload, computing it once per version."""
+        key = self.make_key(filepath, sheet=sheet)
+        with self._lock:
+            profile = self._profiles.get(key)
+        if profile is None:
+            df = self.get(filepath, sheet=sheet)
+            if self.block_profiles is not None:
+                profile = self.block_profiles.profile(df, filepath)
+            else:
+                profile = DatasetProfile(df, duplicate_engine=self.duplicate_engine)
+            with self._lock:
+                if key in self._entries:
+                    self._profiles[key] = profile
+        return profile
+
+    def snapshot(self, filepath, sheet=None):
+        """
+        Parses a freshly uploaded file (or one worksheet of it) once, writes its
+        columnar snapshot and primes the cache, so the first /analyze does not
+        parse the text again. Worksheets are streamed into the snapshot and read
+        back from it.
+        """
+        if self.snapshot_dir and filepath.endswith('.xlsx'):
+            write_xlsx_snapshot(filepath, self.snapshot_dir, sheet)
+            df = read_dataset(filepath, snapshot_dir=self.snapshot_dir, sheet=sheet)
+        else:
+            df = read_source(filepath, sheet=sheet)
+            if self.snapshot_dir:
+                write_snapshot(df, filepath, self.snapshot_dir, sheet)
+        self.put(self.make_key(filepath, sheet=sheet), df)
+        return df
+
+    def put(self, key, df):
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            self._drop_stale(key[0], keep_version=key[1:3])
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                # Too large to keep; the caller still gets the parsed frame.
+                return
+            self._entries[key] = (df, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                evicted_key, (_, evicted_size) = self._entries.popitem(last=False)
+                self._profiles.pop(evicted_key, None)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, filepath):
+        with self._lock:
+            self._drop_stale(os.path.abspath(filepath))
+
+    def _drop_stale(self, path, keep_version=None):
+        for key in [k for k in self._entries if k[0] == path and k[1:3] != keep_version]:
+            _, size = self._entries.pop(key)
+            self._profiles.pop(key, None)
+            self.current_bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'profiles': len(self._profiles),
+                'current_bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
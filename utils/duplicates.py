@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# hash_pandas_object needs 16-character keys; the second one gives the upper 64 bits
+HASH_KEYS = ('0123456789123456', 'fedcba9876543210')
+
+
+def hash_rows(df, bits=64):
+    """
+    Fingerprint of every row of df: a uint64 array, or an (n, 2) uint64 array
+    for bits=128. Equal rows (NaN included) get equal fingerprints.
+    """
+    hashes = [pd.util.hash_pandas_object(df, index=False, hash_key=key).to_numpy()
+              for key in HASH_KEYS[:bits // 64]]
+    return hashes[0] if bits == 64 else np.column_stack(hashes)
+
+
+def duplicated_mask(fingerprints, keep='first'):
+    """Boolean mask of duplicate rows, with DataFrame.duplicated's keep semantics."""
+    if fingerprints.ndim == 1:
+        return pd.Series(fingerprints).duplicated(keep=keep).to_numpy()
+    return pd.DataFrame(fingerprints).duplicated(keep=keep).to_numpy()
+
+
+class DuplicateEngine:
+    """
+    Duplicate detection on compact row fingerprints instead of the rows themselves.
+
+    Rows are hashed once per column subset, in chunks of chunk_rows rows spread over
+    `workers` threads (pandas hashes numeric columns in numpy, outside the GIL).
+    The same fingerprints then answer both "how many duplicates" and "which rows
+    to drop". Values that only differ in type (1 and '1' in an object column)
+    hash alike, which DataFrame.duplicated would tell apart.
+    """
+
+    def __init__(self, workers=None, chunk_rows=250_000, bits=64):
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.bits = bits
+
+    def fingerprints(self, df, subset=None):
+        if subset is not None:
+            df = df[list(subset)]
+        if len(df) <= self.chunk_rows or self.workers == 1:
+            return hash_rows(df, self.bits)
+
+        chunks = [df.iloc[start:start + self.chunk_rows] for start in range(0, len(df), self.chunk_rows)]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return np.concatenate(list(pool.map(lambda chunk: hash_rows(chunk, self.bits), chunks)))
+
+    def fingerprints_csv(self, filepath, subset=None, chunksize=100_000):
+        """
+        Fingerprints of a CSV file read in chunks, for files too large to load.
+        Values are hashed as text, so they only compare with other text reads.
+        """
+        parts = [self.fingerprints(chunk) for chunk in
+                 pd.read_csv(filepath, chunksize=chunksize, dtype=str, usecols=subset)]
+        if not parts:
+            return np.empty((0,) if self.bits == 64 else (0, 2), dtype=np.uint64)
+        return np.concatenate(parts)
+
+    def count(self, fingerprints):
+        """Number of rows that duplicate an earlier row."""
+        return int(duplicated_mask(fingerprints).sum())
+
+    def drop(self, df, fingerprints, keep='first'):
+        """Returns df without its duplicate rows and the number of rows removed; df itself when there are none."""
+        mask = duplicated_mask(fingerprints, keep=keep)
+        removed = int(mask.sum())
+        if not removed:
+            return df, 0
+        # take() gives an independent frame, so later stages can edit it in place
+        return df.take(np.flatnonzero(~mask)), removed
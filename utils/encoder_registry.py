@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from datetime import datetime
+
+from utils.cleaning_plan import to_jsonable
+
+# Encoders whose fitted state is a category dictionary, and the key it is stored under
+DICTIONARY_ENCODERS = {'label': 'classes', 'one_hot': 'categories', 'ordinal': 'categories', 'category': 'categories'}
+
+
+def column_fingerprint(scope, column, dtype, method):
+    """
+    Registry key of one column of a feed: the feed's scope (the schema fingerprint
+    of its input, see CleaningPlan.schema_fingerprint), the column's name, its
+    input dtype and the encoding method.
+    """
+    return hashlib.sha1(json.dumps([scope, str(column), str(dtype), method]).encode('utf-8')).hexdigest()
+
+
+class EncoderRegistry:
+    """
+    Category dictionaries of fitted encoders, kept across uploads so every file of
+    the same feed gets the same codes.
+
+    Dictionaries are keyed by column_fingerprint, so only uploads with the same
+    input schema share them. The first upload stores its fitted order; later ones
+    reuse it and append categories it has not seen, so existing codes and one-hot
+    columns never move. A stored dictionary grows to at most max_categories
+    entries; categories beyond that stay unknown to the encoder (-1, NaN or no
+    one-hot column). Frequency and target maps are statistics of each file, not
+    dictionaries, and are not stored.
+
+    With a path, dictionaries live in a SQLite table of compact JSON arrays shared
+    by every process, read inside each merge's transaction; without one, in an
+    in-memory LRU of max_memory_entries dictionaries.
+    """
+
+    def __init__(self, path=None, max_memory_entries=1024, max_categories=10_000):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_categories = max_categories
+        self.hits = 0
+        self.misses = 0
+        self.extended = 0
+        self.capped = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with closing(self._connect()) as conn, conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS dictionaries (key TEXT PRIMARY KEY, column_name TEXT NOT NULL,"
+                             " method TEXT NOT NULL, categories TEXT NOT NULL, updated_at TEXT NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def merge(self, encoder, scope, dtype, accept=None):
+        """
+        Replaces the fitted categories of a dictionary encoder with the stored ones
+        plus those it adds, up to max_categories, and stores the result. accept,
+        if given, is called with the extended encoder first; when it returns False
+        nothing is stored and None is returned. Other encoders are returned as is.
+
+        The read, the check and the write are one step: under the registry lock
+        and, with a path, in one BEGIN IMMEDIATE transaction, so concurrent jobs,
+        in this process or another, never drop each other's categories.
+        """
+        field = DICTIONARY_ENCODERS.get(encoder['method'])
+        if field is None:
+            return encoder
+        key = column_fingerprint(scope, encoder['column'], dtype, encoder['method'])
+        fitted = to_jsonable(encoder[field])
+        with self._lock, self._transaction() as conn:
+            stored = self._get(conn, key)
+            if stored is None:
+                categories = fitted
+            else:
+                known = set(stored)
+                unseen = [category for category in fitted if category not in known]
+                room = max(self.max_categories - len(stored), 0)
+                self.capped += len(unseen) > room
+                categories = stored + unseen[:room]
+            extended = dict(encoder, **{field: categories})
+            if accept is not None and not accept(extended):
+                return None
+            if categories != stored:
+                self.extended += stored is not None
+                self._put(conn, key, encoder, categories)
+            return extended
+
+    @contextmanager
+    def _transaction(self):
+        if not self.path:
+            yield None
+            return
+        with closing(self._connect()) as conn:
+            # Taking the write lock up front keeps another process from writing between our read and write
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def _get(self, conn, key):
+        if conn is None:
+            stored = self._memory.get(key)
+        else:
+            # Read inside the transaction: another process may have extended the dictionary
+            row = conn.execute("SELECT categories FROM dictionaries WHERE key = ?", (key,)).fetchone()
+            stored = None if row is None else json.loads(row[0])
+        if stored is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._remember(key, stored)
+        return stored
+
+    def _put(self, conn, key, encoder, categories):
+        self._remember(key, categories)
+        if conn is not None:
+            conn.execute("INSERT OR REPLACE INTO dictionaries (key, column_name, method, categories, updated_at)"
+                         " VALUES (?, ?, ?, ?, ?)",
+                         (key, str(encoder['column']), encoder['method'],
+                          json.dumps(categories, separators=(',', ':')),
+                          datetime.now().isoformat(timespec='seconds')))
+
+    def _remember(self, key, categories):
+        self._memory[key] = categories
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'extended': self.extended, 'capped': self.capped,
+                    'memory_entries': len(self._memory)}
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+from sklearn.impute import IterativeImputer, KNNImputer
+
+from utils.cleaning_plan import to_jsonable
+
+IMPUTATION_METHODS = ('knn', 'iterative')
+
+
+def numeric_block(df):
+    """Columns that take part in imputation: numeric, not boolean."""
+    return [col for col in df.columns
+            if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])]
+
+
+def _as_array(values):
+    return np.array([[np.nan if value is None else value for value in row] for row in values], dtype=float)
+
+
+class ImputationEngine:
+    """
+    Fills gaps in numeric columns from the other numeric columns of the same row.
+
+    One model is fitted per method over the whole numeric block (not one per
+    column on that column alone, which has nothing to learn from), on at most
+    sample_rows rows drawn at random, so fitting cost does not grow with the
+    table; transform() then fills every row. Models are plain JSON so they can
+    be stored in a CleaningPlan and replayed on later files or chunks, apart
+    from the knn donors: a float array the caller keeps beside the model (see
+    CleaningPlan.add_array) and passes back to transform().
+
+    - knn: up to donor_rows sampled rows, standardized, are the donors. Each row
+      with a gap takes the mean of its n_neighbors nearest donors that have the
+      value (nan-euclidean distance over the features both rows have). Rows are
+      compared in blocks of block_rows spread over `workers` threads, so memory
+      is bounded by block_rows x donor_rows distances.
+    - iterative: IterativeImputer (round-robin BayesianRidge regressions) fitted
+      on the sample. Its regressions are linear, so their coefficients are
+      stored and replayed over the full table in numpy.
+    """
+
+    def __init__(self, workers=None, sample_rows=50_000, donor_rows=5_000, n_neighbors=5, block_rows=2_000,
+                 max_iter=10, seed=0):
+        self.workers = workers
+        self.sample_rows = sample_rows
+        self.donor_rows = donor_rows
+        self.n_neighbors = n_neighbors
+        self.block_rows = block_rows
+        self.max_iter = max_iter
+        self.seed = seed
+
+    def fit(self, df, columns, method):
+        """
+        Fits a `method` model that fills `columns` of df, or returns None when
+        none of them has a value to learn from. The model's 'columns' lists the
+        ones it covers.
+        """
+        if method not in IMPUTATION_METHODS:
+            raise ValueError(f"Unknown imputation method: {method}")
+        features = numeric_block(df)
+        sample = df[features]
+        limit = self.donor_rows if method == 'knn' else self.sample_rows
+        if len(sample) > limit:
+            rng = np.random.default_rng(self.seed)
+            sample = sample.take(np.sort(rng.choice(len(sample), size=limit, replace=False)))
+        X = sample.to_numpy(dtype=float, na_value=np.nan)
+
+        # Features without a single sampled value cannot be learned from or filled
+        has_values = ~np.isnan(X).all(axis=0)
+        features = [col for col, keep in zip(features, has_values) if keep]
+        X = X[:, has_values]
+        columns = [col for col in columns if col in features]
+        if not columns:
+            return None
+
+        model = {'method': method, 'features': features, 'columns': columns}
+        if method == 'knn':
+            mean = np.nanmean(X, axis=0)
+            scale = np.nanstd(X, axis=0)
+            scale[~(scale > 0)] = 1.0
+            model.update(mean=mean, scale=scale, n_neighbors=self.n_neighbors, donors=(X - mean) / scale)
+        else:
+            imputer = IterativeImputer(max_iter=self.max_iter, random_state=self.seed)
+            imputer.fit(X)
+            model.update(initial=imputer.initial_imputer_.statistics_, sequence=[
+                {'feature': int(step.feat_idx), 'inputs': step.neighbor_feat_idx,
+                 'coef': step.estimator.coef_, 'intercept': float(step.estimator.intercept_)}
+                for step in imputer.imputation_sequence_
+            ])
+        donors = model.pop('donors', None)
+        model = to_jsonable(model)
+        if donors is not None:
+            model['donors'] = donors
+        return model
+
+    def transform(self, df, model, arrays=None):
+        """
+        Fills the model's columns of df in place; only rows with a gap in them are
+        touched. A knn model whose donors are a name finds them in arrays.
+        """
+        columns = model['columns']
+        gaps = df[columns].isna().to_numpy()
+        rows = np.flatnonzero(gaps.any(axis=1))
+        if not len(rows):
+            return df
+
+        X = df[model['features']].take(rows).to_numpy(dtype=float, na_value=np.nan)
+        if model['method'] == 'knn':
+            donors = model['donors']
+            donors = arrays[donors] if isinstance(donors, str) else _as_array(donors)
+            filled = self._transform_knn(X, model, donors)
+        else:
+            filled = self._transform_iterative(X, model)
+
+        for j, col in enumerate(model['features']):
+            if col not in columns:
+                continue
+            missing = gaps[rows, columns.index(col)]
+            values = df[col].to_numpy(dtype=float, na_value=np.nan, copy=True)
+            values[rows[missing]] = filled[missing, j]
+            df[col] = values
+        return df
+
+    def _transform_knn(self, X, model, donors):
+        mean, scale = np.array(model['mean']), np.array(model['scale'])
+        # KNNImputer.fit only stores the donors, so rebuilding it from the model is cheap
+        imputer = KNNImputer(n_neighbors=model['n_neighbors']).fit(donors)
+        X = (X - mean) / scale
+        blocks = [X[start:start + self.block_rows] for start in range(0, len(X), self.block_rows)]
+        if len(blocks) == 1 or self.workers == 1:
+            filled = [imputer.transform(block) for block in blocks]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                filled = list(pool.map(imputer.transform, blocks))
+        return np.vstack(filled) * scale + mean
+
+    def _transform_iterative(self, X, model):
+        """IterativeImputer.transform with the stored regressions: mean-fill, then every step in fit order."""
+        missing = np.isnan(X)
+        X = np.where(missing, np.array(model['initial']), X)
+        for step in model['sequence']:
+            rows = missing[:, step['feature']]
+            if rows.any():
+                X[rows, step['feature']] = X[np.ix_(rows, step['inputs'])] @ np.array(step['coef']) + step['intercept']
+        return X
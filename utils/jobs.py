@@ -0,0 +1,89 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """State of one background job, as reported by JobManager.status()."""
+
+    def __init__(self, job_id, total_stages):
+        self.id = job_id
+        self.status = 'queued'
+        self.stage = None
+        self.stage_index = 0
+        self.total_stages = total_stages
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.stage_index / self.total_stages, 3) if self.total_stages else None,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    In-process job queue backed by a thread pool.
+
+    submit(fn, ...) calls fn(*args, progress=callback, **kwargs) on a worker
+    thread; fn reports stage boundaries through callback(stage, index, total).
+    Only the most recent `retention` jobs are kept for polling.
+    """
+
+    def __init__(self, max_workers=2, retention=100):
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, total_stages=None, **kwargs):
+        job = Job(uuid.uuid4().hex, total_stages)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.retention:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if oldest.status in ('queued', 'running'):
+                    break
+                del self._jobs[oldest_id]
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        def progress(stage, index, total):
+            with self._lock:
+                job.stage, job.stage_index, job.total_stages = stage, index, total
+
+        with self._lock:
+            job.status = 'running'
+            job.started_at = time.time()
+        try:
+            result = fn(*args, progress=progress, **kwargs)
+            with self._lock:
+                job.result = result
+                job.status = 'done'
+                job.stage_index = job.total_stages or job.stage_index
+        except Exception as e:
+            with self._lock:
+                job.error = str(e)
+                job.status = 'failed'
+        finally:
+            with self._lock:
+                job.finished_at = time.time()
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
@@ -0,0 +1,135 @@
+import re
+import time
+
+import jieba
+import numpy as np
+import pandas as pd
+from nltk.corpus import stopwords
+from nltk.tokenize import word_tokenize
+from textblob import TextBlob
+
+from utils.spelling import should_skip_column
+from utils.text_pool import text_pool
+
+
+ABBREVIATIONS = {
+    "u": "you",
+    "r": "are",
+    "btw": "by the way",
+    "gonna": "going to",
+    "wanna": "want to",
+    "teh": "the"
+}
+
+CAMEL_CASE_PATTERN = re.compile(r'([a-z])([A-Z])')
+HASHTAG_PATTERN = re.compile(r'#(\w+)')
+CAPITALIZED_WORD_PATTERN = re.compile('[A-Z][^A-Z]*')
+CJK_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+
+STAGES = ('normalization', 'pruning', 'segmentation')
+
+_stop_words = None
+
+
+def get_stop_words():
+    """English stopwords, loaded once per process."""
+    global _stop_words
+    if _stop_words is None:
+        _stop_words = frozenset(stopwords.words('english'))
+    return _stop_words
+
+
+def init_worker():
+    """Loads TextBlob's spelling model; run once in every text_pool worker."""
+    TextBlob('teh').correct()
+
+
+def normalize(text):
+    """Corrects spelling and expands common abbreviations."""
+    corrected_text = str(TextBlob(text).correct())
+    words = word_tokenize(corrected_text)
+    return ' '.join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def prune(text):
+    """Removes stopwords from the text."""
+    stop_words = get_stop_words()
+    return ' '.join(word for word in word_tokenize(text) if word.lower() not in stop_words)
+
+
+def segment(text):
+    """Splits hashtags, camelCase words, and segments Chinese/Japanese text."""
+    text = CAMEL_CASE_PATTERN.sub(r'\1 \2', text)
+    text = HASHTAG_PATTERN.sub(lambda m: ' '.join(CAPITALIZED_WORD_PATTERN.findall(m.group(1))), text)
+    if CJK_PATTERN.search(text):
+        text = " ".join(jieba.cut(text))
+    return text
+
+
+STAGE_FUNCTIONS = dict(zip(STAGES, (normalize, prune, segment)))
+
+
+def process_batch(texts):
+    """
+    Runs every stage over a batch of distinct strings.
+
+    Returns the cleaned strings and the seconds spent in each stage, so that
+    process-pool workers can report their timings back.
+    """
+    timings = dict.fromkeys(STAGES, 0.0)
+    for stage, function in STAGE_FUNCTIONS.items():
+        start = time.perf_counter()
+        texts = [function(text) for text in texts]
+        timings[stage] += time.perf_counter() - start
+    return texts, timings
+
+
+class LexicalEngine:
+    """
+    Lexical clean-up (normalization, stopword pruning, segmentation) over the
+    distinct strings of each column.
+
+    Batches of distinct values go to the shared text_pool of `workers` processes
+    once a column has at least parallel_threshold of them; workers=1 keeps
+    everything in process. Seconds spent per stage are accumulated in stage_timings.
+    """
+
+    def __init__(self, workers=None, parallel_threshold=1000, batch_size=200):
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        self.batch_size = batch_size
+        self.stage_timings = dict.fromkeys(STAGES, 0.0)
+
+    def reset_timings(self):
+        self.stage_timings = dict.fromkeys(STAGES, 0.0)
+
+    def resolve_series(self, series):
+        """Returns series with every string value cleaned; other values are kept."""
+        codes, uniques = pd.factorize(series)
+        values = pd.Series(uniques, dtype=object)
+        strings = values[values.map(lambda x: isinstance(x, str))]
+        if should_skip_column(series.name, strings):
+            return series
+
+        resolved = values.copy()
+        resolved[strings.index] = self.resolve_texts(strings.tolist())
+        resolved = resolved.to_numpy(dtype=object)
+        return pd.Series(np.where(codes >= 0, resolved[codes], series.to_numpy(dtype=object)),
+                         index=series.index, name=series.name)
+
+    def resolve_texts(self, texts):
+        if len(texts) < self.parallel_threshold or self.workers == 1:
+            results, timings = process_batch(texts)
+            self._add_timings(timings)
+            return results
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = []
+        for batch_results, timings in text_pool(self.workers).map(process_batch, batches):
+            results.extend(batch_results)
+            self._add_timings(timings)
+        return results
+
+    def _add_timings(self, timings):
+        for stage, seconds in timings.items():
+            self.stage_timings[stage] += seconds
@@ -0,0 +1,78 @@
+import threading
+import tracemalloc
+
+_lock = threading.Lock()
+_users = 0
+_owns_tracing = False
+
+
+def _acquire():
+    global _users, _owns_tracing
+    with _lock:
+        if _users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _owns_tracing = True
+        _users += 1
+
+
+def _release():
+    global _users, _owns_tracing
+    with _lock:
+        _users -= 1
+        if _users == 0 and _owns_tracing:
+            tracemalloc.stop()
+            _owns_tracing = False
+
+
+class StageMemoryTracker:
+    """
+    Peak and retained heap bytes per pipeline stage, measured with tracemalloc.
+
+    numpy and pandas allocate their buffers through traced allocators, so the
+    numbers include the frames themselves. Both are relative to what was
+    allocated when the run started: peak_bytes is the highest point reached
+    during the stage, retained_bytes what was still allocated when it ended.
+
+    tracemalloc is process-wide, so runs tracked at the same time see each
+    other's allocations (and peak resets). Tracing slows allocation-heavy code
+    down, so it only runs while some tracker is started.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._stage = None
+        self._base = 0
+        self._tracing = False
+
+    def start(self, stage):
+        if not self._tracing:
+            _acquire()
+            self._tracing = True
+        self.stages = {}
+        self._stage = stage
+        self._base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    def mark(self, stage):
+        """
+        Ends the running stage and starts `stage`, or only ends it when stage is
+        None. Marking the running stage again does nothing.
+        """
+        if stage == self._stage:
+            return
+        if self._stage is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            self.stages[self._stage] = {
+                'peak_bytes': max(peak - self._base, 0),
+                'retained_bytes': current - self._base,
+            }
+        self._stage = stage
+
+    def stop(self):
+        """Ends the running stage, stops tracing if no other tracker needs it and returns the stages."""
+        if self._tracing:
+            self.mark(None)
+            _release()
+            self._tracing = False
+        return self.stages
@@ -0,0 +1,122 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-stage fields and how they appear in the Prometheus exposition
+METRICS = (
+    ('runs', 'counter', 'Completed runs of the stage.'),
+    ('wall_seconds', 'counter', 'Wall-clock seconds spent in the stage.'),
+    ('cpu_seconds', 'counter', 'CPU seconds of the thread running the stage.'),
+    ('rows_in', 'counter', 'Rows the stage received.'),
+    ('rows_out', 'counter', 'Rows the stage returned.'),
+    ('peak_memory_bytes', 'gauge', 'Largest traced memory peak of one run of the stage, above its run start.'),
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class StageProfiler:
+    """
+    Wall time, CPU time and row counts of the consecutive stages of one run.
+
+    CPU time is that of the calling thread, so work handed to pools (lexical,
+    spelling, charts) shows up in wall time only.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._stage = None
+
+    def start(self, stage, rows=None):
+        self.stages = {}
+        self._open(stage, rows)
+
+    def mark(self, stage, rows=None):
+        """
+        Ends the running stage with rows_out=rows and starts `stage` with rows_in=rows,
+        or only ends it when stage is None. Marking the running stage again does nothing.
+        """
+        if stage == self._stage:
+            return
+        if self._stage is not None:
+            self.stages[self._stage] = {
+                'wall_seconds': round(time.perf_counter() - self._wall, 6),
+                'cpu_seconds': round(time.thread_time() - self._cpu, 6),
+                'rows_in': self._rows_in,
+                'rows_out': rows,
+            }
+        if stage is not None:
+            self._open(stage, rows)
+        else:
+            self._stage = None
+
+    def stop(self, rows=None):
+        self.mark(None, rows)
+        return self.stages
+
+    def _open(self, stage, rows):
+        self._stage = stage
+        self._rows_in = rows
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+
+
+class MetricsRegistry:
+    """
+    Totals of instrumented work since the process started, per component
+    (pipeline, analyzer, chart, ...) and stage, rendered in the Prometheus text
+    exposition format by render(). Every worker process keeps its own totals.
+    """
+
+    def __init__(self, prefix='datacleaner'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, component, stage, wall_seconds, cpu_seconds=None, rows_in=None, rows_out=None,
+               peak_memory_bytes=None):
+        with self._lock:
+            totals = self._totals.setdefault((component, stage), {name: None for name, _, _ in METRICS})
+            for name, value in (('runs', 1), ('wall_seconds', wall_seconds), ('cpu_seconds', cpu_seconds),
+                                ('rows_in', rows_in), ('rows_out', rows_out)):
+                if value is not None:
+                    totals[name] = (totals[name] or 0) + value
+            if peak_memory_bytes is not None:
+                totals['peak_memory_bytes'] = max(totals['peak_memory_bytes'] or 0, peak_memory_bytes)
+
+    def observe(self, component, stages):
+        """Records every stage of a StageProfiler result."""
+        for stage, values in stages.items():
+            self.record(component, stage, **values)
+
+    @contextmanager
+    def span(self, component, stage, rows_in=None):
+        """
+        Times the body as one run of (component, stage). The yielded dict can be
+        given rows_out (or other fields) before the block ends.
+        """
+        values = {'rows_in': rows_in}
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield values
+        finally:
+            values['wall_seconds'] = time.perf_counter() - wall
+            values['cpu_seconds'] = time.thread_time() - cpu
+            self.record(component, stage, **values)
+
+    def render(self):
+        with self._lock:
+            totals = {key: dict(values) for key, values in sorted(self._totals.items())}
+
+        lines = []
+        for name, kind, help_text in METRICS:
+            metric = f"{self.prefix}_stage_{name}" + ('_total' if kind == 'counter' else '')
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for (component, stage), values in totals.items():
+                if values[name] is not None:
+                    labels = f'component="{_escape(component)}",stage="{_escape(stage)}"'
+                    lines.append(f"{metric}{{{labels}}} {values[name]}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,179 @@
+import csv
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import camelot
+from pypdf import PdfReader
+
+# Bump whenever extraction changes, so cached pages are not reused
+EXTRACTOR_VERSION = 1
+
+
+def file_digest(filepath, block_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_pages(filepath, pages):
+    """
+    Extracts the tables of the given pages, choosing the flavor per page:
+    lattice first, then stream for the pages where lattice found nothing.
+
+    Returns {page: {'flavor': str or None, 'tables': [rows, ...]}}.
+    """
+    results = {page: {'flavor': None, 'tables': []} for page in pages}
+    remaining = list(pages)
+    for flavor in ('lattice', 'stream'):
+        if not remaining:
+            break
+        tables = camelot.read_pdf(filepath, pages=','.join(map(str, remaining)), flavor=flavor, suppress_stdout=True)
+        for table in tables:
+            entry = results[int(table.page)]
+            entry['flavor'] = flavor
+            entry['tables'].append(table.df.values.tolist())
+        remaining = [page for page in remaining if not results[page]['tables']]
+    return results
+
+
+class PDFTableExtractor:
+    """
+    Extracts every table of a PDF into one CSV.
+
+    Uncached pages are split into ranges of pages_per_task pages and extracted
+    in a pool of `workers` processes. Each page's tables are cached on disk under
+    (file hash, page), so a retry only parses the pages that did not finish.
+    Rows are written in page order as soon as the pages before them are done.
+    """
+
+    def __init__(self, cache_folder, workers=None, pages_per_task=4):
+        self.cache_folder = cache_folder
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        os.makedirs(cache_folder, exist_ok=True)
+
+    def extract_to_csv(self, filepath, output_path):
+        """
+        Writes the tables of filepath to output_path, the first row becoming the
+        header as before. Returns a summary with the page, table and row counts,
+        the flavor used per page and how many pages came from the cache.
+        """
+        digest = file_digest(filepath)
+        pages = list(range(1, len(PdfReader(filepath, strict=False).pages) + 1))
+
+        results = {}
+        for page in pages:
+            entry = self._load(digest, page)
+            if entry is not None:
+                results[page] = entry
+        cached_pages = len(results)
+        missing = [page for page in pages if page not in results]
+        tasks = [missing[i:i + self.pages_per_task] for i in range(0, len(missing), self.pages_per_task)]
+
+        writer = _TableWriter(output_path)
+        summary = {'pages': len(pages), 'tables': 0, 'cached_pages': cached_pages, 'flavors': {}}
+        next_index = 0
+
+        def write_ready():
+            nonlocal next_index
+            while next_index < len(pages) and pages[next_index] in results:
+                page = pages[next_index]
+                entry = results.pop(page)
+                summary['flavors'][page] = entry['flavor']
+                summary['tables'] += len(entry['tables'])
+                for rows in entry['tables']:
+                    writer.write_rows(rows)
+                next_index += 1
+
+        try:
+            write_ready()
+            if self.workers == 1 or len(tasks) <= 1:
+                for task in tasks:
+                    self._collect(digest, extract_pages(filepath, task), results)
+                    write_ready()
+            elif tasks:
+                with ProcessPoolExecutor(max_workers=min(self.workers or os.cpu_count() or 1, len(tasks))) as pool:
+                    futures = [pool.submit(extract_pages, filepath, task) for task in tasks]
+                    for future in as_completed(futures):
+                        self._collect(digest, future.result(), results)
+                        write_ready()
+            summary['rows'] = writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        return summary
+
+    def _collect(self, digest, extracted, results):
+        for page, entry in extracted.items():
+            self._store(digest, page, entry)
+            results[page] = entry
+
+    def _cache_path(self, digest, page):
+        return os.path.join(self.cache_folder, f"{digest}_v{EXTRACTOR_VERSION}_p{page}.json")
+
+    def _load(self, digest, page):
+        try:
+            with open(self._cache_path(digest, page), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _store(self, digest, page, entry):
+        path = self._cache_path(digest, page)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+
+class _TableWriter:
+    """
+    Appends table rows to a CSV whose header is the first row written.
+
+    Tables can be wider than the first one, so data rows go to a side file and
+    the header, padded to the widest row, is written in front of them on close().
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.body_path = f"{output_path}.body.tmp"
+        self._body = open(self.body_path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._body)
+        self.header = None
+        self.width = 0
+        self.rows = 0
+
+    def write_rows(self, rows):
+        if self.header is None and rows:
+            self.header, rows = rows[0], rows[1:]
+            self.width = len(self.header)
+        self._writer.writerows(rows)
+        self.rows += len(rows)
+        self.width = max([self.width] + [len(row) for row in rows])
+
+    def close(self):
+        """Writes output_path and returns the number of data rows; nothing is written without tables."""
+        self._body.close()
+        try:
+            if self.header is None:
+                return 0
+            header = list(self.header) + [f"column_{i + 1}" for i in range(len(self.header), self.width)]
+            tmp_path = f"{self.output_path}.tmp"
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as out, \
+                    open(self.body_path, 'r', newline='', encoding='utf-8') as body:
+                csv.writer(out).writerow(header)
+                shutil.copyfileobj(body, out)
+            os.replace(tmp_path, self.output_path)
+            return self.rows
+        finally:
+            os.remove(self.body_path)
+
+    def abort(self):
+        self._body.close()
+        if os.path.exists(self.body_path):
+            os.remove(self.body_path)
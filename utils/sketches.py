@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+
+def hash_values(values):
+    """Hashes a 1-D array of values to uint64 the same way pandas hashes object data."""
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+def _bit_length(values):
+    """Vectorized int.bit_length() for a uint64 array."""
+    values = values.copy()
+    lengths = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = values >= (np.uint64(1) << np.uint64(shift))
+        lengths[mask] += shift
+        values[mask] >>= np.uint64(shift)
+    lengths += (values > 0)
+    return lengths
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter over uint64 hashes (~0.8% error at p=14)."""
+
+    def __init__(self, p=14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if hashes.size == 0:
+            return
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - _bit_length(remainder) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * np.log(self.m / zeros)
+        return int(round(estimate))
+
+
+class DistinctCounter:
+    """
+    Counts distinct values exactly until more than cap distinct hashes have been
+    seen, then switches to a HyperLogLog estimate. Memory is bounded by cap.
+    """
+
+    def __init__(self, cap=100_000):
+        self.cap = cap
+        self._exact = np.empty(0, dtype=np.uint64)
+        self._hll = None
+
+    @property
+    def is_exact(self):
+        return self._hll is None
+
+    def update(self, values):
+        self.add_hashes(hash_values(values))
+
+    def add_hashes(self, hashes):
+        if self._hll is not None:
+            self._hll.add_hashes(hashes)
+            return
+        self._exact = np.union1d(self._exact, hashes)
+        if len(self._exact) > self.cap:
+            self._hll = HyperLogLog()
+            self._hll.add_hashes(self._exact)
+            self._exact = None
+
+    def merge(self, other):
+        if other._hll is not None:
+            if self._hll is None:
+                self._hll = HyperLogLog()
+                self._hll.add_hashes(self._exact)
+                self._exact = None
+            self._hll.merge(other._hll)
+        else:
+            self.add_hashes(other._exact)
+        return self
+
+    def count(self):
+        return len(self._exact) if self._hll is None else self._hll.count()
+
+
+class QuantileSketch:
+    """
+    Mergeable KLL-style quantile sketch.
+
+    Items on level i carry weight 2**i. When a level holds more than k items it
+    is sorted and every other item is promoted to the next level, so memory stays
+    at O(k log(n / k)). While nothing has been compacted, quantiles are exact and
+    match pandas' linear interpolation.
+    """
+
+    def __init__(self, k=4096, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.count += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0, dtype=np.float64))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.k:
+                items = np.sort(items)
+                # An odd leftover item stays on this level so total weight is preserved
+                leftover, items = (items[-1:], items[:-1]) if len(items) % 2 else (items[:0], items)
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = leftover
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def count_outside(self, lower, upper):
+        """Number of values below lower or above upper, exact while nothing has been compacted."""
+        return int(sum(2 ** level * np.count_nonzero((items < lower) | (items > upper))
+                       for level, items in enumerate(self.levels)))
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        if len(self.levels) == 1:
+            return float(np.quantile(self.levels[0], q))
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_), 2 ** level, dtype=np.float64)
+                                  for level, items_ in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(items[min(position, len(items) - 1)])
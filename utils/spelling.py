@@ -0,0 +1,170 @@
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+from spellchecker import SpellChecker
+
+from utils.text_pool import text_pool
+
+
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+ID_COLUMN_PATTERN = re.compile(r'(^|[_\s])id$|^id[_\s]|uuid|guid', re.IGNORECASE)
+
+_worker_spell = None
+
+
+def should_skip_column(col, values):
+    """True for ID, numeric and e-mail columns, whose text must never be 'corrected'."""
+    if ID_COLUMN_PATTERN.search(str(col)) or 'email' in str(col).lower():
+        return True
+    if values.empty:
+        return True
+    sample = values.head(1000)
+    if sample.str.contains(r'\d', regex=True).mean() > 0.5:
+        return True
+    return sample.str.match(EMAIL_PATTERN).mean() > 0.5
+
+
+def init_worker():
+    """Loads the per-process SpellChecker; run once in every text_pool worker."""
+    global _worker_spell
+    if _worker_spell is None:
+        _worker_spell = SpellChecker()
+
+
+def _correct_words(words):
+    """Process-pool task: corrects a batch of words with the per-process SpellChecker."""
+    init_worker()
+    return [_worker_spell.correction(word) or word for word in words]
+
+
+class SpellingCorrector:
+    """
+    Spelling correction over the distinct values of a column.
+
+    Each distinct string is corrected at most once: results live in an in-memory
+    LRU and, when cache_path is set, in a SQLite table that every worker process
+    shares. Misses are fanned out over the shared text_pool once there are at
+    least parallel_threshold of them.
+
+    Values SpellChecker has no candidate for are kept unchanged.
+    """
+
+    def __init__(self, cache_path=None, max_memory_entries=100_000, max_disk_entries=1_000_000,
+                 workers=None, parallel_threshold=2000, batch_size=500):
+        self.cache_path = cache_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._spell = None
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            with closing(self._connect()) as conn, conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS corrections (word TEXT PRIMARY KEY, correction TEXT NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.cache_path, timeout=30)
+
+    @property
+    def spell(self):
+        if self._spell is None:
+            self._spell = SpellChecker()
+        return self._spell
+
+    def correct_series(self, series):
+        """Returns series with every correctable string replaced by its correction."""
+        codes, uniques = pd.factorize(series)
+        values = pd.Series(uniques, dtype=object)
+        strings = values[values.map(lambda x: isinstance(x, str))]
+        if should_skip_column(series.name, strings):
+            return series
+
+        # Words with digits or '@' are codes, not prose
+        candidates = strings[~strings.str.contains(r'[\d@]', regex=True)]
+        corrections = self.correct_words(candidates.tolist())
+        if not corrections:
+            return series
+
+        resolved = values.copy()
+        resolved[candidates.index] = [corrections[word] for word in candidates]
+        resolved = resolved.to_numpy(dtype=object)
+        return pd.Series(np.where(codes >= 0, resolved[codes], series.to_numpy(dtype=object)),
+                         index=series.index, name=series.name)
+
+    def correct_words(self, words):
+        """Returns {word: correction} for words, consulting the caches first."""
+        result = {}
+        missing = []
+        with self._lock:
+            for word in words:
+                if word in self._memory:
+                    self._memory.move_to_end(word)
+                    result[word] = self._memory[word]
+                else:
+                    missing.append(word)
+            self.hits += len(result)
+
+        if missing and self.cache_path:
+            stored = self._load(missing)
+            result.update(stored)
+            self.hits += len(stored)
+            missing = [word for word in missing if word not in stored]
+        self.misses += len(missing)
+
+        if missing:
+            # Dictionary words need no edit-distance search
+            known = self.spell.known(missing)
+            computed = {word: word for word in missing if word in known}
+            unknown = [word for word in missing if word not in known]
+            computed.update(zip(unknown, self._compute(unknown)))
+            result.update(computed)
+            if self.cache_path:
+                self._store(computed)
+
+        with self._lock:
+            for word, correction in result.items():
+                self._memory[word] = correction
+                self._memory.move_to_end(word)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+        return result
+
+    def _compute(self, words):
+        if len(words) < self.parallel_threshold or self.workers == 1:
+            return _correct_words(words)
+        batches = [words[i:i + self.batch_size] for i in range(0, len(words), self.batch_size)]
+        return [word for batch in text_pool(self.workers).map(_correct_words, batches) for word in batch]
+
+    def _load(self, words):
+        stored = {}
+        with closing(self._connect()) as conn:
+            for i in range(0, len(words), 500):
+                batch = words[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                stored.update(conn.execute(
+                    f"SELECT word, correction FROM corrections WHERE word IN ({placeholders})", batch))
+        return stored
+
+    def _store(self, corrections):
+        if not corrections:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO corrections (word, correction) VALUES (?, ?)",
+                             corrections.items())
+            # Bound the table by dropping the oldest rows first
+            conn.execute("DELETE FROM corrections WHERE rowid <= (SELECT MAX(rowid) FROM corrections) - ?",
+                         (self.max_disk_entries,))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'memory_entries': len(self._memory)}
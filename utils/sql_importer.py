@@ -0,0 +1,316 @@
+import csv
+import os
+import re
+
+
+STATEMENT_SPECIAL = re.compile(r"['\"`;#]|--|/\*")
+# Everything up to the next ';', comment or string that cannot be closed yet, in one
+# match; a construct is only taken when the character after it is in this block
+STATEMENT_RUN = {
+    True: re.compile(r"""(?:[^'"`;#/-]+|'(?:[^'\\]|\\.|'')*'(?=[^'])|"(?:[^"\\]|\\.|"")*"(?=[^"])|`[^`]*`(?=[^`])|-(?=[^-])|/(?=[^*]))*""", re.DOTALL),
+    False: re.compile(r"""(?:[^'"`;#/-]+|'(?:[^']|'')*'(?=[^'])|"(?:[^"]|"")*"(?=[^"])|`[^`]*`(?=[^`])|-(?=[^-])|/(?=[^*]))*""", re.DOTALL),
+}
+QUOTE_END = {
+    (quote, escapes): re.compile(f"[{quote}\\\\]" if escapes else quote)
+    for quote in ("'", '"', '`') for escapes in (True, False)
+}
+
+INSERT_HEADER = re.compile(
+    r"^(?:INSERT|REPLACE)\s+(?:IGNORE\s+)?INTO\s+(?P<table>[^\s(]+)\s*(?:\((?P<columns>[^)]*)\))?\s*VALUES\s*",
+    re.IGNORECASE | re.DOTALL
+)
+CREATE_TABLE_HEADER = re.compile(r"^CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?P<table>[^\s(]+)\s*\(", re.IGNORECASE)
+COPY_HEADER = re.compile(r"^COPY\s+(?P<table>[^\s(]+)\s*(?:\((?P<columns>[^)]*)\))?\s*FROM\s+stdin", re.IGNORECASE)
+STANDARD_STRINGS = re.compile(r"^SET\s+standard_conforming_strings\s*=\s*'?on", re.IGNORECASE)
+CONSTRAINT_KEYWORDS = {'PRIMARY', 'KEY', 'UNIQUE', 'CONSTRAINT', 'INDEX', 'FOREIGN', 'CHECK', 'FULLTEXT', 'SPATIAL', 'EXCLUDE'}
+
+# Groups: quoted string, punctuation, bare word (number, NULL, function name, ...). A closing
+# quote is never followed by another one, which would make it half of a doubled quote
+VALUE_TOKEN = {
+    True: re.compile(r"""('(?:[^'\\]|\\.|'')*'(?!')|"(?:[^"\\]|\\.|"")*"(?!"))|([(),])|([^\s(),'"]+)""", re.DOTALL),
+    False: re.compile(r"""('(?:[^']|'')*'(?!')|"(?:[^"]|"")*"(?!"))|([(),])|([^\s(),'"]+)""", re.DOTALL),
+}
+MYSQL_ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+MYSQL_UNESCAPE = {quote: re.compile(r"\\(.)|" + quote * 2, re.DOTALL) for quote in ("'", '"')}
+COPY_ESCAPE = re.compile(r'\\(.)')
+COPY_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'}
+
+
+def _identifier(name):
+    """Unquotes an identifier and drops any schema/database prefix."""
+    return name.strip().split('.')[-1].strip('`"[] \n\r\t')
+
+
+def _convert_bare(value):
+    if value.upper() == 'NULL':
+        return None
+    try:
+        return float(value) if '.' in value or 'e' in value.lower() else int(value)
+    except ValueError:
+        return value
+
+
+class SQLDumpImporter:
+    """
+    Streams rows out of a mysqldump / pg_dump file into one CSV per table.
+
+    The file is read in blocks and split into statements by a small scanner that
+    understands quoted strings, backslash or doubled-quote escapes and comments,
+    so only one statement is held in memory at a time. INSERT ... VALUES and
+    pg_dump COPY ... FROM stdin blocks are supported; column names come from the
+    INSERT/COPY column list or from the table's CREATE TABLE statement. Rows are
+    written in batches of batch_size.
+    """
+
+    def __init__(self, batch_size=10_000, block_size=1 << 20):
+        self.batch_size = batch_size
+        self.block_size = block_size
+
+    def import_file(self, sql_path, output_dir, prefix):
+        """
+        Converts sql_path and returns {table: {'path': csv_path, 'rows': count}}
+        for every table that received at least one row.
+        """
+        self._output_dir = output_dir
+        self._prefix = prefix
+        self._backslash_escapes = True
+        self._schemas = {}
+        self._outputs = {}
+        self._copy = None
+        try:
+            with open(sql_path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+                for statement in self._statements(f):
+                    self._handle_statement(statement)
+        finally:
+            for output in self._outputs.values():
+                self._flush(output)
+                output['file'].close()
+        return {table: {'path': output['path'], 'rows': output['rows']} for table, output in self._outputs.items()}
+
+    # ************************* Scanning *****************************
+
+    def _statements(self, f):
+        pieces = []
+        state = None  # None, a quote character, 'line_comment' or 'block_comment'
+        carry = ''
+        copy_started = False
+        while True:
+            block = f.read(self.block_size)
+            final = not block
+            text = carry + block
+            carry = ''
+            pos, n = 0, len(text)
+
+            while pos < n:
+                if self._copy is not None:
+                    newline = text.find('\n', pos)
+                    if newline == -1 and not final:
+                        carry = text[pos:]
+                        break
+                    end = n if newline == -1 else newline
+                    if copy_started:
+                        # Rest of the COPY ... FROM stdin; line itself
+                        copy_started = False
+                    else:
+                        self._handle_copy_line(text[pos:end].rstrip('\r'))
+                    pos = end + 1
+                    continue
+
+                if state is None:
+                    run_end = STATEMENT_RUN[self._backslash_escapes].match(text, pos).end()
+                    pieces.append(text[pos:run_end])
+                    pos = run_end
+                    if pos == n:
+                        break
+                    match = STATEMENT_SPECIAL.search(text, pos)
+                    if match is None:
+                        # A trailing '-' or '/' may start a comment in the next block
+                        end = n - 1 if not final and text[-1] in '-/' else n
+                        pieces.append(text[pos:end])
+                        carry = text[end:]
+                        break
+                    token, start = match.group(), match.start()
+                    pieces.append(text[pos:start])
+                    pos = match.end()
+                    if token == ';':
+                        statement = ''.join(pieces).strip()
+                        pieces = []
+                        if statement:
+                            yield statement
+                            copy_started = self._copy is not None
+                    elif token in ('--', '#'):
+                        state = 'line_comment'
+                    elif token == '/*':
+                        state = 'block_comment'
+                    else:
+                        pieces.append(token)
+                        state = token
+
+                elif state == 'line_comment':
+                    newline = text.find('\n', pos)
+                    if newline == -1:
+                        pos = n
+                    else:
+                        pieces.append('\n')
+                        state = None
+                        pos = newline + 1
+
+                elif state == 'block_comment':
+                    end = text.find('*/', pos)
+                    if end == -1:
+                        carry = text[-1:] if not final and text.endswith('*') else ''
+                        break
+                    pieces.append(' ')
+                    state = None
+                    pos = end + 2
+
+                else:
+                    escapes = self._backslash_escapes and state != '`'
+                    match = QUOTE_END[(state, escapes)].search(text, pos)
+                    if match is None:
+                        pieces.append(text[pos:])
+                        pos = n
+                        break
+                    start = match.start()
+                    if start + 1 == n and not final:
+                        # Cannot tell an escape or a doubled quote from a closing quote yet
+                        pieces.append(text[pos:start])
+                        carry = text[start:]
+                        break
+                    if match.group() == '\\' or text[start + 1:start + 2] == state:
+                        pieces.append(text[pos:start + 2])
+                        pos = start + 2
+                    else:
+                        pieces.append(text[pos:start + 1])
+                        state = None
+                        pos = start + 1
+
+            if final:
+                statement = ''.join(pieces).strip()
+                if statement and self._copy is None:
+                    yield statement
+                return
+
+    # ************************* Statements *****************************
+
+    def _handle_statement(self, statement):
+        header = INSERT_HEADER.match(statement)
+        if header:
+            table = _identifier(header.group('table'))
+            columns = self._split_columns(header.group('columns'))
+            for row in self._parse_values(statement[header.end():]):
+                self._write_row(table, columns, row)
+            return
+
+        create = CREATE_TABLE_HEADER.match(statement)
+        if create:
+            self._schemas[_identifier(create.group('table'))] = self._parse_create_columns(statement[create.end():])
+            return
+
+        copy = COPY_HEADER.match(statement)
+        if copy:
+            self._copy = (_identifier(copy.group('table')), self._split_columns(copy.group('columns')))
+            return
+
+        if STANDARD_STRINGS.match(statement):
+            self._backslash_escapes = False
+
+    def _split_columns(self, columns):
+        if not columns:
+            return None
+        return [_identifier(col) for col in columns.split(',')]
+
+    def _parse_create_columns(self, body):
+        columns, depth, current = [], 0, []
+        for char in body:
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                if depth == 0:
+                    break
+                depth -= 1
+            elif char == ',' and depth == 0:
+                columns.append(''.join(current))
+                current = []
+                continue
+            current.append(char)
+        columns.append(''.join(current))
+
+        names = []
+        for definition in columns:
+            words = definition.split()
+            if words and words[0].upper() not in CONSTRAINT_KEYWORDS:
+                names.append(_identifier(words[0]))
+        return names
+
+    def _parse_values(self, values):
+        """Yields one list per '(...)' tuple of an INSERT ... VALUES clause."""
+        depth, row, value, raw = 0, None, None, None
+        for quoted, punct, bare in VALUE_TOKEN[self._backslash_escapes].findall(values):
+            if depth == 1 and not punct:
+                if raw is None:
+                    raw = quoted or bare
+                    value = self._unquote(quoted) if quoted else _convert_bare(bare)
+                else:
+                    # Hex literals, charset introducers, ...: keep the raw SQL
+                    raw += quoted or bare
+                    value = raw
+                continue
+            if punct == '(':
+                depth += 1
+                if depth == 1:
+                    row, value, raw = [], None, None
+                    continue
+            elif punct == ')':
+                depth -= 1
+                if depth == 0:
+                    row.append(value)
+                    yield row
+                    continue
+            elif punct == ',' and depth == 1:
+                row.append(value)
+                value, raw = None, None
+                continue
+            if depth >= 1:
+                # Inside a function call such as NOW() or CONCAT('a', 'b')
+                raw = (raw or '') + (quoted or punct or bare)
+                value = raw
+
+    def _unquote(self, token):
+        quote, body = token[0], token[1:-1]
+        if self._backslash_escapes and '\\' in body:
+            return MYSQL_UNESCAPE[quote].sub(
+                lambda m: quote if m.group(1) is None else MYSQL_ESCAPES.get(m.group(1), m.group(1)), body)
+        return body.replace(quote * 2, quote)
+
+    def _handle_copy_line(self, line):
+        if line == '\\.':
+            self._copy = None
+            return
+        table, columns = self._copy
+        row = [None if value == '\\N' else COPY_ESCAPE.sub(lambda m: COPY_ESCAPES.get(m.group(1), m.group(1)), value)
+               for value in line.split('\t')]
+        self._write_row(table, columns, row)
+
+    # ************************* Output *****************************
+
+    def _write_row(self, table, columns, row):
+        output = self._outputs.get(table)
+        if output is None:
+            columns = columns or self._schemas.get(table) or [f'{table}_col_{i+1}' for i in range(len(row))]
+            safe_table = re.sub(r'[^\w.-]', '_', table)
+            path = os.path.join(self._output_dir, f"{self._prefix}_{safe_table}.csv")
+            handle = open(path, 'w', newline='', encoding='utf-8')
+            writer = csv.writer(handle)
+            writer.writerow(columns)
+            output = {'path': path, 'file': handle, 'writer': writer, 'batch': [], 'rows': 0}
+            self._outputs[table] = output
+
+        output['batch'].append(row)
+        output['rows'] += 1
+        if len(output['batch']) >= self.batch_size:
+            self._flush(output)
+
+    def _flush(self, output):
+        output['writer'].writerows(output['batch'])
+        output['batch'] = []
@@ -0,0 +1,219 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from utils.duplicates import hash_rows
+from utils.sketches import DistinctCounter, QuantileSketch
+
+
+class _ColumnState:
+    """Mergeable per-column partial results for the DataAnalyzer detectors."""
+
+    def __init__(self, distinct_cap):
+        self.missing = 0
+        self.non_null = 0
+        self.numeric = 0
+        self.quantiles = QuantileSketch()
+        self.distinct = DistinctCounter(cap=distinct_cap)
+        self.format_issue = False
+        self.lexical_issue = False
+        self.outliers = 0
+
+    @property
+    def all_numeric(self):
+        # pandas only infers a numeric dtype when every non-null value parses
+        return self.numeric == self.non_null
+
+    def update(self, series):
+        non_null = series.dropna()
+        self.missing += len(series) - len(non_null)
+        self.non_null += len(non_null)
+
+        converted = pd.to_numeric(non_null, errors='coerce')
+        self.numeric += int(converted.notna().sum())
+        if self.quantiles is not None:
+            if self.all_numeric:
+                self.quantiles.update(converted.to_numpy())
+            else:
+                # Column can no longer be numeric, so its quantiles are never needed
+                self.quantiles = None
+
+        if not self.format_issue:
+            self.format_issue = bool((non_null != non_null.str.strip().str.lower()).any())
+
+        uniques = non_null.unique()
+        self.distinct.update(uniques)
+        if not self.lexical_issue and len(uniques):
+            unique_values = pd.Series(uniques)
+            single_token = unique_values.str.split().str.len() == 1
+            self.lexical_issue = bool((single_token & ~unique_values.str.isalpha()).any())
+
+    def merge(self, other):
+        self.missing += other.missing
+        self.non_null += other.non_null
+        self.numeric += other.numeric
+        if self.quantiles is not None and other.quantiles is not None and self.all_numeric:
+            self.quantiles.merge(other.quantiles)
+        else:
+            self.quantiles = None
+        self.distinct.merge(other.distinct)
+        self.format_issue = self.format_issue or other.format_issue
+        self.lexical_issue = self.lexical_issue or other.lexical_issue
+        self.outliers += other.outliers
+        return self
+
+
+class _RowHashPartitions:
+    """
+    Counts distinct row fingerprints without a single ever-growing array. Each
+    chunk's unique fingerprints are buffered; once buffer_rows of them are held
+    they are appended to one of 2 ** partition_bits temporary files, picked by
+    their top bits. count() sorts every partition once on its own, so memory is
+    bounded by the buffer and the largest partition, and the total work is one
+    sort of the fingerprints rather than a merge per chunk.
+    """
+
+    def __init__(self, partition_bits=6, buffer_rows=1_000_000, dtype=np.uint64):
+        self.partition_bits = partition_bits
+        self.buffer_rows = buffer_rows
+        # A structured dtype is partitioned on its first field
+        self.dtype = np.dtype(dtype)
+        self._buffer = []
+        self._buffered = 0
+        self._directory = None
+
+    def add(self, hashes):
+        hashes = np.unique(hashes)
+        self._buffer.append(hashes)
+        self._buffered += len(hashes)
+        if self._buffered >= self.buffer_rows:
+            self._spill()
+
+    def merge(self, other):
+        self._buffer.extend(other._buffer)
+        self._buffered += other._buffered
+        if other._directory is not None:
+            self._spill()
+            for i in range(2 ** self.partition_bits):
+                if os.path.exists(other._path(i)):
+                    self._append(i, np.fromfile(other._path(i), dtype=self.dtype))
+        elif self._buffered >= self.buffer_rows:
+            self._spill()
+
+    def count(self):
+        return sum(len(np.unique(partition)) for partition in self.partitions())
+
+    def partitions(self):
+        """Every non-empty partition as one (unsorted) array, loaded one at a time."""
+        if self._directory is None:
+            if self._buffer:
+                yield np.concatenate(self._buffer)
+            return
+        self._spill()
+        for i in range(2 ** self.partition_bits):
+            if os.path.exists(self._path(i)):
+                yield np.fromfile(self._path(i), dtype=self.dtype)
+
+    def _spill(self):
+        if self._directory is None:
+            self._directory = tempfile.TemporaryDirectory(prefix='row_hashes_')
+        if not self._buffer:
+            return
+        hashes = np.sort(np.concatenate(self._buffer))
+        self._buffer, self._buffered = [], 0
+        keys = hashes if hashes.dtype.names is None else hashes[hashes.dtype.names[0]]
+        # Sorted hashes are grouped by their top bits, one slice per partition
+        edges = np.searchsorted(keys >> np.uint64(64 - self.partition_bits),
+                                np.arange(2 ** self.partition_bits + 1, dtype=np.uint64))
+        for i, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+            if end > start:
+                self._append(i, hashes[start:end])
+
+    def _append(self, partition, hashes):
+        with open(self._path(partition), 'ab') as file:
+            hashes.tofile(file)
+
+    def _path(self, partition):
+        return os.path.join(self._directory.name, f"{partition}.bin")
+
+
+class StreamingIssueAccumulator:
+    """
+    Builds the DataAnalyzer.detect_all_issues dict from row chunks.
+
+    Chunks are expected to be read as text (dtype=str) so every chunk sees the
+    same raw values; numeric columns are recognised the way pandas would infer
+    them on a full read. Partial accumulators can be combined with merge(), so
+    chunks may also be processed in parallel.
+
+    Memory is bounded by the chunk size plus, per column, a quantile sketch and a
+    distinct counter capped at distinct_cap hashes. Duplicate detection keeps one
+    8-byte hash per distinct row, spilled to temporary files past a fixed buffer.
+    """
+
+    def __init__(self, distinct_cap=100_000):
+        self.distinct_cap = distinct_cap
+        self.columns = {}
+        self.rows = 0
+        self._row_hashes = _RowHashPartitions()
+
+    def update(self, chunk):
+        self.rows += len(chunk)
+        for col in chunk.columns:
+            if col not in self.columns:
+                self.columns[col] = _ColumnState(self.distinct_cap)
+            self.columns[col].update(chunk[col])
+
+        self._row_hashes.add(hash_rows(chunk))
+
+    def merge(self, other):
+        for col, state in other.columns.items():
+            if col in self.columns:
+                self.columns[col].merge(state)
+            else:
+                self.columns[col] = state
+        self.rows += other.rows
+        self._row_hashes.merge(other._row_hashes)
+        return self
+
+    def numeric_columns(self):
+        return [col for col, state in self.columns.items() if state.all_numeric]
+
+    def outlier_bounds(self):
+        """IQR bounds for every numeric column, from the merged quantile sketches."""
+        bounds = {}
+        for col in self.numeric_columns():
+            sketch = self.columns[col].quantiles
+            q1, q3 = sketch.quantile(0.25), sketch.quantile(0.75)
+            iqr = q3 - q1
+            bounds[col] = (q1 - 1.5 * iqr, q3 + 1.5 * iqr)
+        return bounds
+
+    def count_outliers(self, chunk, bounds):
+        """Second pass: counts values outside the IQR bounds in a chunk."""
+        for col, (lower_bound, upper_bound) in bounds.items():
+            values = pd.to_numeric(chunk[col], errors='coerce')
+            self.columns[col].outliers += int(((values < lower_bound) | (values > upper_bound)).sum())
+
+    def result(self):
+        text_columns = [col for col, state in self.columns.items() if not state.all_numeric]
+        dtypes = {}
+        for col in text_columns:
+            state = self.columns[col]
+            if state.non_null and state.numeric / state.non_null > 0.8:
+                dtypes[col] = 'Potential numeric values stored as text'
+
+        return {
+            'missing': {col: state.missing for col, state in self.columns.items()},
+            'duplicates': {"total_duplicates": self.rows - self._row_hashes.count()},
+            'dtypes': dtypes,
+            'outliers': {col: self.columns[col].outliers for col in self.numeric_columns()},
+            'formatting': {col: "Inconsistent formatting detected"
+                           for col in text_columns if self.columns[col].format_issue},
+            'lexical_issues': {col: "Potential lexical issues detected"
+                               for col in text_columns if self.columns[col].lexical_issue},
+            'categorical_conversion_needed': {col: "May need label encoding"
+                                              for col in text_columns if self.columns[col].distinct.count() <= 10},
+        }
@@ -0,0 +1,38 @@
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def _init_worker():
+    """Loads the text models once per worker process, not once per task."""
+    from utils import lexical, spelling
+    spelling.init_worker()
+    lexical.init_worker()
+
+
+def text_pool(workers):
+    """
+    The process pool of `workers` processes that the text stages share, created
+    on first use and kept for the life of the process. Workers are spawned
+    rather than forked, since the pool may first be needed from a job thread,
+    and forking a threaded process can copy locks held by other threads.
+    """
+    with _lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+        return pool
+
+
+@atexit.register
+def shutdown():
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,210 @@
+import itertools
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+
+# Strings read_excel turns into NaN by default (the na_values listed in its documentation)
+NA_STRINGS = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A',
+    'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+})
+
+
+def _header_names(values):
+    """Column names the way read_excel makes them: 'Unnamed: i' for blanks, 'x.1' for repeats."""
+    names, seen = [], {}
+    for i, value in enumerate(values):
+        name = f'Unnamed: {i}' if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def _cell_value(value):
+    """
+    A cell value the way read_excel converts it: whole floats become ints (when
+    they fit in int64, so columns still convert to Arrow) and error cells are missing.
+    """
+    if isinstance(value, float) and value.is_integer() and abs(value) < 2 ** 63:
+        return int(value)
+    if isinstance(value, str) and (value == '' or value in ERROR_CODES):
+        return None
+    return value
+
+
+def _convert_text_columns(df):
+    """
+    Applies read_excel's typing to object columns: missing cells and the default
+    NA strings become NaN, columns holding only numbers and numeric text become
+    numeric, and booleans with gaps become 1.0/0.0/NaN.
+    """
+    for col in df.columns[df.dtypes == object]:
+        series = df[col]
+        na = series.isna() | series.isin(NA_STRINGS)
+        if na.any():
+            series = series.mask(na)
+        kind = pd.api.types.infer_dtype(series, skipna=True)
+        if kind in ('string', 'mixed-integer', 'mixed-integer-float'):
+            try:
+                series = pd.to_numeric(series)
+            except (ValueError, TypeError):
+                pass
+        elif kind == 'boolean':
+            series = series.astype(float)
+        if series is not df[col]:
+            df[col] = series
+    return df
+
+
+def _concat_column(parts):
+    """Concatenates the chunks of one column; chunks where it was empty take the datetime type of the others."""
+    dtypes = {part.dtype for part in parts if part.notna().any()}
+    if len(dtypes) == 1:
+        dtype = dtypes.pop()
+        if dtype.kind in 'mM':
+            parts = [part if part.dtype == dtype else part.astype(dtype) for part in parts]
+    return pd.concat(parts, ignore_index=True)
+
+
+class XlsxReader:
+    """
+    Reads worksheets of an .xlsx file with openpyxl in read-only mode, which
+    streams the sheet XML rather than loading every cell of the workbook.
+
+    Rows come from iter_rows(values_only=True) as plain tuples; cells outside the
+    requested columns are dropped as each row arrives and rows are handed out in
+    chunks of chunk_rows, so memory stays at one chunk plus the shared strings.
+    Values follow read_excel with header=0: error cells are missing, whole
+    numbers are ints and blank rows after the last row with a value are dropped.
+    The header is the first row with a value; cells right of its last value are
+    ignored.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._workbook = load_workbook(filepath, read_only=True, data_only=True, keep_links=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._workbook.close()
+
+    @property
+    def sheet_names(self):
+        return self._workbook.sheetnames
+
+    def columns(self, sheet=None):
+        """Header names of a sheet, read without parsing past its first row."""
+        rows = self._rows(self._worksheet(sheet))
+        try:
+            return _header_names(next(rows, []))
+        finally:
+            rows.close()
+
+    def iter_chunks(self, sheet=None, columns=None, chunk_rows=100_000):
+        """Yields the sheet as DataFrames of up to chunk_rows rows, typed chunk by chunk."""
+        for chunk in self._chunks(sheet, columns, chunk_rows):
+            yield _convert_text_columns(chunk)
+
+    def read(self, sheet=None, columns=None, chunk_rows=100_000):
+        """
+        The whole sheet as one DataFrame. Only one chunk at a time is held as
+        Python values; each column is typed once over all its chunks at the end,
+        as read_excel types it.
+        """
+        parts = None
+        for chunk in self._chunks(sheet, columns, chunk_rows):
+            if parts is None:
+                names, parts = chunk.columns, [[] for _ in chunk.columns]
+            for i, part in enumerate(parts):
+                part.append(chunk.iloc[:, i])
+        if len(parts[0]) == 1:
+            df = pd.DataFrame({i: part[0] for i, part in enumerate(parts)})
+        else:
+            df = pd.DataFrame({i: _concat_column(part) for i, part in enumerate(parts)})
+        df.columns = names
+        return _convert_text_columns(df)
+
+    def _chunks(self, sheet, columns, chunk_rows):
+        rows = self._rows(self._worksheet(sheet))
+        names = _header_names(next(rows, []))
+        if columns is None:
+            selected = list(range(len(names)))
+        else:
+            missing = [col for col in columns if col not in names]
+            if missing:
+                raise ValueError(f"Usecols do not match columns, columns expected but not found: {missing}")
+            selected = [names.index(col) for col in columns]
+        selected_names = [names[i] for i in selected]
+
+        first = True
+        while True:
+            block = [[row[i] if i < len(row) else None for i in selected] for row in itertools.islice(rows, chunk_rows)]
+            if block or first:
+                values = zip(*block) if block else [()] * len(selected_names)
+                yield pd.DataFrame({name: pd.Series(column, dtype=None if column else object)
+                                    for name, column in zip(selected_names, values)})
+            first = False
+            if len(block) < chunk_rows:
+                return
+
+    def _rows(self, worksheet):
+        """
+        Yields the rows of a worksheet from the first to the last one with a
+        value, as lists of converted values. Blank (or absent) rows between two
+        rows with values are kept as empty lists, as read_excel keeps them.
+        """
+        blank = 0
+        started = False
+        for values in worksheet.iter_rows(values_only=True):
+            row = [_cell_value(value) for value in values]
+            while row and row[-1] is None:
+                row.pop()
+            if not row:
+                blank += started
+                continue
+            if blank:
+                yield from ([] for _ in range(blank))
+                blank = 0
+            started = True
+            yield row
+
+    def _worksheet(self, sheet):
+        """Worksheet given by name or 0-based position; None is the first sheet."""
+        names = self._workbook.sheetnames
+        if sheet is None:
+            sheet = 0
+        if isinstance(sheet, int):
+            if not 0 <= sheet < len(names):
+                raise ValueError(f"Worksheet index {sheet} is invalid, {len(names)} worksheets found")
+            sheet = names[sheet]
+        elif sheet not in names:
+            raise ValueError(f"Worksheet named '{sheet}' not found")
+        worksheet = self._workbook[sheet]
+        # The stored dimensions can be missing or wrong; read every row there is, as read_excel does
+        worksheet.reset_dimensions()
+        return worksheet
+
+
+def sheet_names(filepath):
+    with XlsxReader(filepath) as reader:
+        return reader.sheet_names
+
+
+def read_xlsx(filepath, sheet=None, columns=None, chunk_rows=100_000):
+    """Reads one sheet (default: the first) of an .xlsx file, optionally only some of its columns."""
+    with XlsxReader(filepath) as reader:
+        return reader.read(sheet, columns=columns, chunk_rows=chunk_rows)
+
+
+def xlsx_columns(filepath, sheet=None):
+    with XlsxReader(filepath) as reader:
+        return reader.columns(sheet)